@@ -1,116 +1,394 @@
 # -----------------------------------------------------------------------------
 # Copyright (c) 2025 Dogan Ege BULTE
-# 
+#
 # This software is released under the MIT License.
 # https://opensource.org/licenses/MIT
 # -----------------------------------------------------------------------------
 
+import argparse
+import time
+
 import pandas as pd
 import pandas_ta as ta
-import yfinance as yf
 import sqlite3
 import numpy as np
 
+import db_writer
+import indicators
+import model_schema
+import panel_tensor
+import series_cache
+from perf_utils import format_throughput
 
-def add_new_features(db_name="bist_model_ready.db"):
-    conn = sqlite3.connect(db_name)
+DB_NAME = "bist_model_ready.db"
 
-    print("1. Veritabanındaki veriler okunuyor...")
-    df = pd.read_sql("SELECT * FROM model_data", conn)
-
-    df['date'] = pd.to_datetime(df['date'])
+# Akış modunda tek seferde işlenen sembol sayısı (bellek tavanını bu belirler)
+STREAM_BATCH_SIZE = 20
+STREAM_TABLE = "model_data_stream"
 
-    numeric_cols = ['high', 'low', 'close', 'volume']
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
+INCREMENTAL_COLUMNS = ['atr', 'obv', 'mfi']
 
-    print(f"   -> Toplam Satır Sayısı: {len(df)}")
 
-    print("\n2. XBANK ve XUSIN verileri Yahoo Finance'den çekiliyor...")
+def download_xbank_xusin_ratio() -> pd.DataFrame | None:
+    """
+    XBANK / XUSIN kapanış rasyosunu (date, xbank_xusin_ratio) seri
+    önbelleğinden döndürür; ağdan yalnızca son kayıtlı bardan sonrası istenir.
+    """
     try:
-        tickers = ['XBANK.IS', 'XUSIN.IS']
-        index_data = yf.download(tickers, start="1997-01-01", progress=False, auto_adjust=True)
-
-        if isinstance(index_data.columns, pd.MultiIndex):
-            try:
-                index_close = index_data.xs('Close', axis=1, level=0)
-            except:
-                index_close = index_data['Close']
-        else:
-            index_close = index_data['Close'] if 'Close' in index_data else index_data
+        cache = series_cache.SeriesCache()
+        # auto_adjust=True'daki 'Close' ile aynı: ayarlanmış kapanış
+        index_close = cache.aligned(['xbank', 'xusin'], column='adj_close')
+        print(f"   -> {cache.format_stats()}")
 
-        index_close['xbank_xusin_ratio'] = index_close['XBANK.IS'] / index_close['XUSIN.IS']
-
-        ratio_df = index_close[['xbank_xusin_ratio']].reset_index()
-        ratio_df.rename(columns={'Date': 'date'}, inplace=True)
-        ratio_df['date'] = pd.to_datetime(ratio_df['date'])
-
-        print("   -> Rasyo verisi ana tabloya ekleniyor...")
-        if 'xbank_xusin_ratio' in df.columns:
-            df = df.drop(columns=['xbank_xusin_ratio'])
-
-        df = pd.merge(df, ratio_df, on='date', how='left')
+        index_close['xbank_xusin_ratio'] = index_close['xbank'] / index_close['xusin']
+        return index_close[['date', 'xbank_xusin_ratio']]
 
     except Exception as e:
         print(f"UYARI (Rasyo İndirme): {e}")
         print("İşleme rasyo olmadan devam ediliyor...")
+        return None
 
-    print("\n3. Teknik İndikatörler Hesaplanıyor (ATR, OBV, MFI)...")
-    print("   (Bu işlem veri boyutuna göre biraz zaman alabilir, lütfen bekleyin)")
 
-    def compute_indicators(sub_df):
-        sub_df = sub_df.copy()
+def compute_indicators(sub_df):
+    sub_df = sub_df.copy()
 
-        sub_df = sub_df.sort_values('date')
+    sub_df = sub_df.sort_values('date')
 
-        if len(sub_df) < 14:
-            sub_df['atr'] = np.nan
-            sub_df['obv'] = np.nan
-            sub_df['mfi'] = np.nan
-            return sub_df
+    if len(sub_df) < 14:
+        sub_df['atr'] = np.nan
+        sub_df['obv'] = np.nan
+        sub_df['mfi'] = np.nan
+        return sub_df
 
-        try:
-            atr_res = sub_df.ta.atr(length=14)
-            sub_df['atr'] = atr_res.iloc[:, 0] if isinstance(atr_res, pd.DataFrame) else atr_res
+    try:
+        atr_res = sub_df.ta.atr(length=14)
+        sub_df['atr'] = atr_res.iloc[:, 0] if isinstance(atr_res, pd.DataFrame) else atr_res
 
-            obv_res = sub_df.ta.obv()
-            sub_df['obv'] = obv_res.iloc[:, 0] if isinstance(obv_res, pd.DataFrame) else obv_res
+        obv_res = sub_df.ta.obv()
+        sub_df['obv'] = obv_res.iloc[:, 0] if isinstance(obv_res, pd.DataFrame) else obv_res
 
-            mfi_res = sub_df.ta.mfi(length=14)
-            sub_df['mfi'] = mfi_res.iloc[:, 0] if isinstance(mfi_res, pd.DataFrame) else mfi_res
+        mfi_res = sub_df.ta.mfi(length=14)
+        sub_df['mfi'] = mfi_res.iloc[:, 0] if isinstance(mfi_res, pd.DataFrame) else mfi_res
 
-        except Exception as inner_e:
-            pass
+    except Exception as inner_e:
+        pass
 
-        return sub_df
+    return sub_df
 
-    df = df.groupby('symbol', group_keys=False).apply(compute_indicators)
 
-    print("\n4. Veritabanına kaydediliyor (model_data güncelleniyor)...")
+def _panel_indicators(df: pd.DataFrame, workers: int = 1) -> pd.DataFrame:
+    """
+    ATR/OBV/MFI'yi tüm semboller için vektörel motorla hesaplar; workers > 1 ise
+    sembol parçaları süreç havuzuna dağıtılır (sonuç işçi sayısından bağımsız).
+    """
+    df = indicators.compute_panel_indicators_parallel(df, INCREMENTAL_COLUMNS, workers)
+
+    # compute_indicators ile aynı: 14 satırdan kısa sembollerde indikatör yok
+    short = df.groupby('symbol')['symbol'].transform('size') < 14
+    df.loc[short, INCREMENTAL_COLUMNS] = np.nan
+    return df
+
+
+def _prepare_frame(df: pd.DataFrame, ratio_df: pd.DataFrame | None, workers: int = 1) -> pd.DataFrame:
+    """Tipleri düzeltir, rasyoyu ekler ve indikatörleri sembol bazında hesaplar."""
+    df['date'] = pd.to_datetime(df['date'])
+
+    numeric_cols = ['high', 'low', 'close', 'volume']
+    for col in numeric_cols:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    if ratio_df is not None:
+        if 'xbank_xusin_ratio' in df.columns:
+            df = df.drop(columns=['xbank_xusin_ratio'])
+        df = pd.merge(df, ratio_df, on='date', how='left')
+
+    df = _panel_indicators(df, workers)
 
     df['date'] = df['date'].dt.strftime('%Y-%m-%d')
 
     df.columns = [c.lower() for c in df.columns]
 
     df = df.loc[:, ~df.columns.duplicated()]
+    return df
+
+
+def add_new_features(db_name=DB_NAME, workers=1, replace=False):
+    """
+    ATR/OBV/MFI ve XBANK/XUSIN rasyosunu model_data'ya ekler. Varsayılan olarak
+    yalnızca bu kolonlar (symbol, date) anahtarıyla yerinde güncellenir; tablo,
+    tipleri ve indeksleri korunur. replace=True eski davranıştır: tüm tablo
+    baştan yazılır (kompakt şemayla, bkz. model_schema.replace_model_data).
+    Kayıt başarılıysa True döndürür.
+    """
+    conn = sqlite3.connect(db_name)
+    model_schema.ensure_compact(conn)
+
+    print("1. Veritabanındaki veriler okunuyor...")
+    if replace:
+        df = model_schema.read_model_data(conn)
+    else:
+        df = model_schema.read_model_data(conn, ['symbol', 'date', 'close', 'high', 'low', 'volume'])
+
+    print(f"   -> Toplam Satır Sayısı: {len(df)}")
+
+    print("\n2. XBANK ve XUSIN verileri seri önbelleğinden alınıyor (yalnızca yeni barlar indirilir)...")
+    ratio_df = download_xbank_xusin_ratio()
+    if ratio_df is not None:
+        print("   -> Rasyo verisi ana tabloya eklenecek...")
+
+    print("\n3. Teknik İndikatörler Hesaplanıyor (ATR, OBV, MFI)...")
+    print("   (Bu işlem veri boyutuna göre biraz zaman alabilir, lütfen bekleyin)")
+
+    df = _prepare_frame(df, ratio_df, workers)
+
+    print("\n4. Veritabanına kaydediliyor (model_data güncelleniyor)...")
+    started = time.perf_counter()
 
     try:
-        df.to_sql('model_data', conn, if_exists='replace', index=False)
+        if replace:
+            model_schema.replace_model_data(conn, df)
+        else:
+            columns = INCREMENTAL_COLUMNS + [c for c in ['xbank_xusin_ratio'] if c in df.columns]
+            db_writer.upsert_columns(conn, 'model_data', model_schema.storage_frame(conn, df),
+                                     model_schema.MODEL_KEYS, columns, commit=False)
+            # Yeni eklenen kolonlar görünümün kolon listesine girsin
+            model_schema.refresh_model_view(conn)
 
-        cursor = conn.cursor()
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_symbol_date ON model_data (symbol, date)")
+        # Kolonlar baştan hesaplandı; artımlı mod durumları yeniden kurmalı
+        conn.execute(f"DROP TABLE IF EXISTS {indicators.STATE_TABLE}")
+        conn.commit()
 
         conn.close()
-        print("BAŞARILI: İşlem tamamlandı.")
+        print(f"BAŞARILI: İşlem tamamlandı ({'replace' if replace else 'kolon güncelleme'}: "
+              f"{format_throughput(len(df), time.perf_counter() - started)}).")
 
         check_cols = ['symbol', 'date', 'atr', 'obv', 'mfi', 'xbank_xusin_ratio']
         existing_cols = [c for c in check_cols if c in df.columns]
         print(df[existing_cols].tail())
+        return True
 
     except Exception as e:
         print(f"Kayıt Hatası: {e}")
         if conn: conn.close()
+        return False
+
+
+def add_new_features_streaming(db_name=DB_NAME, batch_size=STREAM_BATCH_SIZE, workers=1):
+    """
+    add_new_features ile aynı sonucu, her seferinde yalnızca `batch_size` sembolü
+    bellekte tutarak üretir. Her parti ara tabloya yazılıp commit edilir; yarıda
+    kalan bir çalışma tekrar başlatıldığında biten semboller atlanır. Bütün semboller
+    bitince ara tablo model_data'nın yerine geçer. Takas başarılıysa True döndürür.
+    """
+    conn = sqlite3.connect(db_name)
+    model_schema.ensure_compact(conn)
+
+    symbols = [row[0] for row in conn.execute("SELECT DISTINCT symbol FROM model_data ORDER BY symbol")]
+    done = set()
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (STREAM_TABLE,)).fetchone():
+        done = {row[0] for row in conn.execute(f"SELECT DISTINCT symbol FROM {STREAM_TABLE}")}
+    pending = [s for s in symbols if s not in done]
+
+    print(f"1. {len(symbols)} sembol bulundu, {len(done)} tanesi önceki çalışmada tamamlanmış.")
+
+    print("\n2. XBANK ve XUSIN verileri seri önbelleğinden alınıyor (yalnızca yeni barlar indirilir)...")
+    ratio_df = download_xbank_xusin_ratio()
+
+    print(f"\n3. İndikatörler {batch_size} sembollük partiler halinde hesaplanıyor...")
+    started = time.perf_counter()
+    total_rows = 0
+
+    for i in range(0, len(pending), batch_size):
+        batch = pending[i:i + batch_size]
+        placeholders = ", ".join("?" * len(batch))
+        df = model_schema.read_model_data(conn, where=f"symbol IN ({placeholders})", params=tuple(batch))
+
+        df = _prepare_frame(df, ratio_df, workers)
+
+        try:
+            # Ara tablo da kompakt şemada; takas sonrası yeniden düzenleme gerekmez
+            model_schema.create_compact_table(conn, STREAM_TABLE, model_schema.frame_column_types(df))
+            df['date'] = model_schema.to_day_number(df['date'])
+            db_writer.upsert_rows(conn, STREAM_TABLE, df, model_schema.MODEL_KEYS, commit=False)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"Kayıt Hatası ({batch[0]}..{batch[-1]}): {e}")
+            conn.close()
+            return False
+
+        total_rows += len(df)
+        print(f"   [{min(i + batch_size, len(pending))}/{len(pending)}] "
+              f"{format_throughput(total_rows, time.perf_counter() - started)}")
+        del df
+
+    print("\n4. model_data yeni tablo ile değiştiriliyor...")
+    try:
+        conn.execute("BEGIN")
+        model_schema.drop_model_view(conn)
+        conn.execute("DROP TABLE model_data")
+        conn.execute(f"ALTER TABLE {STREAM_TABLE} RENAME TO model_data")
+        model_schema.refresh_model_view(conn)
+        conn.execute(f"DROP TABLE IF EXISTS {indicators.STATE_TABLE}")
+        conn.commit()
+        print(f"BAŞARILI: {format_throughput(total_rows, time.perf_counter() - started)}")
+        return True
+    except Exception as e:
+        conn.rollback()
+        print(f"Tablo değiştirme hatası: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def benchmark_indicator_engines(db_name=DB_NAME, limit=None, workers=1):
+    """
+    groupby + pandas_ta (compute_indicators) yolu ile vektörel motoru aynı veri
+    üzerinde karşılaştırır: süre, hızlanma ve kolon başına en büyük göreli fark.
+    """
+    conn = sqlite3.connect(db_name)
+    symbols = [row[0] for row in conn.execute("SELECT DISTINCT symbol FROM model_data ORDER BY symbol")]
+    if limit:
+        symbols = symbols[:limit]
+    placeholders = ", ".join("?" * len(symbols))
+    df = model_schema.read_model_data(conn, ['symbol', 'date', 'close', 'high', 'low', 'volume'],
+                                      where=f"symbol IN ({placeholders})", params=tuple(symbols))
+    conn.close()
+    df['date'] = pd.to_datetime(df['date'])
+    for col in ['high', 'low', 'close', 'volume']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    print(f"{len(symbols)} sembol, {len(df):,} satır")
+
+    started = time.perf_counter()
+    old = pd.concat([compute_indicators(sub_df) for _, sub_df in df.groupby('symbol', sort=False)],
+                    ignore_index=True)
+    old_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    new = _panel_indicators(df.copy())
+    new_seconds = time.perf_counter() - started
+
+    parallel_seconds = None
+    if workers > 1:
+        started = time.perf_counter()
+        parallel = _panel_indicators(df.copy(), workers)
+        parallel_seconds = time.perf_counter() - started
+        identical = all(np.array_equal(parallel[c].to_numpy(), new[c].to_numpy(), equal_nan=True)
+                        for c in INCREMENTAL_COLUMNS)
+
+    old = old.sort_values(['symbol', 'date'], kind='mergesort').reset_index(drop=True)
+    print(f"groupby + pandas_ta : {format_throughput(len(df), old_seconds)}")
+    print(f"vektörel motor      : {format_throughput(len(df), new_seconds)}")
+    print(f"hızlanma            : {old_seconds / new_seconds:.1f}x")
+    if parallel_seconds is not None:
+        print(f"{workers} işçi ile motor    : {format_throughput(len(df), parallel_seconds)} "
+              f"(tek işçiyle {'birebir aynı' if identical else 'FARKLI'})")
+    for col in INCREMENTAL_COLUMNS:
+        a = pd.to_numeric(old[col], errors='coerce').to_numpy(dtype=float)
+        b = new[col].to_numpy(dtype=float)
+        both = ~np.isnan(a) & ~np.isnan(b)
+        diff = np.abs(a[both] - b[both]) / np.maximum(np.abs(a[both]), 1.0)
+        print(f"   {col}: en büyük göreli fark {diff.max() if both.any() else 0.0:.2e}, "
+              f"NaN uyuşmazlığı {int((np.isnan(a) != np.isnan(b)).sum())}")
+
+
+def add_new_features_incremental(db_name=DB_NAME):
+    """
+    ATR/OBV/MFI'yi yalnızca indicator_state tablosundaki son tarihten sonra gelen
+    satırlar için hesaplar ve model_data'da yerinde günceller. Durumu olmayan
+    (veya ısınma süresini doldurmamış) semboller bir kez tam hesaplanır.
+    Hata istisna olarak yükselir; tamamlanınca True döndürür.
+    """
+    conn = sqlite3.connect(db_name)
+    model_schema.ensure_compact(conn)
+
+    symbols = [row[0] for row in conn.execute("SELECT DISTINCT symbol FROM model_data ORDER BY symbol")]
+    print(f"1. {len(symbols)} sembol bulundu.")
+
+    print("\n2. XBANK ve XUSIN verileri seri önbelleğinden alınıyor (yalnızca yeni barlar indirilir)...")
+    ratio_df = download_xbank_xusin_ratio()
+    ratio = {}
+    if ratio_df is not None:
+        ratio = dict(zip(ratio_df['date'].dt.strftime('%Y-%m-%d'), ratio_df['xbank_xusin_ratio']))
+
+    print("\n3. Yeni barlar için indikatörler durumdan devam edilerek hesaplanıyor...")
+    started = time.perf_counter()
+    total_rows = extended = rebuilt = 0
+
+    for symbol in symbols:
+        saved = indicators.load_state(conn, symbol)
+        price_cols = ['date', 'close', 'high', 'low', 'volume']
+
+        if saved is not None and saved[1]['n_rows'] >= indicators.MIN_STATE_ROWS:
+            df = model_schema.read_model_data(conn, price_cols, "symbol = ? AND date > ?",
+                                              (symbol, model_schema.date_param(conn, saved[0])), "date")
+            if df.empty:
+                continue
+            out, state = indicators.extend_indicators(df, saved[1])
+            extended += 1
+        else:
+            df = model_schema.read_model_data(conn, price_cols, "symbol = ?", (symbol,), "date")
+            if df.empty:
+                continue
+            out, state = indicators.compute_indicators_full(df)
+            if len(df) < 14:
+                out[INCREMENTAL_COLUMNS] = np.nan
+            rebuilt += 1
+
+        updates = out[INCREMENTAL_COLUMNS].assign(symbol=symbol, date=df['date'].to_numpy())
+        columns = list(INCREMENTAL_COLUMNS)
+        if ratio:
+            updates['xbank_xusin_ratio'] = updates['date'].map(ratio)
+            columns.append('xbank_xusin_ratio')
+        db_writer.upsert_columns(conn, 'model_data', model_schema.storage_frame(conn, updates),
+                                 model_schema.MODEL_KEYS, columns, commit=False)
+        indicators.save_state(conn, symbol, df['date'].iloc[-1], state)
+        conn.commit()
+        total_rows += len(updates)
+
+    model_schema.refresh_model_view(conn)
+    conn.commit()
+    conn.close()
+    print(f"BAŞARILI: {extended} sembol uzatıldı, {rebuilt} sembol tam hesaplandı; "
+          f"{format_throughput(total_rows, time.perf_counter() - started)}")
+    return True
 
 
 if __name__ == "__main__":
-    add_new_features()
+    parser = argparse.ArgumentParser(description="model_data tablosuna ATR/OBV/MFI ve XBANK/XUSIN rasyosu ekler.")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--stream", action="store_true",
+                        help="Sembolleri partiler halinde işle (sabit bellek, kaldığı yerden devam)")
+    parser.add_argument("--batch-size", type=int, default=STREAM_BATCH_SIZE)
+    parser.add_argument("--incremental", action="store_true",
+                        help="Yalnızca son çalışmadan sonra eklenen satırları hesapla (kayıtlı indikatör durumundan)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="pandas_ta yolu ile vektörel motoru karşılaştır (veritabanına yazmaz)")
+    parser.add_argument("--limit", type=int, default=None, help="--benchmark için sembol sayısı sınırı")
+    parser.add_argument("--replace", action="store_true",
+                        help="Eski yol: model_data'yı kolon güncellemesi yerine baştan yaz")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="İndikatörleri bu kadar süreçte paralel hesapla (sonuç işçi sayısından bağımsız)")
+    parser.add_argument("--panel-dir", default=panel_tensor.PANEL_TENSOR_DIR,
+                        help="Bitince sembol × gün × özellik tensörünün yazılacağı dizin (bkz. panel_tensor.py)")
+    parser.add_argument("--no-panel", action="store_true", help="Panel tensörünü yeniden kurma")
+    args = parser.parse_args()
+
+    ok = False
+    if args.benchmark:
+        benchmark_indicator_engines(args.db, args.limit, args.workers)
+    elif args.incremental:
+        ok = add_new_features_incremental(args.db)
+    elif args.stream:
+        ok = add_new_features_streaming(args.db, args.batch_size, args.workers)
+    else:
+        ok = add_new_features(args.db, args.workers, args.replace)
+
+    if not args.benchmark and not args.no_panel:
+        if not ok:
+            print("\nmodel_data güncellenemedi; panel tensörü yeniden kurulmuyor (son sağlam tensör korunuyor).")
+        else:
+            print("\n5. Panel tensörü kuruluyor (sembol × işlem günü × özellik, float32)...")
+            started = time.perf_counter()
+            panel_tensor.build_panel_tensor(args.db, args.panel_dir)
+            print(f"   -> {panel_tensor.describe(args.panel_dir)} ({time.perf_counter() - started:.1f} sn)")
@@ -7,21 +7,23 @@
 
 from flask import Flask, jsonify, request
 from flask_cors import CORS
+import os
 import sqlite3
+import time
+import threading
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from sklearn.preprocessing import StandardScaler
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split, KFold
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
-try:
-    from xgboost import XGBRegressor
-    XGBOOST_AVAILABLE = True
-except ImportError:
-    XGBOOST_AVAILABLE = False
-    print("XGBoost not available. Install with: pip install xgboost")
+import indicators
+import model_schema
+import model_roster
+import panel_model
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -30,6 +32,24 @@ CORS(app)
 
 DB_PATH = "bist_model_ready.db"
 
+# Upper bound (seconds) on model training per prediction request
+TRAINING_TIME_BUDGET = 20.0
+
+DEFAULT_DAYS_AHEAD = 30
+
+# Longest horizon accepted from ?horizons=
+MAX_DAYS_AHEAD = 252
+
+# 'symbol' trains per request; 'panel' serves the pooled model from panel_model.py
+PREDICTION_MODE = 'symbol'
+
+# Memory budget for cached per-symbol frames (least recently used are evicted first)
+FRAME_CACHE_BYTES = 256 * 1024 * 1024
+
+# Seconds after which a cached frame's data watermark is re-checked even if
+# the database file looks unchanged
+FRAME_CACHE_REVALIDATE_SECONDS = 60.0
+
 ACTUAL_COLUMNS = [
     'symbol', 'date', 'close', 'weighted_average_try', 'low', 'high', 'volume_try',
     'bist', 'usd_kur_price', 'close_usd', 'relative_to_index', 'volume_usd',
@@ -40,6 +60,25 @@ ACTUAL_COLUMNS = [
     'brent_oil', 'sp500', 'vix', 'xbank_xusin_ratio', 'atr', 'obv', 'mfi'
 ]
 
+# Derived columns -> indicator registry columns (see indicators.py)
+TRAINING_FEATURES = {
+    'returns': 'pct_change',
+    'log_returns': 'log_return',
+    'volatility_20': 'VOL_20',
+    'volatility_50': 'VOL_50',
+    'momentum_10': 'MOM_10',
+    'momentum_20': 'MOM_20',
+}
+
+CHART_INDICATORS = {
+    'returns': 'pct_change',
+    'ma_20': 'SMA_20',
+    'ma_50': 'SMA_50',
+    'ma_200': 'SMA_200',
+    'volatility': 'VOL_20',
+    'z_score': 'ZSCORE_20',
+}
+
 def get_db_connection():
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
@@ -51,146 +90,463 @@ def safe_column_name(col):
         return f'"{col}"'
     return col
 
-def train_and_predict_model(symbol, days_ahead=30):
-    """Train multiple ML models and return the best prediction"""
-    conn = get_db_connection()
-    
-    columns_str = ', '.join([safe_column_name(col) for col in ACTUAL_COLUMNS])
-    query = f"""
-    SELECT {columns_str}
-    FROM model_data 
-    WHERE symbol = ? 
-    ORDER BY date ASC
+_last_predictions = {}
+_last_predictions_lock = threading.Lock()
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into a single execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait for it and receive the same result (or exception).
     """
-    
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = {'event': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+        
+        if not leader:
+            call['event'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+        
+        try:
+            call['result'] = fn(*args, **kwargs)
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['event'].set()
+        return call['result']
+
+    def stats(self):
+        with self._lock:
+            return {
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls)
+            }
+
+_training_flights = SingleFlight()
+
+def get_data_watermark(symbol, conn=None):
+    """Latest date and row count stored for a symbol; changes whenever new bars land"""
+    own = conn is None
+    conn = conn or get_db_connection()
     try:
-        df = pd.read_sql_query(query, conn, params=(symbol,))
-        conn.close()
-    except Exception as e:
-        conn.close()
-        print(f"Error fetching data for {symbol}: {e}")
-        return None
-    
-    if len(df) < 200:
-        return None
-    
-    df['date'] = pd.to_datetime(df['date'])
-    
-    df['returns'] = df['close'].pct_change()
-    df['log_returns'] = np.log(df['close'] / df['close'].shift(1))
-    df['volatility_20'] = df['returns'].rolling(window=20).std()
-    df['volatility_50'] = df['returns'].rolling(window=50).std()
-    df['momentum_10'] = df['close'] - df['close'].shift(10)
-    df['momentum_20'] = df['close'] - df['close'].shift(20)
-    
-    df['target'] = df['close'].shift(-days_ahead)
-    
-    df = df.dropna()
-    
-    if len(df) < 100:
+        row = conn.execute(
+            "SELECT MAX(date) AS last_date, COUNT(*) AS row_count FROM model_data WHERE symbol = ?",
+            (symbol,)
+        ).fetchone()
+    finally:
+        if own:
+            conn.close()
+    return (row['last_date'], row['row_count'])
+
+def db_file_signature(db_path=None):
+    """(mtime, size) of the database file and its WAL; changes on every committed write"""
+    db_path = db_path or DB_PATH
+    signature = []
+    for path in (db_path, f"{db_path}-wal"):
+        try:
+            st = os.stat(path)
+            signature.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+class FrameCache:
+    """LRU cache of full-history per-symbol frames, bounded by memory bytes.
+
+    Frames hold the ACTUAL_COLUMNS present in the database, with a datetime64
+    ``date``, float64 values and a categorical ``symbol``, sorted by date.
+    Every lookup compares the database file signature with the one the frame
+    was loaded under, and frames older than ``revalidate_after`` also compare
+    their data watermark; on any difference the frame is reloaded.
+    Concurrent misses for the same symbol share one read. Returned frames are
+    shared and must not be modified; use ``slice`` for a private copy.
+    """
+
+    def __init__(self, max_bytes=FRAME_CACHE_BYTES, revalidate_after=FRAME_CACHE_REVALIDATE_SECONDS):
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._loads = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _load(self, symbol, signature):
+        conn = get_db_connection()
+        try:
+            source = model_schema.model_source(conn)
+            existing = {row[1] for row in conn.execute(f"PRAGMA table_info({source})")}
+            columns_str = ', '.join(safe_column_name(col) for col in ACTUAL_COLUMNS if col in existing)
+            query = f"""
+            SELECT {columns_str}
+            FROM {source}
+            WHERE symbol = ?
+            ORDER BY {model_schema.date_key(conn, source)} ASC
+            """
+            df = pd.read_sql_query(query, conn, params=(symbol,))
+            watermark = get_data_watermark(symbol, conn)
+        finally:
+            conn.close()
+
+        df['symbol'] = df['symbol'].astype('category')
+        df['date'] = pd.to_datetime(df['date'])
+        numeric = [col for col in df.columns if col not in ('symbol', 'date')]
+        df[numeric] = df[numeric].apply(pd.to_numeric, errors='coerce').astype('float64')
+        return {
+            'frame': df,
+            'nbytes': int(df.memory_usage(deep=True).sum()),
+            'signature': signature,
+            'watermark': watermark,
+            'checked': time.monotonic(),
+        }
+
+    def _is_valid(self, symbol, entry, signature):
+        if entry['signature'] != signature:
+            return False
+        if time.monotonic() - entry['checked'] < self.revalidate_after:
+            return True
+        if get_data_watermark(symbol) != entry['watermark']:
+            return False
+        entry['checked'] = time.monotonic()
+        return True
+
+    def _store(self, symbol, entry):
+        with self._lock:
+            old = self._entries.pop(symbol, None)
+            if old is not None:
+                self._bytes -= old['nbytes']
+            if entry['nbytes'] > self.max_bytes:
+                return
+            self._entries[symbol] = entry
+            self._bytes += entry['nbytes']
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted['nbytes']
+                self.evictions += 1
+
+    def get(self, symbol):
+        """Full history of a symbol (empty frame if unknown)"""
+        signature = db_file_signature()
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is not None:
+                self._entries.move_to_end(symbol)
+        if entry is not None:
+            if self._is_valid(symbol, entry, signature):
+                with self._lock:
+                    self.hits += 1
+                return entry['frame']
+            with self._lock:
+                self.invalidations += 1
+
+        with self._lock:
+            self.misses += 1
+        entry = self._loads.do((symbol, signature), self._load, symbol, signature)
+        self._store(symbol, entry)
+        return entry['frame']
+
+    def slice(self, symbol, start_date=None, end_date=None, columns=None):
+        """Copy of the rows with start_date <= date <= end_date (both days inclusive)"""
+        df = self.get(symbol)
+        dates = df['date'].values
+        lo = 0 if start_date is None else dates.searchsorted(np.datetime64(pd.Timestamp(start_date).normalize()), 'left')
+        hi = len(df) if end_date is None else dates.searchsorted(
+            np.datetime64(pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)), 'left')
+        part = df.iloc[lo:hi] if columns is None else df.iloc[lo:hi][columns]
+        return part.reset_index(drop=True).copy()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'loads': self._loads.stats()
+            }
+
+_frame_cache = FrameCache()
+
+def predict_symbol(symbol, horizons=(DEFAULT_DAYS_AHEAD,), time_budget=None, tier=None, model_names=None):
+    """Run train_and_predict_horizons, sharing one computation between concurrent identical requests.
+
+    Requests are keyed by (symbol, horizons, roster, data watermark); a caller
+    that joins an in-flight computation gets its result regardless of its own
+    time budget. Returns {horizon: prediction} or None.
+    """
+    horizons = tuple(sorted({int(h) for h in horizons}))
+    roster = tuple(model_roster.resolve_model_names(tier, model_names))
+    key = (symbol, horizons, roster, get_data_watermark(symbol))
+    return _training_flights.do(key, train_and_predict_horizons, symbol, horizons, time_budget, tier, model_names)
+
+def _score_predictions(y_true, y_pred):
+    """Test-set metrics for one target column"""
+    test_r2 = r2_score(y_true, y_pred)
+    return {
+        'test_r2': float(test_r2),
+        'rmse': float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        'mae': float(mean_absolute_error(y_true, y_pred)),
+        'accuracy': float(max(0, min(100, test_r2 * 100)))
+    }
+
+def _cross_val_r2(model, X, y, folds):
+    """Mean out-of-fold R² (same folds as cross_val_score)"""
+    scores = []
+    for train_idx, val_idx in KFold(n_splits=folds).split(X):
+        fold_model = clone(model).fit(X[train_idx], y[train_idx])
+        scores.append(r2_score(y[val_idx], fold_model.predict(X[val_idx])))
+    return float(np.mean(scores))
+
+def _horizon_dataset(df, horizon):
+    """Training matrix for one horizon: every row whose close `horizon` bars ahead is known.
+
+    Built from the horizon alone, so a horizon's model and prediction do not
+    depend on which other horizons are requested with it. Returns None if
+    there is too little data.
+    """
+    target = df['close'].shift(-horizon)
+    train_df = df[target.notna()]
+    y = target[target.notna()]
+    if len(train_df) < 100:
         return None
     
-    feature_cols = [col for col in df.columns if col not in ['symbol', 'date', 'target']]
+    feature_cols = [col for col in df.columns if col not in ['symbol', 'date']]
     feature_cols = [col for col in feature_cols if df[col].dtype in ['float64', 'int64']]
     
     valid_features = []
     for col in feature_cols:
-        if df[col].notna().sum() > len(df) * 0.5 and df[col].std() > 0:
+        if train_df[col].notna().sum() > len(train_df) * 0.5 and train_df[col].std() > 0:
             valid_features.append(col)
     
     if len(valid_features) < 5:
         return None
     
-    X = df[valid_features].fillna(0)
-    y = df['target']
-    
+    X = train_df[valid_features].fillna(0)
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
     
     scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
-    
-    models = {
-        'Random Forest': RandomForestRegressor(n_estimators=100, max_depth=10, random_state=42, n_jobs=-1),
-        'Gradient Boosting': GradientBoostingRegressor(n_estimators=100, max_depth=5, random_state=42),
-        'Linear Regression': LinearRegression()
+    return {
+        'train_df': train_df,
+        'target': y,
+        'valid_features': valid_features,
+        'X_train': scaler.fit_transform(X_train),
+        'X_test': scaler.transform(X_test),
+        'y_train': y_train.values,
+        'y_test': y_test.values,
+        'latest_features': scaler.transform(df[valid_features].fillna(0).iloc[-1:].values),
+        'cv_folds': min(5, len(X_train)//20),
     }
+
+def train_and_predict_horizons(symbol, horizons=(30,), time_budget=None, tier=None, model_names=None):
+    """Train the model roster for several horizons and return {horizon: prediction}.
+
+    Data loading and indicator features are shared by every horizon; each
+    horizon then trains on its own rows (those whose target is known), so its
+    result matches a single-horizon request. Models run cheapest-first and
+    training stops once the budget is spent, checked between horizons as
+    well; the best model so far is returned with ``partial`` set. If no model
+    finishes for a horizon, the last cached prediction (or a plain Linear
+    Regression) is returned. Horizons without enough data map to None.
+    """
+    horizons = sorted({int(h) for h in horizons})
+    if time_budget is None:
+        time_budget = TRAINING_TIME_BUDGET
+    started = time.monotonic()
+    deadline = started + time_budget
+
+    # Macro inputs (Brent, SP500, VIX) are joined by date at read time
+    try:
+        df = _frame_cache.slice(symbol)
+    except Exception as e:
+        print(f"Error fetching data for {symbol}: {e}")
+        return None
     
-    if XGBOOST_AVAILABLE:
-        models['XGBoost'] = XGBRegressor(n_estimators=100, max_depth=6, learning_rate=0.1, random_state=42, n_jobs=-1)
+    if len(df) < 200:
+        return None
     
-    best_model = None
-    best_model_name = None
-    best_r2 = -np.inf
-    model_results = {}
+    features = indicators.compute(df, list(TRAINING_FEATURES.values()))
+    for name, column in TRAINING_FEATURES.items():
+        df[name] = features[column]
     
-    for name, model in models.items():
-        try:
-            model.fit(X_train_scaled, y_train)
-            y_pred_test = model.predict(X_test_scaled)
-            
-            test_r2 = r2_score(y_test, y_pred_test)
-            test_rmse = np.sqrt(mean_squared_error(y_test, y_pred_test))
-            test_mae = mean_absolute_error(y_test, y_pred_test)
-            
-            cv_scores = cross_val_score(model, X_train_scaled, y_train, cv=min(5, len(X_train)//20), scoring='r2')
-            
-            model_results[name] = {
-                'test_r2': float(test_r2),
-                'cv_r2': float(cv_scores.mean()),
-                'rmse': float(test_rmse),
-                'mae': float(test_mae),
-                'accuracy': float(max(0, min(100, test_r2 * 100)))
-            }
-            
-            if test_r2 > best_r2:
-                best_r2 = test_r2
-                best_model = model
-                best_model_name = name
-        except Exception as e:
-            print(f"Error training {name}: {e}")
-            continue
+    # Rows with complete features; the newest of them is what we predict from
+    df = df.dropna().reset_index(drop=True)
     
-    if best_model is None:
+    datasets = {h: _horizon_dataset(df, h) for h in horizons}
+    horizons = [h for h in horizons if datasets[h] is not None]
+    if not horizons:
         return None
     
-    last_features = X.iloc[-1:].values
-    last_features_scaled = scaler.transform(last_features)
-    future_prediction = best_model.predict(last_features_scaled)[0]
+    if not model_names:
+        tier = tier or model_roster.load_roster_config()['default_tier']
+    models = model_roster.build_models(tier, model_names)
     
-    current_price = float(df['close'].iloc[-1])
-    predicted_change = ((future_prediction - current_price) / current_price) * 100
+    model_results = {h: {} for h in horizons}
+    fitted = {h: {} for h in horizons}
+    skipped_models = []
+    partial = False
     
-    feature_importance = {}
-    if hasattr(best_model, 'feature_importances_'):
-        importances = best_model.feature_importances_
-        indices = np.argsort(importances)[::-1][:10]
-        feature_importance = {valid_features[i]: float(importances[i]) for i in indices}
+    for name, model in models.items():
+        if time.monotonic() >= deadline:
+            skipped_models.append(name)
+            partial = True
+            continue
+        for h in horizons:
+            if time.monotonic() >= deadline:
+                partial = True
+                break
+            data = datasets[h]
+            try:
+                fit_started = time.monotonic()
+                horizon_model = clone(model).fit(data['X_train'], data['y_train'])
+                fit_seconds = time.monotonic() - fit_started
+                
+                result = _score_predictions(data['y_test'], horizon_model.predict(data['X_test']))
+                result['cv_r2'] = None
+                
+                # Cross-validation costs roughly one fit per fold; skip it when
+                # that would overrun the deadline.
+                folds = data['cv_folds']
+                if folds >= 2 and time.monotonic() + fit_seconds * folds <= deadline:
+                    result['cv_r2'] = _cross_val_r2(model, data['X_train'], data['y_train'], folds)
+                else:
+                    partial = True
+                
+                result['train_seconds'] = float(time.monotonic() - fit_started)
+                model_results[h][name] = result
+                fitted[h][name] = horizon_model
+            except Exception as e:
+                print(f"Error training {name} ({h}d): {e}")
+                continue
     
-    correlations = df[valid_features + ['target']].corr()['target'].drop('target')
-    top_correlations = correlations.abs().sort_values(ascending=False)[:10]
+    current_price = float(df['close'].iloc[-1])
     
-    return {
-        'current_price': current_price,
-        'predicted_price': float(future_prediction),
-        'predicted_change_percent': float(predicted_change),
-        'best_model': best_model_name,
-        'model_metrics': model_results[best_model_name],
-        'all_models': model_results,
-        'accuracy': float(max(0, min(100, best_r2 * 100))),
-        'confidence': 'High' if best_r2 > 0.7 else 'Medium' if best_r2 > 0.5 else 'Low',
-        'prediction_basis': {
-            'model': best_model_name,
-            'features_used': len(valid_features),
-            'feature_names': valid_features[:20],
-            'training_samples': len(X_train),
-            'test_samples': len(X_test),
-            'cross_validation_folds': min(5, len(X_train)//20),
-            'top_features': feature_importance,
-            'top_correlations': {k: float(v) for k, v in top_correlations.items()}
-        },
-        'days_ahead': days_ahead
-    }
+    results = {h: None for h in datasets}
+    for h in horizons:
+        data = datasets[h]
+        model_roster.record_tradeoffs(symbol, h, tier, model_results[h])
+        
+        fallback = None
+        if model_results[h]:
+            best_model_name = max(model_results[h], key=lambda n: model_results[h][n]['test_r2'])
+            best_model = fitted[h][best_model_name]
+        else:
+            with _last_predictions_lock:
+                cached = _last_predictions.get((symbol, h))
+            if cached is not None:
+                results[h] = {**cached, 'partial': True, 'fallback': 'cached'}
+                continue
+            try:
+                best_model = LinearRegression().fit(data['X_train'], data['y_train'])
+            except Exception as e:
+                print(f"Error training fallback model for {symbol}: {e}")
+                continue
+            best_model_name = 'Linear Regression'
+            model_results[h][best_model_name] = {
+                **_score_predictions(data['y_test'], best_model.predict(data['X_test'])),
+                'cv_r2': None
+            }
+            fallback = best_model_name
+        
+        valid_features = data['valid_features']
+        best_r2 = model_results[h][best_model_name]['test_r2']
+        future_prediction = best_model.predict(data['latest_features'])[0]
+        predicted_change = ((future_prediction - current_price) / current_price) * 100
+        
+        feature_importance = {}
+        if hasattr(best_model, 'feature_importances_'):
+            importances = best_model.feature_importances_
+            indices = np.argsort(importances)[::-1][:10]
+            feature_importance = {valid_features[i]: float(importances[i]) for i in indices}
+        
+        correlations = data['train_df'][valid_features].corrwith(data['target'])
+        top_correlations = correlations.abs().sort_values(ascending=False)[:10]
+        
+        result = {
+            'current_price': current_price,
+            'predicted_price': float(future_prediction),
+            'predicted_change_percent': float(predicted_change),
+            'best_model': best_model_name,
+            'model_metrics': model_results[h][best_model_name],
+            'all_models': model_results[h],
+            'accuracy': float(max(0, min(100, best_r2 * 100))),
+            'confidence': 'High' if best_r2 > 0.7 else 'Medium' if best_r2 > 0.5 else 'Low',
+            'prediction_basis': {
+                'model': best_model_name,
+                'features_used': len(valid_features),
+                'feature_names': valid_features[:20],
+                'training_samples': len(data['X_train']),
+                'test_samples': len(data['X_test']),
+                'cross_validation_folds': data['cv_folds'],
+                'top_features': feature_importance,
+                'top_correlations': {k: float(v) for k, v in top_correlations.items()}
+            },
+            'days_ahead': h,
+            'tier': tier,
+            'partial': partial or fallback is not None,
+            'skipped_models': skipped_models,
+            'fallback': fallback,
+            'time_budget_seconds': float(time_budget),
+            'elapsed_seconds': float(time.monotonic() - started)
+        }
+        
+        if fallback is None:
+            with _last_predictions_lock:
+                _last_predictions[(symbol, h)] = result
+        results[h] = result
+    
+    return results
+
+def train_and_predict_model(symbol, days_ahead=30, time_budget=None, tier=None, model_names=None):
+    """Train multiple ML models within a time budget and return the best prediction for one horizon"""
+    results = train_and_predict_horizons(symbol, [days_ahead], time_budget, tier, model_names)
+    return results.get(days_ahead) if results else None
+
+def parse_horizons(value):
+    """Parse ?horizons=1,5,30 into a sorted list of day counts"""
+    if not value:
+        return [DEFAULT_DAYS_AHEAD]
+    try:
+        horizons = sorted({int(h) for h in value.split(',') if h.strip()})
+    except ValueError:
+        raise ValueError(f'Invalid horizons: {value}')
+    if not horizons or horizons[0] < 1 or horizons[-1] > MAX_DAYS_AHEAD:
+        raise ValueError(f'Horizons must be between 1 and {MAX_DAYS_AHEAD} days')
+    return horizons
 
 @app.route('/api/symbols', methods=['GET'])
 def get_symbols():
@@ -207,35 +563,18 @@ def get_symbol_data(symbol):
     start_date = request.args.get('start_date', '1997-01-01')
     end_date = request.args.get('end_date', datetime.now().strftime('%Y-%m-%d'))
     
-    conn = get_db_connection()
-    
-    columns_str = ', '.join([safe_column_name(col) for col in ACTUAL_COLUMNS])
-    query = f"""
-    SELECT {columns_str}
-    FROM model_data 
-    WHERE symbol = ? AND date BETWEEN ? AND ?
-    ORDER BY date ASC
-    """
-    
     try:
-        df = pd.read_sql_query(query, conn, params=(symbol, start_date, end_date))
-        conn.close()
+        df = _frame_cache.slice(symbol, start_date, end_date)
     except Exception as e:
-        conn.close()
         return jsonify({'error': f'Database error: {str(e)}'}), 500
     
     if df.empty:
         return jsonify({'error': 'Symbol not found or no data available'}), 404
     
-    df['date'] = pd.to_datetime(df['date'])
-    
-    df['returns'] = df['close'].pct_change()
+    chart = indicators.compute(df, list(CHART_INDICATORS.values()))
+    for name, column in CHART_INDICATORS.items():
+        df[name] = chart[column]
     df['cumulative_returns'] = (1 + df['returns']).cumprod() - 1
-    df['ma_20'] = df['close'].rolling(window=20).mean()
-    df['ma_50'] = df['close'].rolling(window=50).mean()
-    df['ma_200'] = df['close'].rolling(window=200).mean()
-    df['volatility'] = df['returns'].rolling(window=20).std()
-    df['z_score'] = (df['close'] - df['close'].rolling(window=20).mean()) / df['close'].rolling(window=20).std()
     df['normalized_price'] = (df['close'] - df['close'].min()) / (df['close'].max() - df['close'].min())
     df['signal'] = 0
     df.loc[df['ma_20'] > df['ma_50'], 'signal'] = 1
@@ -265,8 +604,31 @@ def get_symbol_data(symbol):
         }
     }
     
-    print(f"Training AI model for {symbol}...")
-    prediction = train_and_predict_model(symbol)
+    time_budget = request.args.get('time_budget', type=float)
+    tier = request.args.get('tier')
+    model_names = [m.strip() for m in request.args.get('models', '').split(',') if m.strip()] or None
+    mode = request.args.get('mode', PREDICTION_MODE)
+    try:
+        horizons = parse_horizons(request.args.get('horizons'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    predictions = None
+    if mode == 'panel':
+        predictions = {h: panel_model.predict_from_panel(symbol, h, db_path=DB_PATH) for h in horizons}
+        if any(p is None for p in predictions.values()):
+            predictions = None
+    
+    if predictions is None:
+        print(f"Training AI model for {symbol}...")
+        try:
+            predictions = predict_symbol(symbol, horizons, time_budget=time_budget, tier=tier, model_names=model_names)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
+    predictions = predictions or {}
+    main_horizon = DEFAULT_DAYS_AHEAD if DEFAULT_DAYS_AHEAD in predictions else max(horizons)
+    prediction = predictions.get(main_horizon)
     
     # Convert to JSON
     data_records = df.fillna(0).to_dict('records')
@@ -283,7 +645,8 @@ def get_symbol_data(symbol):
         'symbol': symbol,
         'data': data_records,
         'statistics': stats_data,
-        'prediction': prediction
+        'prediction': prediction,
+        'predictions': {str(h): p for h, p in predictions.items()}
     })
 
 @app.route('/api/time-range/<symbol>', methods=['GET'])
@@ -306,27 +669,15 @@ def get_time_range_data(symbol):
     
     start_date = end_date - range_mapping.get(range_type, timedelta(days=365))
     
-    conn = get_db_connection()
-    
-    query = """
-    SELECT symbol, date, close, low, high, volume
-    FROM model_data 
-    WHERE symbol = ? AND date BETWEEN ? AND ?
-    ORDER BY date ASC
-    """
-    
     try:
-        df = pd.read_sql_query(query, conn, params=(symbol, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
-        conn.close()
+        df = _frame_cache.slice(symbol, start_date, end_date,
+                                columns=['symbol', 'date', 'close', 'low', 'high', 'volume'])
     except Exception as e:
-        conn.close()
         return jsonify({'error': f'Database error: {str(e)}'}), 500
     
     if df.empty:
         return jsonify({'error': 'No data found'}), 404
     
-    df['date'] = pd.to_datetime(df['date'])
-    
     if 'open' not in df.columns:
         df['open'] = df['close']
     
@@ -359,19 +710,12 @@ def compare_symbols():
     if not symbols or len(symbols) < 2:
         return jsonify({'error': 'At least 2 symbols required'}), 400
     
-    conn = get_db_connection()
     comparison_data = {}
     
     for symbol in symbols:
-        query = """
-        SELECT date, close FROM model_data 
-        WHERE symbol = ? AND date BETWEEN ? AND ?
-        ORDER BY date ASC
-        """
-        df = pd.read_sql_query(query, conn, params=(symbol, start_date, end_date))
+        df = _frame_cache.slice(symbol, start_date, end_date, columns=['date', 'close'])
         
         if not df.empty:
-            df['date'] = pd.to_datetime(df['date'])
             df['returns'] = df['close'].pct_change()
             df['normalized'] = (df['close'] - df['close'].iloc[0]) / df['close'].iloc[0] * 100
             
@@ -382,8 +726,6 @@ def compare_symbols():
                 'returns': df['returns'].fillna(0).tolist()
             }
     
-    conn.close()
-    
     correlation_matrix = {}
     if len(comparison_data) >= 2:
         returns_df = pd.DataFrame({symbol: data['returns'] for symbol, data in comparison_data.items()})
@@ -395,12 +737,28 @@ def compare_symbols():
         'correlation_matrix': correlation_matrix
     })
 
+@app.route('/api/model-tradeoffs', methods=['GET'])
+def get_model_tradeoffs():
+    """Recorded accuracy vs training time per model and per tier"""
+    return jsonify(model_roster.summarize_tradeoffs())
+
+@app.route('/api/stats/training', methods=['GET'])
+def get_training_stats():
+    """Counters for in-flight deduplication of training requests"""
+    return jsonify(_training_flights.stats())
+
+@app.route('/api/stats/cache', methods=['GET'])
+def get_cache_stats():
+    """Hit rate, size and evictions of the per-symbol frame cache"""
+    return jsonify(_frame_cache.stats())
+
 if __name__ == '__main__':
     print("=" * 60)
     print("ForSight Analytics API Server")
     print("=" * 60)
     print(f"Database: {DB_PATH}")
     print(f"Columns: {len(ACTUAL_COLUMNS)}")
-    print("AI Models: Random Forest, Gradient Boosting, Linear Regression")
+    print(f"Frame cache: {FRAME_CACHE_BYTES // (1024 * 1024)} MB")
+    print(f"AI Models ({model_roster.load_roster_config()['default_tier']}): {', '.join(model_roster.resolve_model_names())}")
     print("=" * 60)
     app.run(debug=True, port=5000, host='0.0.0.0')
@@ -0,0 +1,63 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Dogan Ege BULTE
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+# -----------------------------------------------------------------------------
+#
+# Olay (event) serilerinin as-of hizalaması. TCMB faiz kararları gibi seriler
+# yalnızca değiştikleri gün bir satır içerir; herhangi bir tarihteki değer,
+# o tarihte ya da öncesinde yürürlüğe girmiş son olayın değeridir.
+#
+# Her hedef tarih için olay tablosunu ayrı ayrı filtrelemek yerine (aylar x
+# olaylar) sıralı olay tarihleri üzerinde tek bir np.searchsorted çağrısı
+# yapılır: O((olay + hedef) log olay), tek geçiş.
+# -----------------------------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+
+def asof_indices(event_dates, target_dates) -> np.ndarray:
+    """
+    Her hedef tarih için yürürlükteki olayın sırası (event_dates artan sıralı
+    olmalı). Aynı tarihli olaylardan sonuncusu seçilir; hedef ilk olaydan
+    önceyse -1 döner.
+    """
+    events = pd.to_datetime(pd.Series(event_dates)).to_numpy(dtype='datetime64[ns]')
+    targets = pd.to_datetime(pd.Series(target_dates)).to_numpy(dtype='datetime64[ns]')
+    return np.searchsorted(events, targets, side='right') - 1
+
+
+def asof_align(events: pd.DataFrame, target_dates, value_columns: list[str] | None = None,
+               date_column: str = 'date') -> pd.DataFrame:
+    """
+    events'i (date_column + değer kolonları) target_dates üzerine hizalar.
+    Dönen tablo: date (datetime) + value_columns; ilk olaydan önceki tarihler NaN.
+    """
+    value_columns = value_columns or [c for c in events.columns if c != date_column]
+    ordered = events.assign(**{date_column: pd.to_datetime(events[date_column])})
+    ordered = ordered.sort_values(date_column, kind='mergesort')
+
+    targets = pd.to_datetime(pd.Series(target_dates)).reset_index(drop=True)
+    idx = asof_indices(ordered[date_column], targets)
+    valid = idx >= 0
+
+    out = pd.DataFrame({'date': targets})
+    for col in value_columns:
+        values = pd.to_numeric(ordered[col], errors='coerce').to_numpy(dtype=float)
+        column = np.full(len(targets), np.nan)
+        column[valid] = values[idx[valid]]
+        out[col] = column
+    return out
+
+
+def daily_dates(start, end) -> pd.DatetimeIndex:
+    """start..end arasındaki tüm takvim günleri (hafta sonları dahil)."""
+    return pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq='D')
+
+
+def month_end_dates(start, end) -> pd.DatetimeIndex:
+    """start ayından end ayına kadar her ayın son günü."""
+    periods = pd.period_range(pd.Timestamp(start), pd.Timestamp(end), freq='M')
+    return periods.to_timestamp(how='end').normalize()
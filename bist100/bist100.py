@@ -1,58 +1,68 @@
 # -----------------------------------------------------------------------------
 # Copyright (c) 2025 Dogan Ege BULTE
-# 
+#
 # This software is released under the MIT License.
 # https://opensource.org/licenses/MIT
 # -----------------------------------------------------------------------------
 
-import yfinance as yf
-import pandas as pd
-from sqlalchemy import create_engine
-from sqlalchemy.exc import SQLAlchemyError
+import os
+import sqlite3
+import sys
 
-SYMBOL = "XU100.IS"
 
-print(f"{SYMBOL} için veri çekiliyor...")
+# Depo kökündeki ortak modüller (series_cache, db_writer)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import db_writer
+from series_cache import PRICE_COLUMNS, SERIES, SeriesCache
+
+SERIES_NAME = "xu100"
+SYMBOL = SERIES[SERIES_NAME]
+
+print(f"{SYMBOL} için veri seri önbelleğinden alınıyor (yalnızca yeni barlar indirilir)...")
+
+cache = SeriesCache()
 try:
-    df = yf.download(SYMBOL, period="max", interval="1d", auto_adjust=False)
+    cache.update([SERIES_NAME])
 except Exception as e:
     print("Veri çekerken hata oluştu:", e)
     raise
 
+df = cache.load(SERIES_NAME)
+print(cache.format_stats())
+
 if df.empty:
     print("Yahoo Finance veri döndürmedi (DataFrame boş).")
     raise SystemExit(1)
 
-df.reset_index(inplace=True)
-
-if isinstance(df.columns, pd.MultiIndex):
-    new_cols = []
-    for col in df.columns:
-        parts = [str(x) for x in col if x is not None and x != ""]
-        new_cols.append("_".join(parts))
-    df.columns = new_cols
-else:
-    df.columns = [str(c) for c in df.columns]
-
-df.columns = [c.lower() for c in df.columns]
-
-if "date" in df.columns:
-    df["date"] = pd.to_datetime(df["date"]).dt.date
+df["date"] = df["date"].dt.strftime("%Y-%m-%d")
 
 print("Kolonlar:", df.columns)
-print(df.head())
+print(df.tail())
 
-db_url = "sqlite:///bist100.db" 
+db_path = "bist100.db"
 table_name = "bist100_history"
 
-engine = create_engine(db_url)
+conn = sqlite3.connect(db_path)
 
 try:
-    with engine.begin() as conn:
-        df.to_sql(table_name, con=conn, if_exists="replace", index=False)
-    print(f"{len(df)} satır '{table_name}' tablosuna yazıldı.")
-    print("Veritabanı dosyası: bist100.db")
-except SQLAlchemyError as e:
+    # Eski (to_sql replace) tablonun kolonları yfinance sürümüne göre değişiyordu; bir kez yeniden kurulur
+    if (db_writer.table_exists(conn, table_name)
+            and db_writer.table_columns(conn, table_name) != ["date"] + PRICE_COLUMNS):
+        conn.execute(f"DROP TABLE {table_name}")
+
+    # Yalnızca tablodaki son tarihten itibaren (son bar dahil, düzelmiş olabilir) yazılır
+    last = None
+    if db_writer.table_exists(conn, table_name):
+        last = conn.execute(f"SELECT MAX(date) FROM {table_name}").fetchone()[0]
+    new_rows = df if last is None else df[df["date"] >= last]
+
+    written = db_writer.upsert_rows(conn, table_name, new_rows, keys=("date",))
+    print(f"{written} satır '{table_name}' tablosuna yazıldı (toplam {len(df)}).")
+    print("Veritabanı dosyası:", db_path)
+except sqlite3.Error as e:
+    conn.rollback()
     print("DB'ye yazarken hata oluştu:", e)
     raise
+finally:
+    conn.close()
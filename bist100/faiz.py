@@ -13,6 +13,12 @@
 #   3) Bu event'lerden 1996'dan itibaren HER AY için,
 #      AY SONU itibarıyla geçerli reeskont/avans oranını hesaplar
 #      -> tcmb_rediscount_monthly.csv
+#   4) Aynı oranları GÜNLÜK seriye çevirip model veritabanındaki macro_inputs
+#      tablosuna yazar; model_view bunları model_data'ya tarihe göre bağlar.
+#      Yalnızca yeni ya da düzeltilmiş event'lerin etkilediği günler yazılır.
+#
+# Ay sonu ve günlük değerler as-of hizalamayla (asof.py, np.searchsorted)
+# tek geçişte hesaplanır.
 #
 # API KEY GEREKTİRMEZ.
 #
@@ -20,8 +26,9 @@
 #   pip install pandas requests sqlalchemy
 # -----------------------------------------------------------------------------
 
-import calendar
+import os
 import re
+import sqlite3
 import sys
 from dataclasses import dataclass
 from datetime import datetime, date
@@ -32,6 +39,13 @@ import pandas as pd
 from sqlalchemy import create_engine
 from sqlalchemy.exc import SQLAlchemyError
 
+# Depo kökündeki ortak modüller (asof, macro_store, model_schema)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asof
+import macro_store
+import model_schema
+
 # --------------------------- AYARLAR -----------------------------------------
 
 TCMB_REDISCOUNT_URL = (
@@ -49,6 +63,14 @@ DB_URL = "sqlite:///tcmb_policy_rate.db"
 DB_TABLE_EVENTS = "tcmb_policy_events"
 DB_TABLE_MONTHLY = "tcmb_policy_rate"  # senin sorgunda kullandığın isim
 
+# Günlük oranlar model veritabanının macro_inputs tablosuna bu kolonlarla yazılır
+ATTACH_TO_MODEL = True
+MODEL_DB = "bist_model_ready.db"
+MODEL_COLUMNS = {
+    "rediscount_rate": "tcmb_rediscount_rate",
+    "advance_rate": "tcmb_advance_rate",
+}
+
 
 # --------------------------- DATA CLASS --------------------------------------
 
@@ -159,59 +181,31 @@ def compute_monthly_series(events_df: pd.DataFrame, start_year: int = START_YEAR
     reeskont/avans oranını hesaplar.
 
     Mantık:
-      - Her ay için ay sonu tarihi (year, month -> last_day_of_month).
-      - O tarihe kadar gerçekleşmiş SON değişiklik bulunur (effective_date <= ay sonu).
-      - O satırdaki reeskont/avans oranı, o ayın "ay sonu" oranı kabul edilir.
+      - start_year (ya da ilk event'in ayı) ile bugünün ayı arasındaki her ay sonu.
+      - Her ay sonu için yürürlükteki SON değişiklik (effective_date <= ay sonu)
+        tüm aylar için tek bir sıralı aramayla bulunur (asof.asof_align).
     """
     if events_df.empty:
         raise ValueError("Event DataFrame'i boş.")
 
-    # event tarihlerini datetime yap
-    df = events_df.copy()
-    df["date"] = pd.to_datetime(df["effective_date"])
-
-    records: List[MonthlyRediscountRate] = []
-
-    first_year = df["date"].dt.year.min()
-    first_month = df["date"].dt.month.min()
-    last_year = df["date"].dt.year.max()
-    last_month = df["date"].dt.month.max()
-
-    start_year_eff = max(start_year, first_year)
-
-    for year in range(start_year_eff, last_year + 1):
-        if year == first_year:
-            month_start = first_month
-        else:
-            month_start = 1
-
-        if year == last_year:
-            month_end = last_month
-        else:
-            month_end = 12
-
-        for month in range(month_start, month_end + 1):
-            last_day = calendar.monthrange(year, month)[1]
-            month_end_date = datetime(year, month, last_day)
-
-            eligible = df[df["date"] <= month_end_date]
-            if eligible.empty:
-                continue
-
-            last_row = eligible.iloc[-1]
-
-            rec = MonthlyRediscountRate(
-                year=year,
-                month=month,
-                month_end_date=month_end_date.date(),
-                rediscount_rate=float(last_row["rediscount_rate"])
-                if pd.notna(last_row["rediscount_rate"])
-                else None,
-                advance_rate=float(last_row["advance_rate"])
-                if pd.notna(last_row["advance_rate"])
-                else None,
-            )
-            records.append(rec)
+    events = events_df.rename(columns={"effective_date": "date"})
+    first_event = pd.to_datetime(events["date"]).min()
+    start = max(pd.Timestamp(start_year, 1, 1), first_event)
+    end = max(pd.to_datetime(events["date"]).max(), pd.Timestamp.today())
+
+    aligned = asof.asof_align(events, asof.month_end_dates(start, end), ["rediscount_rate", "advance_rate"])
+    aligned = aligned.dropna(subset=["rediscount_rate"])
+
+    records: List[MonthlyRediscountRate] = [
+        MonthlyRediscountRate(
+            year=row.date.year,
+            month=row.date.month,
+            month_end_date=row.date.date(),
+            rediscount_rate=float(row.rediscount_rate),
+            advance_rate=float(row.advance_rate) if pd.notna(row.advance_rate) else None,
+        )
+        for row in aligned.itertuples(index=False)
+    ]
 
     if not records:
         raise ValueError(f"{start_year} sonrasına ait aylık seri oluşturulamadı.")
@@ -261,6 +255,41 @@ def save_to_sqlite(
         return None
 
 
+def attach_daily_rates(events_df: pd.DataFrame, db_path: str = MODEL_DB,
+                       start_year: int = START_YEAR) -> Optional[int]:
+    """
+    Reeskont/avans oranlarını günlük seriye çevirip model veritabanının
+    macro_inputs tablosuna yazar (yalnızca yeni/değişen günler) ve model_view'u
+    yeniler. Yazılan gün sayısını döndürür.
+    """
+    if not os.path.exists(db_path):
+        print(f"[UYARI] Model veritabanı bulunamadı, günlük oranlar yazılmadı: {db_path}")
+        return None
+
+    conn = sqlite3.connect(db_path)
+    try:
+        written = macro_store.upsert_event_series(
+            conn,
+            events_df,
+            MODEL_COLUMNS,
+            start=f"{start_year}-01-01",
+            date_column="effective_date",
+            commit=False,
+        )
+        model_schema.refresh_model_view(conn)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print("[HATA] Günlük oranlar model veritabanına yazılamadı:", e)
+        return None
+    finally:
+        conn.close()
+
+    print(f"[DB] '{db_path}' macro_inputs: {written} gün güncellendi "
+          f"({', '.join(MODEL_COLUMNS.values())}).")
+    return written
+
+
 # ----------------------------- MAIN ------------------------------------------
 
 
@@ -289,6 +318,9 @@ def main():
         save_to_sqlite(events_df, DB_URL, DB_TABLE_EVENTS)
         save_to_sqlite(monthly_df, DB_URL, DB_TABLE_MONTHLY)
 
+    if ATTACH_TO_MODEL:
+        attach_daily_rates(events_df, MODEL_DB)
+
 
 if __name__ == "__main__":
     main()
@@ -6,24 +6,57 @@
 # This software is released under the MIT License.
 # https://opensource.org/licenses/MIT
 # -----------------------------------------------------------------------------
+#
+# fintables.com bilanço sayfalarını kazır. Sayfalar FETCH_WORKERS thread'le,
+# tek bir bağlantı havuzunu (keep-alive) paylaşan oturumla ve ortak hız
+# sınırıyla (SLEEP_SECONDS'te en fazla bir istek) çekilir. Ham HTML ve seçilen
+# bilanço tablosu sembol + içerik özetiyle diskte saklanır (page_cache);
+# istekler koşullu yapılır, değişmemiş sayfa ne yeniden indirilir ne de
+# yeniden ayrıştırılır. Kalemler bilanco_kalemleri'ne yalnızca yeni ya da
+# değişmişse revizyon olarak yazılır (fundamentals_store).
+#
+# Ağ olmadan denemek için: python bist100/fintable_fixture.py ve
+#   python bist100/fintable.py --base-url "http://127.0.0.1:8765/sirketler/{symbol}/finansal-tablolar/bilanco"
+# -----------------------------------------------------------------------------
 
+import argparse
+import os
+import sys
 import time
-from datetime import date
+from functools import partial
+from io import StringIO
 import re
+import sqlite3
 
 import requests
 import pandas as pd
-from sqlalchemy import create_engine
-from sqlalchemy.exc import SQLAlchemyError
+from requests.adapters import HTTPAdapter
+
+# Depo kökündeki ortak modüller (fetch_pool, page_cache, fundamentals_store)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fetch_cache
+import fundamentals_store
+from fetch_pool import TokenBucket, call_with_retry, iter_concurrent
+from page_cache import PageCache
 
 BASE_URL = "https://fintables.com/sirketler/{symbol}/finansal-tablolar/bilanco"
 SYMBOL_FILE = "bist_symbols.txt"      
 DB_URL = "sqlite:///fintables_bilancolar.db"
-TABLE_NAME = "bilanco_kalemleri"
+TABLE_NAME = fundamentals_store.BALANCE.name
 
 MIN_YEAR = 2016      
 SLEEP_SECONDS = 1.5   
 
+# Aynı anda açık istek sayısı (1 = seri). Hız sınırı tüm thread'ler için ortaktır.
+FETCH_WORKERS = 4
+
+# pick_balance_dataframe değişirse değiştirilmeli: eski ayrıştırma sonuçları kullanılmaz
+PARSER_VERSION = "bilanco_v1"
+
+# read_html(match=...) lxml'de EXSLT regex kullanır; \d desteklenmez
+PERIOD_PATTERN = r"[0-9]{4}/[0-9]{1,2}"
+
 HEADERS = {
     "User-Agent": (
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -35,6 +68,17 @@ HEADERS = {
 }
 
 SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+
+request_limiter = TokenBucket.from_interval(SLEEP_SECONDS)
+page_cache = PageCache("fintables_bilanco")
+
+
+def configure_session(workers: int) -> None:
+    """Thread'lerin paylaştığı bağlantı havuzunu işçi sayısına göre kurar."""
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(workers, 1))
+    SESSION.mount("https://", adapter)
+    SESSION.mount("http://", adapter)
 
 
 def load_symbols(path: str) -> list[str]:
@@ -45,25 +89,48 @@ def load_symbols(path: str) -> list[str]:
         return []
 
 
-def fetch_balance_table_html(symbol: str) -> str | None:
-    url = BASE_URL.format(symbol=symbol)
-    print(f"  -> GET {url}")
-    try:
-        resp = SESSION.get(url, headers=HEADERS, timeout=20)
+def _get(url: str, headers: dict) -> requests.Response:
+    # Yalnızca geçici hatalar (429, 5xx) tekrar denenir; 304/404 olduğu gibi döner
+    resp = SESSION.get(url, headers=headers, timeout=20)
+    if resp.status_code == 429 or resp.status_code >= 500:
         resp.raise_for_status()
-        return resp.text
+    return resp
+
+
+def fetch_balance_page(symbol: str, base_url: str = BASE_URL) -> str | None:
+    """
+    Bilanço sayfasını koşullu istekle çeker ve önbelleğe yazar; içerik
+    özetini döndürür (304'te önbellekteki sayfanın özeti). Hata varsa None.
+    """
+    if fetch_cache.OFFLINE:
+        return page_cache.offline(symbol)
+
+    url = base_url.format(symbol=symbol)
+    headers = page_cache.conditional_headers(symbol)
+    print(f"  -> GET {url}{' (koşullu)' if headers else ''}")
+    try:
+        resp = call_with_retry(partial(_get, url, headers), limiter=request_limiter, label=symbol)
     except requests.RequestException as e:
         print(f"[HATA] {symbol} için istek hatası: {e}")
         return None
 
+    if resp.status_code == 304:
+        return page_cache.not_modified(symbol)
+    if not resp.ok:
+        print(f"[HATA] {symbol} için HTTP {resp.status_code}")
+        return None
+    return page_cache.store(symbol, url, resp.text.encode("utf-8"),
+                            resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+
 
 def pick_balance_dataframe(html: str) -> pd.DataFrame | None:
     """
     Sayfadaki tabloları tarayıp, kolon başlıklarında '2024/12' gibi
     dönemsellik olan tabloyu seçmeye çalışır.
     """
+    # match: yalnızca metninde dönem (2024/12) geçen tablolar DataFrame'e çevrilir
     try:
-        tables = pd.read_html(html) 
+        tables = pd.read_html(StringIO(html), match=PERIOD_PATTERN)
     except ValueError:
         print("  -> HTML içinde tablo bulunamadı.")
         return None
@@ -72,7 +139,7 @@ def pick_balance_dataframe(html: str) -> pd.DataFrame | None:
         print("  -> read_html tablo döndürmedi.")
         return None
 
-    year_pattern = re.compile(r"^\d{4}/\d{1,2}$")
+    year_pattern = re.compile(f"^{PERIOD_PATTERN}$")
 
     for idx, df in enumerate(tables):
         if df.shape[1] < 2:
@@ -122,20 +189,20 @@ def tidy_balance_df(symbol: str, raw_df: pd.DataFrame) -> pd.DataFrame:
     )
 
     long_df["symbol"] = symbol
-    long_df["as_of_date"] = date.today().isoformat()
 
     long_df = long_df.dropna(subset=["value"])
 
     return long_df
 
 
-def fetch_balance_for_symbol(symbol: str) -> pd.DataFrame | None:
+def fetch_balance_for_symbol(symbol: str, base_url: str = BASE_URL) -> pd.DataFrame | None:
     print(f"\n=== {symbol} ===")
-    html = fetch_balance_table_html(symbol)
-    if html is None:
+    digest = fetch_balance_page(symbol, base_url)
+    if digest is None:
         return None
 
-    raw_df = pick_balance_dataframe(html)
+    # Aynı içerik daha önce ayrıştırıldıysa tablo önbellekten gelir
+    raw_df = page_cache.parsed(symbol, digest, PARSER_VERSION, pick_balance_dataframe)
     if raw_df is None:
         return None
 
@@ -145,40 +212,53 @@ def fetch_balance_for_symbol(symbol: str) -> pd.DataFrame | None:
 
 
 def main():
-    symbols = load_symbols(SYMBOL_FILE)
+    parser = argparse.ArgumentParser(description="fintables.com bilanço tablolarını kazır.")
+    parser.add_argument("--symbols", default=SYMBOL_FILE, help="Sembol dosyası")
+    parser.add_argument("--workers", type=int, default=FETCH_WORKERS, help="Eşzamanlı istek sayısı (1 = seri)")
+    parser.add_argument("--base-url", default=BASE_URL, help="Sayfa adresi şablonu ({symbol} içermeli)")
+    parser.add_argument("--db-url", default=DB_URL)
+    args = parser.parse_args()
+
+    symbols = load_symbols(args.symbols)
     if not symbols:
         print("bist_symbols.txt bulunamadı veya boş. Örneğin HALKB ile denemek istersen kodda main() içini düzenle.")
         return
 
-    print(f"{len(symbols)} sembol bulundu.")
+    print(f"{len(symbols)} sembol bulundu ({args.workers} thread, istekler arası en az {SLEEP_SECONDS} sn).")
+    configure_session(args.workers)
 
-    all_frames: list[pd.DataFrame] = []
+    frames: dict[str, pd.DataFrame] = {}
+    started = time.perf_counter()
+    jobs = iter_concurrent(symbols, lambda sym: fetch_balance_for_symbol(sym, args.base_url), args.workers)
+    for i, (sym, df, error) in enumerate(jobs, start=1):
+        print(f"\n[{i}/{len(symbols)}] {sym} tamamlandı.")
+        if error is not None:
+            print(f"[HATA] {sym}: {error}")
+        elif df is not None and not df.empty:
+            frames[sym] = df
 
-    for i, sym in enumerate(symbols, start=1):
-        print(f"\n[{i}/{len(symbols)}] {sym} işleniyor...")
-        df = fetch_balance_for_symbol(sym)
-        if df is not None and not df.empty:
-            all_frames.append(df)
-        time.sleep(SLEEP_SECONDS)
+    print(f"\nİndirme süresi: {time.perf_counter() - started:.1f} sn ({page_cache.format_stats()})")
 
-    if not all_frames:
+    if not frames:
         print("Hiç veri üretilemedi.")
         return
 
-    result = pd.concat(all_frames, ignore_index=True)
+    result = pd.concat([frames[sym] for sym in symbols if sym in frames], ignore_index=True)
     print("\nToplam satır:", len(result))
     print(result.head())
 
-    engine = create_engine(DB_URL)
-
+    # Yalnızca yeni ve değişen kalemler yazılır (bkz. fundamentals_store)
+    conn = sqlite3.connect(fundamentals_store.sqlite_path(args.db_url))
     try:
-        with engine.begin() as conn:
-            result.to_sql(TABLE_NAME, con=conn, if_exists="append", index=False)
-        print(f"\n'{TABLE_NAME}' tablosuna {len(result)} satır yazıldı.")
-        print("Veritabanı:", DB_URL)
-    except SQLAlchemyError as e:
+        counts = fundamentals_store.record(conn, fundamentals_store.BALANCE, result)
+        print(f"\n'{TABLE_NAME}': {counts['new']} yeni, {counts['revised']} revize, "
+              f"{counts['unchanged']} değişmemiş kalem.")
+        print("Veritabanı:", args.db_url)
+    except sqlite3.Error as e:
         print("DB'ye yazarken hata oluştu:", e)
         raise
+    finally:
+        conn.close()
 
 
 if __name__ == "__main__":
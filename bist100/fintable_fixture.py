@@ -0,0 +1,133 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Dogan Ege BULTE
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+# -----------------------------------------------------------------------------
+#
+# fintable.py için yerel HTML sunucusu (ağ olmadan deneme ve ölçüm). Her sembol
+# için fintables bilanço sayfasına benzeyen, sembol ve --revision'a göre
+# belirlenimli bir sayfa üretir: menü tablosu + dönem kolonlu bilanço tablosu.
+# ETag / Last-Modified gönderir, If-None-Match / If-Modified-Since gelirse 304
+# döner. --latency gerçek sitenin yanıt süresini, --no-conditional koşullu
+# isteği desteklemeyen bir sunucuyu taklit eder.
+#
+#   python bist100/fintable_fixture.py --port 8765 --latency 0.3
+# -----------------------------------------------------------------------------
+
+import argparse
+import hashlib
+import random
+import re
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PATH_PATTERN = re.compile(r"^/sirketler/([A-Z0-9]+)/finansal-tablolar/bilanco/?$")
+
+ITEMS = [
+    "Dönen Varlıklar", "Nakit ve Nakit Benzerleri", "Finansal Yatırımlar", "Ticari Alacaklar",
+    "Stoklar", "Duran Varlıklar", "Maddi Duran Varlıklar", "Toplam Varlıklar",
+    "Kısa Vadeli Yükümlülükler", "Uzun Vadeli Yükümlülükler", "Özkaynaklar", "Toplam Kaynaklar",
+]
+PERIODS = [f"{year}/{month}" for year in range(2024, 2013, -1) for month in (12, 9, 6, 3)]
+
+
+def render_page(symbol: str, revision: int) -> bytes:
+    rng = random.Random(f"{symbol}:{revision}")
+    menu = "".join(f"<tr><td>Menü {i}</td><td>Bağlantı {i}</td></tr>" for i in range(20))
+    header = "".join(f"<th>{p}</th>" for p in PERIODS)
+    rows = "".join(
+        "<tr><td>{}</td>{}</tr>".format(
+            item, "".join(f"<td>{rng.uniform(1e6, 1e10):.0f}</td>" for _ in PERIODS)
+        )
+        for item in ITEMS
+    )
+    html = (
+        f"<html><head><meta charset='utf-8'><title>{symbol} Bilanço</title></head><body>"
+        f"<table><tr><th>Menü</th><th>Bağlantı</th></tr>{menu}</table>"
+        f"<table><thead><tr><th>Kalem</th>{header}</tr></thead><tbody>{rows}</tbody></table>"
+        "</body></html>"
+    )
+    return html.encode("utf-8")
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    revision = 0
+    latency = 0.0
+    conditional = True
+    last_modified = formatdate(0, usegmt=True)
+    counts = {"200": 0, "304": 0, "404": 0}
+    lock = threading.Lock()
+
+    def _count(self, status: int) -> None:
+        with self.lock:
+            self.counts[str(status)] += 1
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        match = PATH_PATTERN.match(self.path)
+        if match is None:
+            self._count(404)
+            self.send_error(404)
+            return
+
+        body = render_page(match.group(1), self.revision)
+        etag = '"{}"'.format(hashlib.sha256(body).hexdigest()[:16])
+
+        # If-None-Match varsa If-Modified-Since'a bakılmaz (RFC 9110)
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            fresh = if_none_match == etag
+        else:
+            fresh = self.headers.get("If-Modified-Since") == self.last_modified
+        if self.conditional and fresh:
+            self._count(304)
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self._count(200)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if self.conditional:
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", self.last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fintable.py için yerel bilanço sayfası sunucusu.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--revision", type=int, default=0, help="Değiştirmek tüm sayfaların içeriğini değiştirir")
+    parser.add_argument("--latency", type=float, default=0.0, help="Yanıt başına gecikme (sn)")
+    parser.add_argument("--no-conditional", action="store_true", help="ETag/Last-Modified gönderme, hep 200 dön")
+    args = parser.parse_args()
+
+    FixtureHandler.revision = args.revision
+    FixtureHandler.latency = args.latency
+    FixtureHandler.conditional = not args.no_conditional
+    # Aynı revizyonun sayfaları aynı zamanda "değişmiş" kabul edilir
+    FixtureHandler.last_modified = formatdate(1_700_000_000 + args.revision * 86400, usegmt=True)
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), FixtureHandler)
+    print(f"Fixture sunucusu: http://127.0.0.1:{args.port}/sirketler/<SEMBOL>/finansal-tablolar/bilanco "
+          f"(revizyon {args.revision}, gecikme {args.latency} sn)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"İstekler: {FixtureHandler.counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,22 +5,33 @@
 # https://opensource.org/licenses/MIT
 # -----------------------------------------------------------------------------
 
+import argparse
 import os
+import sqlite3
+import sys
 import time
-from datetime import date, datetime
+from datetime import date
 
 import pandas as pd
 from yahooquery import Ticker
-from sqlalchemy import create_engine
-from sqlalchemy.exc import SQLAlchemyError
+
+# Depo kökündeki ortak modüller (fundamentals_store)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fundamentals_store
+import yahoo_replay
 
 SYMBOL_FILE = "bist_symbols.txt"
 DB_URL = "sqlite:///bist_valuation_measures.db"
-TABLE_NAME = "valuation_measures"
+TABLE_NAME = fundamentals_store.VALUATION.name
 
-SLEEP_SECONDS = 1.0
+SLEEP_SECONDS = 1.0   # partiler arası bekleme
 START_DATE = date(2016, 1, 1)  # 2016'dan itibaren veri
 
+# Bir Ticker'a verilen sembol sayısı ve aynı anda açık istek (yahooquery asynchronous=True)
+BATCH_SIZE = 50
+ASYNC_WORKERS = 8
+
 # Yahoo Finance Premium kullanıyorsan bu ortam değişkenlerini ayarla
 YF_USERNAME = os.getenv("YF_USERNAME")
 YF_PASSWORD = os.getenv("YF_PASSWORD")
@@ -51,17 +62,18 @@ def to_yahoo_symbol(raw: str) -> str:
     return raw + ".IS"
 
 
-def _build_ticker(yahoo_symbol: str) -> Ticker:
+def _build_ticker(yahoo_symbols: list[str], ticker_cls=Ticker):
     """
-    Premium varsa p_valuation_measures kullanılabilecek şekilde Ticker oluşturur.
+    Sembol listesi için tek Ticker oluşturur; birden fazla sembolde istekler
+    asynchronous=True ile ASYNC_WORKERS'a kadar aynı anda yapılır. Premium
+    varsa p_valuation_measures kullanılabilecek şekilde giriş bilgisi verilir.
     """
+    kwargs = {}
+    if len(yahoo_symbols) > 1:
+        kwargs.update(asynchronous=True, max_workers=ASYNC_WORKERS)
     if YF_USERNAME and YF_PASSWORD:
-        return Ticker(
-            yahoo_symbol,
-            username=YF_USERNAME,
-            password=YF_PASSWORD,
-        )
-    return Ticker(yahoo_symbol)
+        kwargs.update(username=YF_USERNAME, password=YF_PASSWORD)
+    return ticker_cls(yahoo_symbols, **kwargs)
 
 
 def _normalize_valuation_df(data) -> pd.DataFrame | None:
@@ -80,9 +92,14 @@ def _normalize_valuation_df(data) -> pd.DataFrame | None:
         return None
 
     if isinstance(data, dict):
-        # Ör: {"XU100.IS": "No fundamentals data found ..."}
-        print(f"[UYARI] valuation_measures dict döndü: {data}")
-        return None
+        # Ör: {"XU100.IS": "No fundamentals data found ..."}; çok sembolde tablolar da gelebilir
+        frames = [v for v in data.values() if isinstance(v, pd.DataFrame)]
+        errors = {k: v for k, v in data.items() if not isinstance(v, pd.DataFrame)}
+        if errors:
+            print(f"[UYARI] valuation_measures dict döndü: {errors}")
+        if not frames:
+            return None
+        data = pd.concat(frames)
 
     if not isinstance(data, pd.DataFrame):
         print(f"[UYARI] valuation_measures beklenmeyen tip: {type(data)}")
@@ -112,104 +129,132 @@ def _normalize_valuation_df(data) -> pd.DataFrame | None:
     return df
 
 
-def fetch_valuation_history(raw_symbol: str) -> list[dict]:
+def valuation_rows(df: pd.DataFrame, yahoo_to_raw: dict[str, str]) -> pd.DataFrame:
     """
-    Verilen sembol için 2016'dan itibaren mevcut olan valuation_measures
-    kayıtlarını çeker ve her satırı dict olarak döner.
+    Normalize edilmiş (çok sembollü) tabloyu tek geçişte veritabanı
+    kolonlarına çevirir; yalnızca istenen sembollerin satırları kalır.
     """
-    yahoo_symbol = to_yahoo_symbol(raw_symbol)
-    print(f"\n=== {raw_symbol} (Yahoo: {yahoo_symbol}) ===")
+    yahoo = df["symbol"].astype(str).str.upper()
+    keep = yahoo.isin(yahoo_to_raw).to_numpy()
+    df = df[keep].reset_index(drop=True)
+    yahoo = yahoo[keep].reset_index(drop=True)
+
+    rows = pd.DataFrame({
+        "symbol": yahoo.map(yahoo_to_raw),
+        "yahoo_symbol": yahoo,
+        "as_of_date": pd.to_datetime(df["asOfDate"]).dt.strftime("%Y-%m-%d"),
+        "period": df["periodType"] if "periodType" in df.columns else None,
+    })
+    # Valuation alanlarını map et (gelmeyen alan boş kalır)
+    for yahoo_key, col_name in VALUATION_FIELDS.items():
+        rows[col_name] = df[yahoo_key] if yahoo_key in df.columns else None
+    return rows
+
+
+def fetch_valuation_batch(raw_symbols: list[str], ticker_cls=Ticker) -> pd.DataFrame | None:
+    """
+    Sembol listesi için 2016'dan itibaren mevcut valuation_measures
+    kayıtlarını tek Ticker ile çeker; tüm sembollerin satırlarını tek
+    DataFrame olarak döner (hiç satır yoksa None).
+    """
+    yahoo_to_raw = {to_yahoo_symbol(s).upper(): s for s in raw_symbols}
+    yahoo_symbols = list(yahoo_to_raw)
+    print(f"\n=== {', '.join(raw_symbols)} ===")
 
     try:
-        tkr = _build_ticker(yahoo_symbol)
+        tkr = _build_ticker(yahoo_symbols, ticker_cls)
     except Exception as e:
-        print(f"[HATA] {raw_symbol} için Ticker oluşturulamadı: {e}")
-        return []
-
-    df = None
+        print(f"[HATA] Ticker oluşturulamadı: {e}")
+        return None
 
     try:
         if YF_USERNAME and YF_PASSWORD:
             # Premium: uzun dönem tarihsel veri, aylık (m) frekans
-            df = tkr.p_valuation_measures(frequency="m")
+            data = tkr.p_valuation_measures(frequency="m")
             print("Premium p_valuation_measures(frequency='m') kullanılıyor.")
         else:
             # Ücretsiz: son 4 çeyrek + en güncel tarih (sınırlı)
-            df = tkr.valuation_measures
+            data = tkr.valuation_measures
             print("Ücretsiz valuation_measures kullanılıyor (sınırlı tarih).")
     except Exception as e:
-        print(f"[HATA] {raw_symbol} için valuation_measures alınamadı: {e}")
-        return []
-
-    df = _normalize_valuation_df(df)
-    if df is None:
-        print(f"[UYARI] {raw_symbol} için 2016 sonrası uygun valuation verisi yok.")
-        return []
-
-    # Sadece bu sembole ait satırlar (teoride zaten tek sembol ama garanti edelim)
-    if "symbol" in df.columns:
-        df = df[df["symbol"].str.upper() == yahoo_symbol.upper()]
+        print(f"[HATA] valuation_measures alınamadı: {e}")
+        return None
 
-    if df.empty:
-        print(f"[UYARI] {raw_symbol} için 2016 sonrası satır kalmadı.")
-        return []
+    df = _normalize_valuation_df(data)
+    rows = valuation_rows(df, yahoo_to_raw) if df is not None else None
 
-    records: list[dict] = []
+    found = set(rows["symbol"]) if rows is not None else set()
+    missing = [s for s in raw_symbols if s not in found]
+    if missing:
+        print(f"[UYARI] 2016 sonrası uygun valuation verisi yok: {', '.join(missing)}")
+    if rows is None or rows.empty:
+        return None
 
-    for _, rec in df.iterrows():
-        as_of = rec["asOfDate"]
-        if isinstance(as_of, datetime):
-            as_of = as_of.date()
-        as_of_str = as_of.isoformat() if isinstance(as_of, date) else str(as_of)
+    print(f"{len(found)} sembol için {len(rows)} satır oluşturuldu.")
+    return rows
 
-        row: dict = {
-            "symbol": raw_symbol,
-            "yahoo_symbol": yahoo_symbol,
-            "as_of_date": as_of_str,
-            "period": rec.get("periodType", None),
-        }
 
-        # Valuation alanlarını map et
-        for yahoo_key, col_name in VALUATION_FIELDS.items():
-            row[col_name] = rec.get(yahoo_key, None)
+def fetch_valuation_history(raw_symbol: str) -> list[dict]:
+    """Tek sembol için fetch_valuation_batch; her satırı dict olarak döner."""
+    rows = fetch_valuation_batch([raw_symbol])
+    return rows.to_dict("records") if rows is not None else []
 
-        records.append(row)
 
-    print(f"{raw_symbol} için {len(records)} satır oluşturuldu.")
-    return records
+def chunks(items: list[str], size: int) -> list[list[str]]:
+    size = max(size, 1)
+    return [items[i:i + size] for i in range(0, len(items), size)]
 
 
 def main():
-    symbols = load_symbols(SYMBOL_FILE)
-    print(f"{len(symbols)} sembol bulundu.")
-
-    all_rows: list[dict] = []
-
-    for i, sym in enumerate(symbols, start=1):
-        print(f"\n[{i}/{len(symbols)}] {sym} işleniyor...")
-        recs = fetch_valuation_history(sym)
-        if recs:
-            all_rows.extend(recs)
-        time.sleep(SLEEP_SECONDS)
-
-    if not all_rows:
+    parser = argparse.ArgumentParser(description="Yahoo valuation_measures geçmişini sembol partileriyle çeker.")
+    parser.add_argument("--symbols", default=SYMBOL_FILE, help="Sembol dosyası")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Ticker başına sembol (1 = sembol sembol)")
+    parser.add_argument("--db-url", default=DB_URL)
+    parser.add_argument("--record", metavar="DIR", help="Yanıtları DIR'e kaydet (bkz. yahoo_replay)")
+    parser.add_argument("--replay", metavar="DIR", help="Ağ yerine DIR'deki kayıtlı yanıtları kullan")
+    parser.add_argument("--latency", type=float, default=0.0, help="--replay'de istek başına taklit gecikme (sn)")
+    args = parser.parse_args()
+
+    symbols = load_symbols(args.symbols)
+    batches = chunks(symbols, args.batch_size)
+    print(f"{len(symbols)} sembol bulundu ({len(batches)} parti).")
+
+    ticker_cls = yahoo_replay.ticker_factory(Ticker, args.record, args.replay, args.latency)
+    frames: list[pd.DataFrame] = []
+    started = time.perf_counter()
+
+    for i, batch in enumerate(batches, start=1):
+        print(f"\n[{i}/{len(batches)}] {len(batch)} sembol işleniyor...")
+        rows = fetch_valuation_batch(batch, ticker_cls)
+        if rows is not None:
+            frames.append(rows)
+        if i < len(batches) and not args.replay:
+            time.sleep(SLEEP_SECONDS)
+
+    print(f"\nİndirme süresi: {time.perf_counter() - started:.1f} sn")
+
+    if not frames:
         print("Hiç veri çekilemedi.")
         return
 
-    df = pd.DataFrame(all_rows)
+    df = pd.concat(frames, ignore_index=True)
     print("\nÖrnek satırlar:")
     print(df.head())
 
-    engine = create_engine(DB_URL)
-
+    # Uzun biçime (symbol, field, period=ölçüm tarihi) çevrilip yalnızca yeni/değişen değerler
+    # tek transaction'da yazılır
+    long_df = fundamentals_store.melt_valuations(df, list(VALUATION_FIELDS.values()))
+    conn = sqlite3.connect(fundamentals_store.sqlite_path(args.db_url))
     try:
-        with engine.begin() as conn:
-            df.to_sql(TABLE_NAME, con=conn, if_exists="append", index=False)
-        print(f"\n'{TABLE_NAME}' tablosuna {len(df)} satır yazıldı.")
-        print("Veritabanı:", DB_URL)
-    except SQLAlchemyError as e:
+        counts = fundamentals_store.record(conn, fundamentals_store.VALUATION, long_df)
+        print(f"\n'{TABLE_NAME}': {counts['new']} yeni, {counts['revised']} revize, "
+              f"{counts['unchanged']} değişmemiş değer.")
+        print("Veritabanı:", args.db_url)
+    except sqlite3.Error as e:
         print("DB'ye yazarken hata oluştu:", e)
         raise
+    finally:
+        conn.close()
 
 
 if __name__ == "__main__":
@@ -5,19 +5,34 @@
 # https://opensource.org/licenses/MIT
 # -----------------------------------------------------------------------------
 
+import argparse
+import os
+import sqlite3
+import sys
 import time
 from datetime import date
 
 import pandas as pd
-import yfinance as yf
-from sqlalchemy import create_engine
-from sqlalchemy.exc import SQLAlchemyError
+from yahooquery import Ticker
+
+# Depo kökündeki ortak modüller (fundamentals_store)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fundamentals_store
+import yahoo_replay
 
 SYMBOL_FILE = "bist_symbols.txt"
 DB_URL = "sqlite:///bist_valuation_measures.db"
-TABLE_NAME = "valuation_measures"
+TABLE_NAME = fundamentals_store.VALUATION.name
+
+SLEEP_SECONDS = 1.0   # partiler arası bekleme
 
-SLEEP_SECONDS = 1.0   
+# Bir Ticker'a verilen sembol sayısı ve aynı anda açık istek (yahooquery asynchronous=True)
+BATCH_SIZE = 50
+ASYNC_WORKERS = 8
+
+# yfinance get_info() bu alanları quoteSummary'nin şu modüllerinden birleştirir
+QUOTE_MODULES = ["summaryDetail", "defaultKeyStatistics"]
 
 VALUATION_FIELDS = {
     "marketCap": "market_cap",
@@ -43,67 +58,131 @@ def to_yahoo_symbol(raw: str) -> str:
     return raw + ".IS"
 
 
-def fetch_current_valuations(raw_symbol: str) -> dict | None:
-    yahoo_symbol = to_yahoo_symbol(raw_symbol)
-    print(f"\n=== {raw_symbol} (Yahoo: {yahoo_symbol}) ===")
+def _build_ticker(yahoo_symbols: list[str], ticker_cls=Ticker):
+    """Sembol listesi için tek Ticker; birden fazla sembolde istekler aynı anda yapılır."""
+    if len(yahoo_symbols) > 1:
+        return ticker_cls(yahoo_symbols, asynchronous=True, max_workers=ASYNC_WORKERS)
+    return ticker_cls(yahoo_symbols)
+
+
+def valuation_rows(modules: dict, yahoo_to_raw: dict[str, str], as_of: str) -> pd.DataFrame:
+    """
+    get_modules çıktısını ({yahoo_sembol: {modül: {alan: değer}}} ya da hata
+    metni) tek tabloya çevirir; alan seçimi ve isimlendirme kolon bazında yapılır.
+    """
+    info = {
+        yahoo: {k: v for module in QUOTE_MODULES for k, v in (data.get(module) or {}).items()}
+        for yahoo, data in modules.items()
+        if isinstance(data, dict) and str(yahoo).upper() in yahoo_to_raw
+    }
+    errors = {k: v for k, v in modules.items() if not isinstance(v, dict)}
+    if errors:
+        print(f"[UYARI] get_modules hata döndü: {errors}")
+
+    frame = pd.DataFrame.from_dict(info, orient="index").reindex(columns=list(VALUATION_FIELDS))
+    yahoo = frame.index.astype(str).str.upper()
+    rows = pd.DataFrame({
+        "symbol": yahoo.map(yahoo_to_raw),
+        "yahoo_symbol": yahoo,
+        "as_of_date": as_of,
+        "period": "Current",
+    })
+    fields = frame.rename(columns=VALUATION_FIELDS).apply(pd.to_numeric, errors="coerce")
+    rows = pd.concat([rows, fields.reset_index(drop=True)], axis=1)
+    # Hiç alanı gelmeyen sembol (boş info) yazılmaz
+    return rows[fields.notna().any(axis=1).to_numpy()].reset_index(drop=True)
 
-    tkr = yf.Ticker(yahoo_symbol)
+
+def fetch_current_batch(raw_symbols: list[str], ticker_cls=Ticker) -> pd.DataFrame | None:
+    """
+    Sembol listesinin güncel değerleme alanlarını tek Ticker ile
+    (summaryDetail + defaultKeyStatistics) çeker; satır yoksa None.
+    """
+    yahoo_to_raw = {to_yahoo_symbol(s).upper(): s for s in raw_symbols}
+    print(f"\n=== {', '.join(raw_symbols)} ===")
 
     try:
-        info = tkr.get_info()
+        modules = _build_ticker(list(yahoo_to_raw), ticker_cls).get_modules(QUOTE_MODULES)
     except Exception as e:
-        print(f"[HATA] {raw_symbol} için get_info() başarısız: {e}")
+        print(f"[HATA] get_modules() başarısız: {e}")
         return None
 
-    if not info:
-        print(f"[UYARI] {raw_symbol} için info boş geldi.")
+    if not isinstance(modules, dict) or not modules:
+        print(f"[UYARI] get_modules beklenmeyen yanıt: {modules}")
         return None
 
-    row = {
-        "symbol": raw_symbol,
-        "yahoo_symbol": yahoo_symbol,
-        "as_of_date": date.today().isoformat(),
-        "period": "Current",
-    }
+    rows = valuation_rows(modules, yahoo_to_raw, date.today().isoformat())
+    missing = [s for s in raw_symbols if s not in set(rows["symbol"])]
+    if missing:
+        print(f"[UYARI] info boş geldi: {', '.join(missing)}")
+    if rows.empty:
+        return None
 
-    for yahoo_key, col_name in VALUATION_FIELDS.items():
-        row[col_name] = info.get(yahoo_key)
+    print(rows)
+    return rows
 
-    print(row)
-    return row
 
+def fetch_current_valuations(raw_symbol: str) -> dict | None:
+    """Tek sembol için fetch_current_batch; satırı dict olarak döner."""
+    rows = fetch_current_batch([raw_symbol])
+    return rows.iloc[0].to_dict() if rows is not None else None
 
-def main():
-    symbols = load_symbols(SYMBOL_FILE)
-    print(f"{len(symbols)} sembol bulundu.")
 
-    rows = []
+def chunks(items: list[str], size: int) -> list[list[str]]:
+    size = max(size, 1)
+    return [items[i:i + size] for i in range(0, len(items), size)]
 
-    for i, sym in enumerate(symbols, start=1):
-        print(f"\n[{i}/{len(symbols)}] {sym} işleniyor...")
-        row = fetch_current_valuations(sym)
-        if row is not None:
-            rows.append(row)
-        time.sleep(SLEEP_SECONDS)
 
-    if not rows:
+def main():
+    parser = argparse.ArgumentParser(description="Güncel değerleme çarpanlarını sembol partileriyle çeker.")
+    parser.add_argument("--symbols", default=SYMBOL_FILE, help="Sembol dosyası")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Ticker başına sembol (1 = sembol sembol)")
+    parser.add_argument("--db-url", default=DB_URL)
+    parser.add_argument("--record", metavar="DIR", help="Yanıtları DIR'e kaydet (bkz. yahoo_replay)")
+    parser.add_argument("--replay", metavar="DIR", help="Ağ yerine DIR'deki kayıtlı yanıtları kullan")
+    parser.add_argument("--latency", type=float, default=0.0, help="--replay'de istek başına taklit gecikme (sn)")
+    args = parser.parse_args()
+
+    symbols = load_symbols(args.symbols)
+    batches = chunks(symbols, args.batch_size)
+    print(f"{len(symbols)} sembol bulundu ({len(batches)} parti).")
+
+    ticker_cls = yahoo_replay.ticker_factory(Ticker, args.record, args.replay, args.latency)
+    frames: list[pd.DataFrame] = []
+    started = time.perf_counter()
+
+    for i, batch in enumerate(batches, start=1):
+        print(f"\n[{i}/{len(batches)}] {len(batch)} sembol işleniyor...")
+        rows = fetch_current_batch(batch, ticker_cls)
+        if rows is not None:
+            frames.append(rows)
+        if i < len(batches) and not args.replay:
+            time.sleep(SLEEP_SECONDS)
+
+    print(f"\nİndirme süresi: {time.perf_counter() - started:.1f} sn")
+
+    if not frames:
         print("Hiç veri çekilemedi.")
         return
 
-    df = pd.DataFrame(rows)
+    df = pd.concat(frames, ignore_index=True)
     print("\nÖrnek satırlar:")
     print(df.head())
 
-    engine = create_engine(DB_URL)
-
+    # Uzun biçime (symbol, field, period=ölçüm tarihi) çevrilip yalnızca yeni/değişen değerler
+    # tek transaction'da yazılır
+    long_df = fundamentals_store.melt_valuations(df, list(VALUATION_FIELDS.values()))
+    conn = sqlite3.connect(fundamentals_store.sqlite_path(args.db_url))
     try:
-        with engine.begin() as conn:
-            df.to_sql(TABLE_NAME, con=conn, if_exists="append", index=False)
-        print(f"\n'{TABLE_NAME}' tablosuna {len(df)} satır yazıldı.")
-        print("Veritabanı:", DB_URL)
-    except SQLAlchemyError as e:
+        counts = fundamentals_store.record(conn, fundamentals_store.VALUATION, long_df)
+        print(f"\n'{TABLE_NAME}': {counts['new']} yeni, {counts['revised']} revize, "
+              f"{counts['unchanged']} değişmemiş değer.")
+        print("Veritabanı:", args.db_url)
+    except sqlite3.Error as e:
         print("DB'ye yazarken hata oluştu:", e)
         raise
+    finally:
+        conn.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Dogan Ege BULTE
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+# -----------------------------------------------------------------------------
+#
+# valu.py ve valuation.py için yahooquery.Ticker yanıtlarını kaydedip ağ
+# olmadan yeniden oynatan yardımcılar. --record DIR ile gerçek Ticker'ın
+# yanıtları sembol başına ayrılıp DIR altına yazılır:
+#
+#   DIR/<çağrı>/<YAHOO_SEMBOL>.pkl   (DataFrame, hata metni ya da modül sözlüğü)
+#
+# --replay DIR ile aynı arayüzü sunan ReplayTicker bu dosyalardan, istenen
+# sembol listesi için yahooquery'nin döndüreceği birleşik yanıtı kurar.
+# Kayıt sembol başına tutulduğu için kayıt ve oynatmada parti boyu farklı
+# olabilir. --latency her isteğin ağ süresini taklit eder (asynchronous=True
+# iken max_workers istek aynı anda sürer).
+# -----------------------------------------------------------------------------
+
+import math
+import os
+import time
+from typing import Any, Callable
+
+import pandas as pd
+
+# valuation_measures / p_valuation_measures'ta başarısız sembol için yahooquery'nin metni
+NO_DATA_MESSAGE = "No fundamentals data found for any of the summaryTypes"
+
+
+def _path(directory: str, call: str, symbol: str) -> str:
+    return os.path.join(directory, call, f"{symbol}.pkl")
+
+
+def split_by_symbol(data: Any, symbols: list[str]) -> dict[str, Any]:
+    """Çok sembollü yanıtı sembol başına parçalara ayırır."""
+    if isinstance(data, pd.DataFrame):
+        frame = data if "symbol" in data.columns else data.reset_index()
+        parts = {sym: part.reset_index(drop=True) for sym, part in frame.groupby("symbol", sort=False)}
+        return {sym: parts.get(sym, NO_DATA_MESSAGE) for sym in symbols}
+    if isinstance(data, dict):
+        return {sym: data.get(sym, NO_DATA_MESSAGE) for sym in symbols}
+    return {sym: data for sym in symbols}
+
+
+def combine_frames(parts: dict[str, Any]) -> Any:
+    """
+    Sembol parçalarından yahooquery biçiminde yanıt: en az bir DataFrame
+    varsa 'symbol' index'li tek tablo (hatalı semboller düşer), yoksa
+    {sembol: mesaj} sözlüğü.
+    """
+    frames = [p for p in parts.values() if isinstance(p, pd.DataFrame)]
+    if frames:
+        return pd.concat(frames, ignore_index=True).set_index("symbol")
+    return dict(parts)
+
+
+class RecordingTicker:
+    """Gerçek Ticker'ı sarar; yanıtları döndürmeden önce sembol başına kaydeder."""
+
+    def __init__(self, ticker, symbols: list[str], directory: str):
+        self._ticker = ticker
+        self._symbols = list(symbols)
+        self._directory = directory
+
+    def _save(self, call: str, data: Any) -> Any:
+        for symbol, part in split_by_symbol(data, self._symbols).items():
+            path = _path(self._directory, call, symbol)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            pd.to_pickle(part, path)
+        return data
+
+    @property
+    def valuation_measures(self):
+        return self._save("valuation_measures", self._ticker.valuation_measures)
+
+    def p_valuation_measures(self, frequency: str = "q"):
+        return self._save(f"p_valuation_measures_{frequency}", self._ticker.p_valuation_measures(frequency=frequency))
+
+    def get_modules(self, modules):
+        key = modules if isinstance(modules, str) else " ".join(modules)
+        return self._save(f"get_modules_{key.replace(' ', '_')}", self._ticker.get_modules(modules))
+
+
+class ReplayTicker:
+    """yahooquery.Ticker yerine geçer: kaydedilmiş yanıtları döndürür."""
+
+    def __init__(self, symbols, directory: str, latency: float = 0.0, asynchronous: bool = False,
+                 max_workers: int = 8, **kwargs):
+        self.symbols = symbols.split() if isinstance(symbols, str) else list(symbols)
+        self._directory = directory
+        self._latency = latency
+        self._rounds = math.ceil(len(self.symbols) / max_workers) if asynchronous else len(self.symbols)
+
+    def _load(self, call: str) -> dict[str, Any]:
+        time.sleep(self._latency * self._rounds)
+        parts = {}
+        for symbol in self.symbols:
+            path = _path(self._directory, call, symbol)
+            parts[symbol] = pd.read_pickle(path) if os.path.exists(path) else NO_DATA_MESSAGE
+        return parts
+
+    @property
+    def valuation_measures(self):
+        return combine_frames(self._load("valuation_measures"))
+
+    def p_valuation_measures(self, frequency: str = "q"):
+        return combine_frames(self._load(f"p_valuation_measures_{frequency}"))
+
+    def get_modules(self, modules):
+        key = modules if isinstance(modules, str) else " ".join(modules)
+        return self._load(f"get_modules_{key.replace(' ', '_')}")
+
+
+def ticker_factory(ticker_cls, record_dir: str | None = None, replay_dir: str | None = None,
+                   latency: float = 0.0) -> Callable[..., Any]:
+    """
+    Ticker(symbols, **kwargs) imzalı üretici: replay_dir verilirse
+    ReplayTicker, record_dir verilirse kaydeden sarmalayıcı, yoksa ticker_cls.
+    """
+    if replay_dir:
+        return lambda symbols, **kwargs: ReplayTicker(symbols, replay_dir, latency, **kwargs)
+    if record_dir:
+        return lambda symbols, **kwargs: RecordingTicker(ticker_cls(symbols, **kwargs), symbols, record_dir)
+    return ticker_cls
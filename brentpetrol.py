@@ -5,52 +5,109 @@
 # https://opensource.org/licenses/MIT
 # -----------------------------------------------------------------------------
 
-import pandas as pd
+import argparse
 import sqlite3
+import time
 
+import pandas as pd
 
-def merge_all_into_single_table(db_name="bist_model_ready.db"):
+import db_writer
+import macro_store
+import model_schema
+import series_cache
+from perf_utils import format_throughput
+
+
+def merge_all_into_single_table(db_name="bist_model_ready.db", replace=False):
+    """
+    global_inputs (Brent, SP500, VIX ...) serilerini tarih anahtarlı
+    macro_inputs tablosuna yazar ve model_view görünümünü (model_data +
+    makro kolonlar, okuma anında birleşim) yeniler. global_inputs yoksa
+    seriler series_cache'ten alınır (yalnızca son bardan sonrası indirilir).
+    Daha önce model_data'ya kopyalanmış makro kolonlar macro_inputs'a
+    taşınıp model_data'dan silinir. replace=True eski davranıştır: kolonlar
+    model_data'nın her satırına birleştirilip tablo baştan yazılır.
+    """
     print(f"Veritabanına bağlanılıyor: {db_name} ...")
     conn = sqlite3.connect(db_name)
     cursor = conn.cursor()
 
     try:
-        print("1. Tablolar okunuyor (model_data ve global_inputs)...")
-
-        df_main = pd.read_sql("SELECT * FROM model_data", conn)
-
-        df_global = pd.read_sql("SELECT * FROM global_inputs", conn)
-
-        print(f"   -> Hisse Verisi Satır Sayısı: {len(df_main)}")
+        model_schema.ensure_compact(conn)
+
+        if db_writer.table_exists(conn, "global_inputs"):
+            print("1. global_inputs okunuyor...")
+            df_global = pd.read_sql("SELECT * FROM global_inputs", conn)
+        else:
+            print("1. global_inputs yok; Brent, SP500, VIX seri önbelleğinden alınıyor...")
+            cache = series_cache.SeriesCache()
+            df_global = cache.aligned(macro_store.MACRO_COLUMNS)
+            df_global['date'] = df_global['date'].dt.strftime('%Y-%m-%d')
+            print(f"   -> {cache.format_stats()}")
+        df_global['date'] = df_global['date'].astype(str)
         print(f"   -> Global Veri Satır Sayısı: {len(df_global)}")
 
-        df_main['date'] = df_main['date'].astype(str)
-        df_global['date'] = df_global['date'].astype(str)
+        started = time.perf_counter()
+        if replace:
+            df_main = model_schema.read_model_data(conn)
+            print(f"   -> Hisse Verisi Satır Sayısı: {len(df_main)}")
 
-        print("2. Tablolar birleştiriliyor (Merge)...")
-        df_merged = pd.merge(df_main, df_global, on='date', how='left')
+            print("2. Tablolar birleştiriliyor (Merge)...")
+            df_merged = pd.merge(df_main, df_global, on='date', how='left')
 
-        print("3. Yeni birleştirilmiş tablo 'model_data' üzerine yazılıyor...")
+            print("3. Yeni birleştirilmiş tablo 'model_data' üzerine yazılıyor...")
+            # Kolonlar yeniden model_data'ya giriyor; görünüm macro_inputs'takileri tekrar eklemez
+            model_schema.replace_model_data(conn, df_merged)
+            columns = list(df_merged.columns)
+        else:
+            print("2. Eski birleştirmeden kalan makro kolonlar model_data'dan taşınıyor...")
+            moved = macro_store.migrate_from_model_data(conn, [c for c in df_global.columns if c != 'date'])
+            print(f"   -> Taşınan kolonlar: {moved or 'yok'} ({time.perf_counter() - started:.1f} sn)")
 
-        df_merged.to_sql('model_data', conn, if_exists='replace', index=False)
+            print("3. Global seriler macro_inputs tablosuna tarih anahtarıyla yazılıyor...")
+            upsert_started = time.perf_counter()
+            written = macro_store.upsert_macro(conn, df_global, commit=False)
+            print(f"   -> {format_throughput(written, time.perf_counter() - upsert_started)}")
+
+            model_schema.create_model_view(conn)
+            columns = db_writer.table_columns(conn, model_schema.MODEL_VIEW)
 
         print("4. 'global_inputs' tablosu siliniyor (temizlik)...")
         cursor.execute("DROP TABLE IF EXISTS global_inputs")
 
-        print("5. İndeksler yeniden oluşturuluyor...")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_date ON model_data (date)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_symbol ON model_data (symbol)")
+        # model_data (symbol, date) birincil anahtarına göre kümelenmiş durur;
+        # birleşim de macro_inputs'un birincil anahtarıyla yapılır. Ek indeks gerekmez.
 
         conn.commit()
-        print("\n--- İŞLEM BAŞARILI ---")
-        print("Artık sadece 'model_data' tablonuz var ve içinde Brent, SP500, VIX verileri mevcut.")
-        print("Sütunlar:", list(df_merged.columns))
+        print(f"\n--- İŞLEM BAŞARILI ({time.perf_counter() - started:.1f} sn) ---")
+        if replace:
+            print("Artık sadece 'model_data' tablonuz var ve içinde Brent, SP500, VIX verileri mevcut.")
+        else:
+            print(f"Makro seriler '{macro_store.MACRO_TABLE}' tablosunda; "
+                  f"'{model_schema.MODEL_VIEW}' görünümü bunları model_data ile birleştirir.")
+        print("Sütunlar:", columns)
 
     except Exception as e:
+        conn.rollback()
         print(f"\nHATA OLUŞTU: {e}")
     finally:
         conn.close()
 
 
 if __name__ == "__main__":
-    merge_all_into_single_table()
+    parser = argparse.ArgumentParser(description="global_inputs serilerini macro_inputs'a yazar, model_view'u yeniler.")
+    parser.add_argument("--db", default="bist_model_ready.db")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="Taşınan kolonlardan boşalan alanı geri kazanmak için VACUUM çalıştır")
+    parser.add_argument("--replace", action="store_true",
+                        help="Eski yol: kolonları model_data'ya birleştirip tabloyu baştan yaz")
+    args = parser.parse_args()
+
+    merge_all_into_single_table(args.db, args.replace)
+
+    if args.vacuum:
+        started = time.perf_counter()
+        conn = sqlite3.connect(args.db)
+        conn.execute("VACUUM")
+        conn.close()
+        print(f"VACUUM tamamlandı ({time.perf_counter() - started:.1f} sn)")
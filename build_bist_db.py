@@ -5,16 +5,28 @@
 # https://opensource.org/licenses/MIT
 # -----------------------------------------------------------------------------
 
+import argparse
 import os
 import time
 import sqlite3
 from datetime import datetime
+from functools import partial
 
 import pandas as pd
 from isyatirimhisse import fetch_stock_data
 
+import db_writer
+import fetch_cache
+import ingest_manifest
+from fetch_pool import TokenBucket, call_with_retry, iter_concurrent, missing_ranges
+from ingest_manifest import RangeResult
+
 USE_TEST_MODE = True
 
+# True: veritabanında olan semboller atlanmaz, yalnızca son kayıtlı tarihten
+# sonraki barlar çekilip eklenir (günlük güncelleme).
+UPDATE_MODE = False
+
 
 SYMBOLS_FILE_ALL = r"C:\Users\OMEN\Desktop\forsight\bist_symbols.txt"
 SYMBOLS_FILE_TEST = r"C:\Users\OMEN\Desktop\forsight\bist_symbols_test.txt"
@@ -36,6 +48,19 @@ DATE_RANGES = [
 
 REQUEST_SLEEP = 5
 
+# Aynı anda çalışan indirme thread'i sayısı (1 = seri). Hız sınırı tüm
+# thread'ler için ortaktır: siteye REQUEST_SLEEP saniyede en fazla bir istek gider.
+FETCH_WORKERS = 4
+
+request_limiter = TokenBucket.from_interval(REQUEST_SLEEP)
+
+parser = argparse.ArgumentParser(description="BIST fiyat geçmişini bist_prices.db'ye indirir.")
+parser.add_argument("--update", action="store_true", default=UPDATE_MODE,
+                    help="Kayıtlı semboller için yalnızca son tarihten sonraki barları çek")
+parser.add_argument("--resume", action="store_true",
+                    help="Yalnızca manifestoda başarısız ya da hiç denenmemiş aralıkları yeniden çek")
+args = parser.parse_args()
+
 if not os.path.exists(SYMBOLS_FILE):
     raise FileNotFoundError(f"Sembol dosyası bulunamadı: {SYMBOLS_FILE}")
 
@@ -66,37 +91,54 @@ cursor.execute(
     """
 )
 conn.commit()
+ingest_manifest.ensure_manifest_table(conn)
 
 print(f"Veritabanı hazır: {DB_PATH}")
 
 
-def fetch_full_history(symbol: str) -> pd.DataFrame | None:
-    """Verilen sembol için 1986'dan bugüne kadar tüm veriyi parça parça çeker."""
+def fetch_range(symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
+    """Tek aralık: önce disk önbelleği, yoksa hız sınırlı ve tekrar denemeli indirme."""
+    download = partial(
+        fetch_stock_data,
+        symbols=symbol,
+        start_date=start_date,
+        end_date=end_date,
+        save_to_excel=False,
+    )
+    return fetch_cache.cached_fetch(
+        symbol, start_date, end_date,
+        lambda: call_with_retry(download, limiter=request_limiter, label=symbol),
+    )
+
+
+def fetch_full_history(symbol: str, date_ranges: list[tuple[str, str]] = DATE_RANGES) -> tuple[pd.DataFrame | None, list[RangeResult]]:
+    """
+    Verilen sembol için date_ranges (varsayılan: 1986'dan bugüne) aralıklarını
+    parça parça çeker. Birleşik veriyle birlikte her aralığın sonucunu
+    (manifesto için) döndürür.
+    """
     parts = []
+    results = []
 
-    for start_date, end_date in DATE_RANGES:
+    for start_date, end_date in date_ranges:
         print(f"[{symbol}] {start_date} - {end_date} aralığı çekiliyor...")
         try:
-            df_part = fetch_stock_data(
-                symbols=symbol,
-                start_date=start_date,
-                end_date=end_date,
-                save_to_excel=False,
-            )
+            df_part = fetch_range(symbol, start_date, end_date)
         except Exception as e:
             print(f"[{symbol}] HATA ({start_date} - {end_date}): {e}")
+            results.append(RangeResult(symbol, start_date, end_date, ingest_manifest.STATUS_FAILED, error=str(e)))
             continue
 
         if df_part is None or df_part.empty:
             print(f"[{symbol}] Uyarı: Bu aralıkta veri yok ({start_date} - {end_date}).")
+            results.append(RangeResult(symbol, start_date, end_date, ingest_manifest.STATUS_EMPTY))
         else:
             parts.append(df_part)
-
-        time.sleep(REQUEST_SLEEP)
+            results.append(RangeResult(symbol, start_date, end_date, ingest_manifest.STATUS_OK, rows=len(df_part)))
 
     if not parts:
         print(f"[{symbol}] Hiç veri alınamadı.")
-        return None
+        return None, results
 
     df_all = pd.concat(parts, ignore_index=True)
 
@@ -104,11 +146,11 @@ def fetch_full_history(symbol: str) -> pd.DataFrame | None:
     df_all = df_all.sort_values("HGDG_TARIH")
     df_all = df_all.drop_duplicates(subset=["HGDG_TARIH"], keep="last")
 
-    return df_all
+    return df_all, results
 
 
-def save_to_db(symbol: str, df: pd.DataFrame, conn: sqlite3.Connection):
-    """DataFrame'i prices tablosuna yazar."""
+def save_to_db(symbol: str, df: pd.DataFrame, writer: db_writer.BulkWriter):
+    """DataFrame'i prices tablosuna yazar; (symbol, date) zaten varsa satır güncellenir."""
     rename_map = {
         "HGDG_TARIH": "date",
         "HGDG_KAPANIS": "close",
@@ -131,36 +173,68 @@ def save_to_db(symbol: str, df: pd.DataFrame, conn: sqlite3.Connection):
     df_db = df_db[["symbol", "date", "close", "low", "high", "volume"]]
 
 
-    df_db.to_sql("prices", conn, if_exists="append", index=False)
+    writer.write(df_db)
 
 
 
-for idx, symbol in enumerate(symbols, start=1):
-    print("\n" + "=" * 80)
-    print(f"[{idx}/{len(symbols)}] Sembol işleniyor: {symbol}")
-    print("=" * 80)
+# Sembol başına son tarih tek sorguda okunur (sembol başına COUNT(*) yerine)
+last_dates = db_writer.last_stored_dates(conn, "prices")
 
-    cursor.execute(
-        "SELECT COUNT(*) FROM prices WHERE symbol = ?",
-        (symbol,),
-    )
-    count_existing = cursor.fetchone()[0]
+if args.resume:
+    # Yalnızca başarısız (bekleme süresi dolmuş) ve hiç denenmemiş aralıklar
+    plan = ingest_manifest.resume_plan(conn, symbols, DATE_RANGES, set(last_dates))
+    pending = list(plan.items())
+    print(f"Devam modu: {sum(len(r) for _, r in pending)} aralık yeniden denenecek.")
+else:
+    pending = []
+    for symbol in symbols:
+        last_date = last_dates.get(symbol)
 
-    if count_existing > 0:
-        print(f"[{symbol}] Zaten veritabanında {count_existing} satır var. Atlanıyor.")
-        continue
+        if last_date is not None and not args.update:
+            print(f"[{symbol}] Zaten veritabanında (son tarih {last_date}). Atlanıyor.")
+            continue
 
-    df_symbol = fetch_full_history(symbol)
+        ranges = missing_ranges(DATE_RANGES, last_date)
+        if not ranges:
+            print(f"[{symbol}] Güncel (son tarih {last_date}).")
+            continue
+        pending.append((symbol, ranges))
+
+print(f"{len(pending)} sembol indirilecek ({FETCH_WORKERS} thread, istekler arası en az {REQUEST_SLEEP} sn).")
+
+# İndirme thread'lerde, yazma yalnızca bu (ana) thread'de yapılır. Yazımlar
+# toplu yükleme oturumunda BULK_COMMIT_ROWS satırlık transaction'larla yapılır.
+started = time.perf_counter()
+jobs = iter_concurrent(pending, lambda job: fetch_full_history(*job), FETCH_WORKERS)
+with db_writer.bulk_load(conn, "prices") as writer:
+    for idx, ((symbol, _), result, error) in enumerate(jobs, start=1):
+        print("\n" + "=" * 80)
+        print(f"[{idx}/{len(pending)}] Sembol tamamlandı: {symbol}")
+        print("=" * 80)
+
+        if error is not None:
+            print(f"[{symbol}] HATA: {error}")
+            continue
 
-    if df_symbol is None or df_symbol.empty:
-        print(f"[{symbol}] Veri yok, DB'ye yazılmayacak.")
-        continue
+        df_symbol, range_results = result
+
+        # Manifesto satırları fiyatlardan önce yazılır ki ikisi her zaman aynı
+        # transaction'a düşsün: süreç ölürse birlikte geri alınır, --resume
+        # aralığı yeniden ister.
+        ingest_manifest.record_results(conn, range_results)
+        if df_symbol is None or df_symbol.empty:
+            print(f"[{symbol}] Veri yok, DB'ye yazılmayacak.")
+            continue
 
-    print(f"[{symbol}] Toplam {len(df_symbol)} satır veri alındı, DB'ye yazılıyor...")
-    save_to_db(symbol, df_symbol, conn)
-    conn.commit()
-    print(f"[{symbol}] KAYDEDİLDİ.")
+        print(f"[{symbol}] Toplam {len(df_symbol)} satır veri alındı, DB'ye yazılıyor...")
+        save_to_db(symbol, df_symbol, writer)
+        print(f"[{symbol}] KAYDEDİLDİ.")
 
+print(f"Yazma: {writer.throughput()}")
+print(f"\nİndirme süresi: {time.perf_counter() - started:.1f} sn ({fetch_cache.format_stats()})")
+print(ingest_manifest.format_summary(conn))
+if ingest_manifest.summary(conn).get(ingest_manifest.STATUS_FAILED):
+    print("Başarısız aralıklar için: python build_bist_db.py --resume")
 print("\nTÜM İŞLEM BİTTİ.")
 print(f"Veritabanı dosyası: {DB_PATH}")
 
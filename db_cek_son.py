@@ -6,16 +6,22 @@
 # -----------------------------------------------------------------------------
 
 import os
-import time
 import sqlite3
 from datetime import datetime
+from functools import partial
 
 import pandas as pd
-import pandas_ta as ta
 from isyatirimhisse import fetch_stock_data
 
+import db_writer
+import fetch_cache
+import indicators
+from fetch_pool import TokenBucket, call_with_retry, iter_concurrent, missing_ranges
+
 
 USE_TEST_MODE = True
+# True: kayıtlı semboller için yalnızca son tarihten sonraki barlar çekilir
+UPDATE_MODE = False
 SYMBOLS_FILE_ALL = r"C:\Users\emre\Desktop\borsa\bist_symbols.txt"
 SYMBOLS_FILE_TEST = r"C:\Users\emre\Desktop\borsa\bist_symbols_test.txt"
 DB_FOLDER = r"C:\Users\emre\Desktop\borsa"
@@ -36,6 +42,11 @@ DATE_RANGES = [
 
 REQUEST_SLEEP = 1.5
 
+# Eşzamanlı indirme thread'i sayısı (1 = seri); hız sınırı thread'ler arasında ortak
+FETCH_WORKERS = 4
+
+request_limiter = TokenBucket.from_interval(REQUEST_SLEEP)
+
 if not os.path.exists(SYMBOLS_FILE):
     raise FileNotFoundError(f"Sembol dosyası bulunamadı: {SYMBOLS_FILE}")
 
@@ -53,66 +64,60 @@ cursor = conn.cursor()
 print(f"Veritabanı yolu: {DB_PATH}")
 
 
+TECHNICAL_COLUMNS = (
+    ['pct_change', 'RSI_14', 'MACD_12_26_9', 'MACDh_12_26_9', 'MACDs_12_26_9', 'SMA_50', 'SMA_200']
+    + indicators.BB_COLS
+)
+
+
 def add_technical_indicators(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Teknik indikatörleri ekler. Hesaplama yapılamazsa sütunları boş (None) olarak ekler
-    ki veritabanı şeması bozulmasın.
+    Teknik indikatörleri (indicators kayıt defterinden) ekler. Hesaplama
+    yapılamazsa sütunları boş (None) olarak ekler ki veritabanı şeması bozulmasın.
     """
-    expected_cols = [
-        'pct_change',
-        'RSI_14',
-        'MACD_12_26_9', 'MACDh_12_26_9', 'MACDs_12_26_9',
-        'SMA_50', 'SMA_200',
-    ]
-
     if 'close' not in df.columns or len(df) < 2:
-        for col in expected_cols:
+        for col in TECHNICAL_COLUMNS:
             df[col] = None
         return df
 
     try:
-        df['pct_change'] = df['close'].pct_change()
-
-        if len(df) >= 14:
-            df['RSI_14'] = df.ta.rsi(close='close', length=14)
-
-        if len(df) >= 26:
-            df.ta.macd(close='close', fast=12, slow=26, signal=9, append=True)
-
-        if len(df) >= 50:
-            df['SMA_50'] = df.ta.sma(close='close', length=50)
-        if len(df) >= 200:
-            df['SMA_200'] = df.ta.sma(close='close', length=200)
-
-        if len(df) >= 20:
-            df.ta.bbands(close='close', length=20, std=2, append=True)
-
+        computed = indicators.compute(df, TECHNICAL_COLUMNS)
+        for col in TECHNICAL_COLUMNS:
+            df[col] = computed[col]
     except Exception as e:
         print(f"    ! İndikatör hesaplama hatası: {e}")
 
-    for col in expected_cols:
+    for col in TECHNICAL_COLUMNS:
         if col not in df.columns:
             df[col] = None
 
     return df
 
 
-def fetch_full_history(symbol: str) -> pd.DataFrame | None:
+def fetch_range(symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
+    """Tek aralık: önce disk önbelleği, yoksa hız sınırlı ve tekrar denemeli indirme."""
+    download = partial(
+        fetch_stock_data,
+        symbols=symbol,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    return fetch_cache.cached_fetch(
+        symbol, start_date, end_date,
+        lambda: call_with_retry(download, limiter=request_limiter, label=symbol),
+    )
+
+
+def fetch_full_history(symbol: str, date_ranges: list[tuple[str, str]] = DATE_RANGES) -> pd.DataFrame | None:
     """Parçalı veri çekimi yapar."""
     parts = []
-    for start_date, end_date in DATE_RANGES:
+    for start_date, end_date in date_ranges:
         print(f"  -> {start_date} - {end_date} çekiliyor...")
         try:
-            df_part = fetch_stock_data(
-                symbols=symbol,
-                start_date=start_date,
-                end_date=end_date
-            )
+            df_part = fetch_range(symbol, start_date, end_date)
             if df_part is not None and not df_part.empty:
                 parts.append(df_part)
 
-            time.sleep(REQUEST_SLEEP)
-
         except Exception:
             continue
 
@@ -129,11 +134,8 @@ def fetch_full_history(symbol: str) -> pd.DataFrame | None:
     return df_all
 
 
-def process_and_save(symbol: str, df: pd.DataFrame, conn: sqlite3.Connection):
-    """
-    İstenmeyen sütunları siler, sıralamayı düzenler ve kaydeder.
-    """
-
+def clean_columns(symbol: str, df: pd.DataFrame) -> pd.DataFrame:
+    """HGDG kolonlarını yeniden adlandırır, istenmeyenleri siler, tarihi YYYY-MM-DD yapar."""
     rename_map = {
         "HGDG_TARIH": "date",
         "HGDG_KAPANIS": "close",
@@ -153,53 +155,187 @@ def process_and_save(symbol: str, df: pd.DataFrame, conn: sqlite3.Connection):
     df['symbol'] = symbol
 
     if 'date' in df.columns:
-        df['date'] = df['date'].dt.strftime("%Y-%m-%d")
+        df['date'] = pd.to_datetime(df['date']).dt.strftime("%Y-%m-%d")
 
     if 'close' in df.columns:
         df['close'] = pd.to_numeric(df['close'], errors='coerce')
-        df = add_technical_indicators(df)
 
+    return df
+
+
+def order_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """symbol ve date kolonlarını başa alır."""
     cols = df.columns.tolist()
     if 'symbol' in cols:
         cols.insert(0, cols.pop(cols.index('symbol')))
     if 'date' in cols:
         cols.insert(1, cols.pop(cols.index('date')))
+    return df[cols]
+
+
+def process_and_save(symbol: str, df: pd.DataFrame, conn: sqlite3.Connection):
+    """
+    İstenmeyen sütunları siler, sıralamayı düzenler ve kaydeder.
+    """
+    df = clean_columns(symbol, df)
+    if 'close' in df.columns:
+        df = add_technical_indicators(df)
 
-    df = df[cols]
+    df = order_columns(df)
 
     try:
-        df.to_sql("prices", conn, if_exists="append", index=False)
+        db_writer.upsert_rows(conn, "prices", df, keys=("symbol", "date"), commit=False)
+        save_indicator_state(symbol, df, conn)
         return True
     except Exception as e:
         print(f"    ! DB Hatası: {e}")
         return False
 
 
+def save_indicator_state(symbol: str, df: pd.DataFrame, conn: sqlite3.Connection):
+    """
+    Sembolün indikatör durumunu saklar; sonraki barlar extend_and_save ile
+    tüm geçmiş yeniden hesaplanmadan eklenebilir.
+    """
+    if not {'date', 'close', 'high', 'low', 'volume'}.issubset(df.columns) or df.empty:
+        return
+    try:
+        _, state = indicators.compute_indicators_full(df)
+        indicators.save_state(conn, symbol, df['date'].iloc[-1], state)
+        conn.commit()
+    except Exception as e:
+        print(f"    ! İndikatör durumu kaydedilemedi: {e}")
 
-for idx, symbol in enumerate(symbols, start=1):
-    print("\n" + "-" * 50)
-    print(f"[{idx}/{len(symbols)}] {symbol}")
+
+def extend_and_save(symbol: str, df: pd.DataFrame, conn: sqlite3.Connection) -> bool:
+    """
+    Kayıtlı durumdan devam ederek yalnızca son kayıttan sonraki barların
+    indikatörlerini hesaplar ve prices tablosuna ekler. Durum yoksa False döner
+    (çağıran tam hesaba, process_and_save'e düşmelidir).
+    """
+    saved = indicators.load_state(conn, symbol)
+    if saved is None or saved[1]['n_rows'] < indicators.MIN_STATE_ROWS:
+        return False
+    last_date, state = saved
+
+    df = clean_columns(symbol, df)
+    df = df[df['date'] > last_date].sort_values('date')
+    if df.empty:
+        return True
+
+    out, state = indicators.extend_indicators(df, state)
+    existing = [row[1] for row in conn.execute("PRAGMA table_info(prices)")]
+    new_rows = df.copy()
+    for col in out.columns:
+        new_rows[col] = out[col]
+    new_rows = new_rows[[c for c in existing if c in new_rows.columns]]
 
     try:
-        cursor.execute("SELECT COUNT(*) FROM prices WHERE symbol = ?", (symbol,))
-        if cursor.fetchone()[0] > 0:
-            print(f" -> Zaten var. Geçiliyor.")
-            continue
-    except sqlite3.OperationalError:
-        pass
+        db_writer.upsert_rows(conn, "prices", new_rows, keys=("symbol", "date"), commit=False)
+        indicators.save_state(conn, symbol, df['date'].iloc[-1], state)
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"    ! DB Hatası: {e}")
+        return False
 
-    df_symbol = fetch_full_history(symbol)
 
-    if df_symbol is None or df_symbol.empty:
-        print(f" -> Veri yok.")
+def recompute_tail_and_save(symbol: str, df: pd.DataFrame, conn: sqlite3.Connection, last_date: str) -> bool:
+    """
+    Durum yoksa (ya da prices tablosunun gerisindeyse) yeni barların
+    indikatörlerini, önlerine kayıtlı geçmişten ısınma satırları ekleyerek
+    hesaplar. Yalnızca pencere tabanlı kolonlar için son warmup_rows satır
+    yeterlidir; özyinelemeli kolon (RSI, MACD) varsa tüm geçmiş okunur ve
+    sonraki güncellemeler için durum da kaydedilir. Yazma (symbol, date)
+    anahtarıyla idempotenttir.
+    """
+    new = clean_columns(symbol, df)
+    new = new[new['date'] > last_date].sort_values('date')
+    if new.empty:
+        return True
+
+    recursive = any(indicators.is_recursive(c) for c in TECHNICAL_COLUMNS)
+    limit = -1 if recursive else indicators.warmup_rows(TECHNICAL_COLUMNS)
+    stored = set(db_writer.table_columns(conn, "prices"))
+    raw_cols = ['date'] + [c for c in indicators.RAW_INPUTS if c in stored and c in new.columns]
+    history = pd.read_sql(
+        f"SELECT {', '.join(raw_cols)} FROM prices WHERE symbol = ? AND date <= ? ORDER BY date DESC LIMIT ?",
+        conn, params=(symbol, last_date, limit),
+    ).iloc[::-1]
+
+    combined = pd.concat([history, new[raw_cols]], ignore_index=True)
+    combined = add_technical_indicators(combined)
+    tail = combined.iloc[len(history):]
+    for col in TECHNICAL_COLUMNS:
+        new[col] = tail[col].to_numpy()
+    new = order_columns(new)
+
+    try:
+        db_writer.upsert_rows(conn, "prices", new, keys=("symbol", "date"), commit=False)
+        conn.commit()
+    except Exception as e:
+        print(f"    ! DB Hatası: {e}")
+        return False
+
+    if limit == -1:
+        save_indicator_state(symbol, combined, conn)
+    return True
+
+
+def update_and_save(symbol: str, df: pd.DataFrame, conn: sqlite3.Connection, last_date: str) -> bool:
+    """Kayıtlı sembole yeni barları ekler: mümkünse durumdan uzatır, değilse kuyruğu yeniden hesaplar."""
+    saved = indicators.load_state(conn, symbol)
+    if saved is not None and saved[0] == last_date and extend_and_save(symbol, df, conn):
+        return True
+    return recompute_tail_and_save(symbol, df, conn, last_date)
+
+
+
+# Sembol başına son tarih tek sorguda okunur (tablo yoksa boş)
+last_dates = db_writer.last_stored_dates(conn, "prices")
+
+pending = []
+for symbol in symbols:
+    last_date = last_dates.get(symbol)
+    if last_date is not None and not UPDATE_MODE:
+        print(f"{symbol} -> Zaten var. Geçiliyor.")
+        continue
+
+    ranges = missing_ranges(DATE_RANGES, last_date)
+    if not ranges:
+        print(f"{symbol} -> Güncel ({last_date}).")
         continue
+    pending.append((symbol, ranges))
+
+# İndirme thread havuzunda; indikatör hesabı ve DB yazımı yalnızca ana thread'de.
+jobs = iter_concurrent(pending, lambda job: fetch_full_history(*job), FETCH_WORKERS)
+# Sembol başına commit kalır (indikatör durumu satırlarla birlikte yazılmalı);
+# WAL + synchronous=NORMAL altında commit'ler fsync beklemez.
+with db_writer.bulk_load(conn, "prices"):
+    for idx, ((symbol, _), df_symbol, error) in enumerate(jobs, start=1):
+        print("\n" + "-" * 50)
+        print(f"[{idx}/{len(pending)}] {symbol}")
+
+        if error is not None:
+            print(f" -> İndirme hatası: {error}")
+            continue
+
+        if df_symbol is None or df_symbol.empty:
+            print(f" -> Veri yok.")
+            continue
+
+        print(f" -> {len(df_symbol)} satır. İşleniyor...")
 
-    print(f" -> {len(df_symbol)} satır. İşleniyor...")
+        if symbol in last_dates:
+            saved = update_and_save(symbol, df_symbol, conn, last_dates[symbol])
+        else:
+            saved = process_and_save(symbol, df_symbol, conn)
 
-    if process_and_save(symbol, df_symbol, conn):
-        print(" -> KAYDEDİLDİ.")
-    else:
-        print(" -> HATA OLUŞTU.")
+        if saved:
+            print(" -> KAYDEDİLDİ.")
+        else:
+            print(" -> HATA OLUŞTU.")
 
 conn.close()
+print(fetch_cache.format_stats())
 print("\nBİTTİ.")
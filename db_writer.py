@@ -0,0 +1,359 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Dogan Ege BULTE
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+# -----------------------------------------------------------------------------
+#
+# model_data gibi büyük tabloları to_sql(if_exists='replace') ile baştan yazmak
+# yerine yalnızca değişen kolonları yerinde güncelleyen yardımcılar. Tablo,
+# tipleri ve indeksleri korunur; geçici olarak iki kat disk kullanılmaz.
+#
+# Toplu yükleme (bulk_load + BulkWriter): WAL, synchronous=NORMAL ve büyük
+# sayfa önbelleğiyle hazır executemany upsert'leri büyük transaction'larda
+# yazar; ikincil indeksler yükleme sırasında kaldırılıp sonda bir kez kurulur.
+# -----------------------------------------------------------------------------
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+import pandas as pd
+
+from perf_utils import format_throughput
+
+# Tek executemany çağrısına verilen satır sayısı (hepsi tek transaction içinde)
+UPSERT_BATCH_SIZE = 50_000
+
+# Toplu yüklemede commit aralığı (satır) ve sayfa önbelleği (KB)
+BULK_COMMIT_ROWS = 500_000
+BULK_CACHE_SIZE_KB = 256 * 1024
+
+
+def quote_identifier(name: str) -> str:
+    """bbl_20_2.0_2.0 gibi nokta içeren kolon adları için SQL tırnaklaması."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sql_type(series: pd.Series) -> str:
+    if pd.api.types.is_integer_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return "INTEGER"
+    if pd.api.types.is_numeric_dtype(series):
+        return "REAL"
+    return "TEXT"
+
+
+def table_columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table)})")]
+
+
+def table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+def create_table(conn: sqlite3.Connection, table: str, df: pd.DataFrame, keys: tuple[str, ...]) -> None:
+    """df kolonlarıyla, anahtar üzerinde PRIMARY KEY olan tabloyu (yoksa) oluşturur."""
+    cols = ",\n    ".join(
+        f"{quote_identifier(c)} {_sql_type(df[c])}" + (" NOT NULL" if c in keys else "")
+        for c in df.columns
+    )
+    pk = ", ".join(quote_identifier(k) for k in keys)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {quote_identifier(table)} (\n    {cols},\n    PRIMARY KEY ({pk})\n)")
+
+
+def ensure_columns(conn: sqlite3.Connection, table: str, df: pd.DataFrame, columns: list[str]) -> list[str]:
+    """Tabloda olmayan kolonları df'teki tiplerine göre ALTER TABLE ile ekler; eklenenleri döndürür."""
+    existing = set(table_columns(conn, table))
+    added = []
+    for col in columns:
+        if col not in existing:
+            conn.execute(f"ALTER TABLE {quote_identifier(table)} ADD COLUMN {quote_identifier(col)} {_sql_type(df[col])}")
+            added.append(col)
+    return added
+
+
+def ensure_key_index(conn: sqlite3.Connection, table: str, keys: tuple[str, ...]) -> None:
+    """Anahtar kolonlarla başlayan bir indeks yoksa oluşturur (UPDATE ... WHERE için şart)."""
+    for row in conn.execute(f"PRAGMA index_list({quote_identifier(table)})"):
+        index_cols = [r[2] for r in conn.execute(f"PRAGMA index_info({quote_identifier(row[1])})")]
+        if tuple(index_cols[:len(keys)]) == tuple(keys):
+            return
+    name = f"idx_{table}_{'_'.join(keys)}"
+    cols = ", ".join(quote_identifier(k) for k in keys)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {quote_identifier(name)} ON {quote_identifier(table)} ({cols})")
+
+
+def upsert_columns(conn: sqlite3.Connection, table: str, df: pd.DataFrame, keys: tuple[str, ...] = ('symbol', 'date'),
+                   columns: list[str] | None = None, batch_size: int = UPSERT_BATCH_SIZE,
+                   commit: bool = True) -> int:
+    """
+    df'teki `columns` (varsayılan: anahtar dışındaki tüm kolonlar) değerlerini
+    tabloda anahtarı eşleşen satırlara yazar. Eksik kolonlar ALTER TABLE ile
+    eklenir, güncellemeler batch_size'lık executemany çağrılarıyla tek
+    transaction içinde yapılır. NaN değerler NULL olarak yazılır. Tabloda
+    karşılığı olmayan anahtarlar yok sayılır. Güncellenen satır sayısını döndürür.
+    """
+    keys = tuple(keys)
+    columns = [c for c in (columns or df.columns) if c not in keys]
+    if df.empty or not columns:
+        return 0
+
+    try:
+        ensure_columns(conn, table, df, columns)
+        ensure_key_index(conn, table, keys)
+
+        assignments = ", ".join(f"{quote_identifier(c)} = ?" for c in columns)
+        condition = " AND ".join(f"{quote_identifier(k)} = ?" for k in keys)
+        sql = f"UPDATE {quote_identifier(table)} SET {assignments} WHERE {condition}"
+
+        # tolist() numpy tiplerini sqlite3'ün bağlayabildiği Python tiplerine çevirir
+        rows = zip(*(df[c].tolist() for c in columns + list(keys)))
+        updated = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            cursor = conn.executemany(sql, batch)
+            updated += cursor.rowcount
+        if commit:
+            conn.commit()
+        return updated
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def ensure_unique_index(conn: sqlite3.Connection, table: str, keys: tuple[str, ...]) -> None:
+    """
+    Anahtar kolonlar üzerinde tekil indeks (ya da PRIMARY KEY) yoksa oluşturur
+    (ON CONFLICT için şart). Eski to_sql(append) çalıştırmalarının bıraktığı
+    tekrar eden anahtarlardan önce en son eklenen (en büyük rowid) satır
+    bırakılır, diğerleri silinir.
+    """
+    for row in conn.execute(f"PRAGMA index_list({quote_identifier(table)})"):
+        if not row[2]:
+            continue
+        index_cols = [r[2] for r in conn.execute(f"PRAGMA index_info({quote_identifier(row[1])})")]
+        if set(index_cols) == set(keys):
+            return
+    name = f"uq_{table}_{'_'.join(keys)}"
+    cols = ", ".join(quote_identifier(k) for k in keys)
+    not_null = " AND ".join(f"{quote_identifier(k)} IS NOT NULL" for k in keys)
+    removed = conn.execute(
+        f"DELETE FROM {quote_identifier(table)} WHERE {not_null} AND rowid NOT IN "
+        f"(SELECT MAX(rowid) FROM {quote_identifier(table)} GROUP BY {cols})"
+    ).rowcount
+    if removed:
+        print(f"   -> {table}: {removed} tekrar eden ({', '.join(keys)}) satırı silindi (sonuncusu kaldı).")
+    conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {quote_identifier(name)} ON {quote_identifier(table)} ({cols})")
+
+
+def upsert_rows(conn: sqlite3.Connection, table: str, df: pd.DataFrame, keys: tuple[str, ...] = ('symbol', 'date'),
+                batch_size: int = UPSERT_BATCH_SIZE, commit: bool = True) -> int:
+    """
+    df satırlarını tabloya ekler; anahtarı zaten olan satırların kolonlarını
+    günceller (INSERT ... ON CONFLICT DO UPDATE). Aynı veri iki kez yazılsa da
+    sonuç değişmez. Tablo yoksa anahtar PRIMARY KEY olacak şekilde oluşturulur,
+    eksik kolonlar ALTER TABLE ile eklenir, NaN değerler NULL olarak yazılır.
+    Yazılan satır sayısını döndürür.
+    """
+    keys = tuple(keys)
+    columns = list(df.columns)
+    values = [c for c in columns if c not in keys]
+    if df.empty:
+        return 0
+
+    try:
+        if not table_exists(conn, table):
+            create_table(conn, table, df, keys)
+        ensure_columns(conn, table, df, values)
+        ensure_unique_index(conn, table, keys)
+
+        col_sql = ", ".join(quote_identifier(c) for c in columns)
+        placeholders = ", ".join("?" for _ in columns)
+        conflict = ", ".join(quote_identifier(k) for k in keys)
+        if values:
+            updates = ", ".join(f"{quote_identifier(c)} = excluded.{quote_identifier(c)}" for c in values)
+            action = f"DO UPDATE SET {updates}"
+        else:
+            action = "DO NOTHING"
+        sql = (f"INSERT INTO {quote_identifier(table)} ({col_sql}) VALUES ({placeholders}) "
+               f"ON CONFLICT ({conflict}) {action}")
+
+        rows = zip(*(df[c].tolist() for c in columns))
+        written = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            conn.executemany(sql, batch)
+            written += len(batch)
+        if commit:
+            conn.commit()
+        return written
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def last_stored_dates(conn: sqlite3.Connection, table: str = "prices") -> dict[str, str]:
+    """Sembol başına tablodaki en son tarih (tek GROUP BY sorgusu); tablo yoksa boş sözlük."""
+    try:
+        rows = conn.execute(
+            f"SELECT symbol, MAX(date) FROM {quote_identifier(table)} GROUP BY symbol"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    return {symbol: last for symbol, last in rows if last is not None}
+
+
+class BulkWriter:
+    """
+    upsert_rows çağrılarını biriktirip her commit_rows satırda bir commit eder.
+    Aynı bağlantıda yapılan diğer yazımlar (örn. manifesto) de aynı
+    transaction'a girer. Bağlam yöneticisi çıkışta kalanları commit eder,
+    hata olursa son commit'ten sonrasını geri alır.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, table: str, keys: tuple[str, ...] = ('symbol', 'date'),
+                 commit_rows: int = BULK_COMMIT_ROWS):
+        self.conn = conn
+        self.table = table
+        self.keys = tuple(keys)
+        self.commit_rows = commit_rows
+        self.pending = 0
+        self.total = 0
+        self.started = time.perf_counter()
+
+    def write(self, df: pd.DataFrame) -> int:
+        written = upsert_rows(self.conn, self.table, df, self.keys, commit=False)
+        self.pending += written
+        self.total += written
+        if self.pending >= self.commit_rows:
+            self.commit()
+        return written
+
+    def commit(self) -> None:
+        self.conn.commit()
+        self.pending = 0
+
+    def throughput(self) -> str:
+        return format_throughput(self.total, time.perf_counter() - self.started)
+
+    def __enter__(self) -> "BulkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.conn.rollback()
+
+
+def _secondary_indexes(conn: sqlite3.Connection, table: str) -> list[tuple[str, str]]:
+    """Tablonun tekil olmayan, CREATE INDEX ile kurulmuş indeksleri: (ad, sql)."""
+    unique = {row[1] for row in conn.execute(f"PRAGMA index_list({quote_identifier(table)})") if row[2]}
+    return [
+        (name, sql) for name, sql in conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (table,),
+        )
+        if name not in unique
+    ]
+
+
+@contextmanager
+def bulk_load(conn: sqlite3.Connection, table: str, keys: tuple[str, ...] = ('symbol', 'date'),
+              commit_rows: int = BULK_COMMIT_ROWS):
+    """
+    Toplu yükleme oturumu. WAL + synchronous=NORMAL (commit başına fsync yok)
+    ve büyük cache_size ayarlanır, tablonun ikincil indeksleri düşürülür; çıkışta
+    indeksler tek seferde yeniden kurulur ve ayarlar geri alınır. Anahtar
+    üzerindeki tekil indeks upsert için gerektiğinden korunur. BulkWriter döner.
+    """
+    synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{BULK_CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+    deferred = _secondary_indexes(conn, table) if table_exists(conn, table) else []
+    for name, _ in deferred:
+        conn.execute(f"DROP INDEX IF EXISTS {quote_identifier(name)}")
+    conn.commit()
+
+    try:
+        with BulkWriter(conn, table, keys, commit_rows) as writer:
+            yield writer
+    finally:
+        if deferred:
+            started = time.perf_counter()
+            for _, sql in deferred:
+                conn.execute(sql)
+            conn.commit()
+            print(f"   -> {len(deferred)} indeks yeniden kuruldu ({time.perf_counter() - started:.1f} sn)")
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+        conn.execute(f"PRAGMA cache_size={cache_size}")
+
+
+def _synthetic_prices(symbols: int, rows: int) -> list[pd.DataFrame]:
+    dates = pd.bdate_range("1990-01-01", periods=rows).strftime("%Y-%m-%d")
+    frames = []
+    for i in range(symbols):
+        close = 10.0 + (pd.Series(range(rows), dtype=float) * 0.01 + i) % 50
+        frames.append(pd.DataFrame({
+            "symbol": f"S{i:04d}", "date": dates, "close": close,
+            "low": close * 0.99, "high": close * 1.01, "volume": close * 1000.0,
+        }))
+    return frames
+
+
+def benchmark_bulk_load(symbols: int = 100, rows: int = 5000) -> None:
+    """Sembol başına to_sql(append) + commit ile toplu yükleyiciyi satır/sn olarak karşılaştırır."""
+    frames = _synthetic_prices(symbols, rows)
+    total = symbols * rows
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "to_sql.db"))
+        conn.execute(
+            "CREATE TABLE prices (symbol TEXT NOT NULL, date TEXT NOT NULL, close REAL, low REAL, "
+            "high REAL, volume REAL, PRIMARY KEY (symbol, date))"
+        )
+        started = time.perf_counter()
+        for df in frames:
+            df.to_sql("prices", conn, if_exists="append", index=False)
+            conn.commit()
+        print(f"to_sql (append)  : {format_throughput(total, time.perf_counter() - started)}")
+        conn.close()
+
+        conn = sqlite3.connect(os.path.join(tmp, "bulk.db"))
+        started = time.perf_counter()
+        with bulk_load(conn, "prices") as writer:
+            for df in frames:
+                writer.write(df)
+        print(f"bulk_load        : {format_throughput(total, time.perf_counter() - started)}")
+
+        # Aynı veriyi tekrar yazmak satır sayısını değiştirmemeli (upsert)
+        with bulk_load(conn, "prices") as writer:
+            writer.write(frames[0])
+        assert conn.execute("SELECT COUNT(*) FROM prices").fetchone()[0] == total
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SQLite yazma yardımcıları")
+    parser.add_argument("--benchmark", action="store_true", help="to_sql ile toplu yükleyiciyi karşılaştır")
+    parser.add_argument("--symbols", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=5000, help="Sembol başına satır")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_bulk_load(args.symbols, args.rows)
+    else:
+        parser.print_help()
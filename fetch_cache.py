@@ -0,0 +1,147 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Dogan Ege BULTE
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+# -----------------------------------------------------------------------------
+#
+# fetch_stock_data yanıtları için disk önbelleği. Her (sembol, başlangıç, bitiş)
+# isteği gzip'li bir pickle dosyasında saklanır. Bitiş tarihinden sonra
+# indirilmiş (kapanmış) aralıklar değişmez kabul edilir ve hiç yenilenmez;
+# bugünü içeren aralık CURRENT_RANGE_TTL saniye sonra tekrar indirilir.
+# Boş yanıtlar kapanmış aralıkta da EMPTY_RANGE_TTL sonra yeniden istenir
+# (geçici bir boş yanıt aralığı kalıcı olarak boşaltmasın); None yanıt hiç
+# saklanmaz, FetchFailed olarak yükselir. Bitiş tarihi her gün değiştiği için
+# açık aralık her çalıştırmada yeni bir dosyaya yazılır; yazılırken aynı
+# sembolün bitişi geçmiş ama hiç kapanmamış (bitiş gününde ya da öncesinde
+# indirilmiş) eski açık aralık dosyaları silinir, bunlar bir daha okunmaz.
+#
+# FORSIGHT_OFFLINE=1 ile ağa hiç çıkılmaz: yalnızca önbellek okunur, olmayan
+# aralık için CacheMiss yükseltilir. Böylece veritabanı ağ olmadan yeniden
+# kurulup ölçülebilir.
+# -----------------------------------------------------------------------------
+
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable
+
+import pandas as pd
+
+CACHE_DIR = os.environ.get(
+    "FORSIGHT_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "fetch_stock_data"),
+)
+
+# Bugünü içeren aralığın geçerlilik süresi (sn)
+CURRENT_RANGE_TTL = 6 * 60 * 60
+
+# Kapanmış aralık için saklanan boş yanıtın geçerlilik süresi (sn)
+EMPTY_RANGE_TTL = 24 * 60 * 60
+
+OFFLINE = os.environ.get("FORSIGHT_OFFLINE", "") not in ("", "0")
+
+_stats = {"hit": 0, "miss": 0, "expired": 0}
+_stats_lock = threading.Lock()
+
+
+class CacheMiss(LookupError):
+    """Çevrimdışı modda önbellekte olmayan aralık istendi."""
+
+
+class FetchFailed(RuntimeError):
+    """fetch() yanıt döndürmedi (None); aralık başarısız sayılır ve saklanmaz."""
+
+
+def _count(kind: str) -> None:
+    with _stats_lock:
+        _stats[kind] += 1
+
+
+def cache_path(symbol: str, start_date: str, end_date: str) -> str:
+    key = f"{symbol}|{start_date}|{end_date}"
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, symbol, f"{start_date}_{end_date}_{digest}.pkl.gz")
+
+
+def _is_fresh(path: str, end_date: str, empty: bool = False) -> bool:
+    """
+    Aralık bittikten sonra indirilmiş dosya (kapanmış aralık) hiç eskimez,
+    boşsa EMPTY_RANGE_TTL uygulanır; bitiş günü ya da öncesinde indirilmişse
+    CURRENT_RANGE_TTL uygulanır.
+    """
+    written = os.path.getmtime(path)
+    age = time.time() - written
+    if datetime.fromtimestamp(written).date() > datetime.strptime(end_date, "%d-%m-%Y").date():
+        return not empty or age < EMPTY_RANGE_TTL
+    return age < CURRENT_RANGE_TTL
+
+
+def _store(path: str, df: pd.DataFrame) -> None:
+    # Aynı aralığı yazan iki thread yarım dosya bırakmasın: geçici dosya + os.replace
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    df.to_pickle(tmp, compression="gzip")
+    os.replace(tmp, path)
+
+
+def _prune_open_ranges(symbol: str, keep: str) -> None:
+    """Sembolün bitişi bugünden önce olup hiç kapanmamış açık aralık dosyalarını siler."""
+    folder = os.path.join(CACHE_DIR, symbol)
+    today = datetime.today().date()
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if path == keep or not name.endswith(".pkl.gz"):
+            continue
+        try:
+            end = datetime.strptime(name.split("_")[1], "%d-%m-%Y").date()
+            if end < today and datetime.fromtimestamp(os.path.getmtime(path)).date() <= end:
+                os.remove(path)
+        except (IndexError, ValueError, FileNotFoundError):
+            continue
+
+
+def cached_fetch(symbol: str, start_date: str, end_date: str,
+                 fetch: Callable[[], pd.DataFrame | None]) -> pd.DataFrame:
+    """
+    Önbellekte geçerli kayıt varsa onu döndürür; yoksa fetch() ile indirip
+    saklar. Boş yanıt da saklanır (örn. sembolün 1990'larda verisi yok) ama
+    EMPTY_RANGE_TTL sonra yenilenir; fetch() None döndürürse hiçbir şey
+    saklanmaz ve FetchFailed yükselir. fetch yalnızca gerçekten ağa
+    çıkılacaksa çağrılır, bu yüzden hız sınırı ve tekrar deneme fetch'in
+    içine konmalıdır.
+    """
+    path = cache_path(symbol, start_date, end_date)
+    if os.path.exists(path):
+        cached = pd.read_pickle(path, compression="gzip")
+        if OFFLINE or _is_fresh(path, end_date, cached.empty):
+            _count("hit")
+            return cached
+        _count("expired")
+    elif OFFLINE:
+        raise CacheMiss(f"{symbol} {start_date} - {end_date} önbellekte yok (çevrimdışı mod)")
+    else:
+        _count("miss")
+
+    df = fetch()
+    if df is None:
+        raise FetchFailed(f"{symbol} {start_date} - {end_date} için yanıt alınamadı")
+    _store(path, df)
+    if datetime.strptime(end_date, "%d-%m-%Y").date() >= datetime.today().date():
+        _prune_open_ranges(symbol, path)
+    return df
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def format_stats() -> str:
+    s = stats()
+    total = sum(s.values())
+    rate = s["hit"] / total if total else 0.0
+    mode = ", çevrimdışı" if OFFLINE else ""
+    return f"önbellek: {s['hit']} isabet, {s['miss']} yeni, {s['expired']} süresi dolmuş ({rate:.0%} isabet{mode})"
@@ -0,0 +1,133 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Dogan Ege BULTE
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+# -----------------------------------------------------------------------------
+#
+# Veri çekme betikleri (build_bist_db, db_cek_son, bist100/fintable) için eşzamanlı indirme
+# yardımcıları. İstekler sınırlı bir thread havuzunda yapılır; tüm thread'ler
+# tek bir token-bucket'ı paylaştığı için siteye giden istek hızı, seri
+# sürümdeki "her çağrıdan sonra REQUEST_SLEEP bekle" sınırını aşmaz.
+# Veritabanına yazma çağıran thread'de kalır (tek yazıcı).
+# -----------------------------------------------------------------------------
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Hata veren istek için toplam deneme sayısı ve bekleme sınırları (sn)
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Saniyede `rate` token dolar, en fazla `capacity`
+    token birikir; acquire() token yoksa bir sonraki token'a kadar bekler.
+    capacity=1 ile istekler arasında en az 1/rate saniye olur.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        if rate <= 0:
+            raise ValueError("rate pozitif olmalı")
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_interval(cls, seconds: float, burst: float = 1.0) -> "TokenBucket":
+        """Seri betiklerdeki REQUEST_SLEEP aralığına karşılık gelen kova."""
+        return cls(1.0 / seconds, burst)
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX) -> float:
+    """Full-jitter üstel bekleme: [0, min(cap, base * 2**attempt)] aralığında rastgele."""
+    return random.uniform(0.0, min(cap, base * (2 ** attempt)))
+
+
+def call_with_retry(fn: Callable[[], R], limiter: TokenBucket | None = None,
+                    attempts: int = MAX_ATTEMPTS, label: str = "") -> R:
+    """
+    fn'i (her denemede limiter'dan token alarak) çağırır; istisna olursa
+    jitter'lı üstel beklemeyle tekrar dener. Son denemenin hatası yükseltilir.
+    """
+    for attempt in range(attempts):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == attempts - 1:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"[{label}] Deneme {attempt + 1}/{attempts} başarısız ({e}); {delay:.1f} sn sonra tekrar.")
+            time.sleep(delay)
+    raise RuntimeError("unreachable")
+
+
+def missing_ranges(date_ranges: list[tuple[str, str]], last_date: str | None) -> list[tuple[str, str]]:
+    """
+    ("gg-aa-yyyy", "gg-aa-yyyy") aralık listesini son kayıtlı tarihten
+    (YYYY-MM-DD) sonraki günlere kırpar; yalnızca eksik pencere istenir.
+    last_date None ise aralıklar olduğu gibi döner, veri güncelse boş liste.
+    """
+    if last_date is None:
+        return list(date_ranges)
+    start = datetime.strptime(last_date, "%Y-%m-%d") + timedelta(days=1)
+    if start.date() > datetime.today().date():
+        return []
+    ranges = []
+    for range_start, range_end in date_ranges:
+        if datetime.strptime(range_end, "%d-%m-%Y") < start:
+            continue
+        begin = max(datetime.strptime(range_start, "%d-%m-%Y"), start)
+        ranges.append((begin.strftime("%d-%m-%Y"), range_end))
+    return ranges
+
+
+def iter_concurrent(items: Iterable[T], fn: Callable[[T], R], workers: int) -> Iterator[tuple[T, R | None, Exception | None]]:
+    """
+    fn(item) çağrılarını `workers` thread'lik havuzda çalıştırır ve sonuçları
+    bitiş sırasına göre (item, sonuç, hata) olarak verir. Tüketici çağıran
+    thread'de çalıştığından veritabanı yazımı tek thread'den yapılır.
+    workers <= 1 ise havuz kurulmadan sırayla çalışır.
+    """
+    if workers <= 1:
+        for item in items:
+            try:
+                yield item, fn(item), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fn, item): item for item in items}
+        try:
+            for future in as_completed(futures):
+                error = future.exception()
+                yield futures[future], (None if error else future.result()), error
+        finally:
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,374 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Dogan Ege BULTE
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+# -----------------------------------------------------------------------------
+#
+# Temel veriler (fintables bilanço kalemleri, Yahoo değerleme çarpanları) için
+# revizyon geçmişli depo. Eski betikler her çalıştırmada tüm tabloyu yeni bir
+# as_of_date ile ekliyordu; tablo aynı satırlarla sınırsız büyüyor, "D
+# tarihinde Y sembolünün X kalemi" sorusu tam tarama gerektiriyordu.
+#
+# Her tablo uzun biçimdedir ve yalnızca değişiklikleri saklar:
+#
+#   symbol, <kalem|field>, period, valid_from, value
+#   PRIMARY KEY (symbol, <kalem|field>, period, valid_from) WITHOUT ROWID
+#
+# Bir (symbol, kalem, period) değeri ilk görüldüğü gün bir satır alır;
+# sonraki çalıştırmalarda değer aynıysa hiçbir şey yazılmaz, değiştiyse
+# (bilanço düzeltmesi) o günün valid_from'uyla yeni bir revizyon eklenir.
+# Bir değer, valid_from'undan bir sonraki revizyona kadar geçerlidir; bu
+# sayede D tarihindeki sorgu yalnızca D'de bilinen değerleri görür (ileriye
+# bakma yok). (kalem, symbol, period, valid_from, value) indeksi tüm evren
+# için tek kalemlik sorguları tabloya dokunmadan karşılar.
+#
+#   python fundamentals_store.py --db fintables_bilancolar.db --table bilanco_kalemleri \
+#       --item "Toplam Varlıklar" --as-of 2024-06-30
+# -----------------------------------------------------------------------------
+
+import argparse
+import re
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import date
+
+import pandas as pd
+
+import db_writer
+from db_writer import quote_identifier
+
+
+@dataclass(frozen=True)
+class FundamentalsTable:
+    name: str
+    item_column: str
+
+    @property
+    def keys(self) -> tuple[str, ...]:
+        return ('symbol', self.item_column, 'period')
+
+    @property
+    def index_name(self) -> str:
+        return f"{self.name}_pit"
+
+
+# bist100/fintable.py: dönem '2024/12' biçiminde, value bilanço tutarı
+BALANCE = FundamentalsTable("bilanco_kalemleri", "kalem")
+# bist100/valu.py, bist100/valuation.py: dönem ölçüm tarihi (YYYY-MM-DD), field çarpan adı
+VALUATION = FundamentalsTable("valuation_measures", "field")
+
+TABLES = {spec.name: spec for spec in (BALANCE, VALUATION)}
+
+# Aynı tarihte birden fazla değerleme satırı varsa sonuncusu tutulur (en güncel tür)
+PERIOD_TYPE_ORDER = {"3M": 0, "TTM": 1, "Current": 2}
+
+_SHORT_MONTH = re.compile(r"^(\d{4})/(\d)$")
+
+# sortable_period'un SQL karşılığı (taşıma veriyi Python'a getirmeden yapılır)
+SORTABLE_PERIOD_SQL = ("CASE WHEN period GLOB '[0-9][0-9][0-9][0-9]/[0-9]' "
+                       "THEN substr(period, 1, 5) || '0' || substr(period, 6) ELSE period END")
+
+
+def sqlite_path(db_url: str) -> str:
+    """'sqlite:///dosya.db' adresinden dosya yolu (düz yol olduğu gibi döner)."""
+    return db_url[len("sqlite:///"):] if db_url.startswith("sqlite:///") else db_url
+
+
+def sortable_period(values: pd.Series) -> pd.Series:
+    """'2024/9' -> '2024/09': dönemler metin olarak sıralanabilsin (en son dönem = MAX)."""
+    # Farklı dönem sayısı az: her benzersiz değer bir kez çevrilir
+    text = values.astype(str)
+    mapping = {p: _SHORT_MONTH.sub(r"\1/0\2", p.strip()) for p in text.unique()}
+    return text.map(mapping)
+
+
+def is_revisioned(conn: sqlite3.Connection, spec: FundamentalsTable) -> bool:
+    return (db_writer.table_exists(conn, spec.name)
+            and 'valid_from' in db_writer.table_columns(conn, spec.name))
+
+
+def create_table(conn: sqlite3.Connection, spec: FundamentalsTable, name: str | None = None) -> None:
+    name = quote_identifier(name or spec.name)
+    item = quote_identifier(spec.item_column)
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {name} ("
+        f"symbol TEXT NOT NULL, {item} TEXT NOT NULL, period TEXT NOT NULL, "
+        f"valid_from TEXT NOT NULL, value REAL, "
+        f"PRIMARY KEY (symbol, {item}, period, valid_from)) WITHOUT ROWID"
+    )
+
+
+def _create_index(conn: sqlite3.Connection, spec: FundamentalsTable) -> None:
+    # Kapsayan indeks: tek kalemin tüm evrendeki değerleri tabloya inmeden okunur
+    item = quote_identifier(spec.item_column)
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS {quote_identifier(spec.index_name)} "
+        f"ON {quote_identifier(spec.name)} ({item}, symbol, period, valid_from, value)"
+    )
+
+
+def compact_revisions(df: pd.DataFrame, spec: FundamentalsTable) -> pd.DataFrame:
+    """
+    Gözlem tarihli (valid_from) satırlardan revizyon listesi: anahtar başına
+    tarih sırasıyla, bir öncekiyle aynı değeri taşıyan satırlar atılır.
+    """
+    keys = list(spec.keys)
+    df = df.sort_values(keys + ['valid_from'], kind='mergesort')
+    df = df.drop_duplicates(subset=keys + ['valid_from'], keep='last')
+
+    same_key = (df[keys] == df[keys].shift()).all(axis=1)
+    previous = df['value'].shift()
+    same_value = (df['value'] == previous) | (df['value'].isna() & previous.isna())
+    return df[~(same_key & same_value)].reset_index(drop=True)
+
+
+def _legacy_valuation_rows(conn: sqlite3.Connection, spec: FundamentalsTable) -> pd.DataFrame:
+    """Eski geniş değerleme tablosu: as_of_date ölçüm tarihidir (çekim günü kaydedilmemiş)."""
+    legacy = pd.read_sql(f"SELECT * FROM {quote_identifier(spec.name)}", conn)
+    fields = [c for c in legacy.columns if c not in ('symbol', 'yahoo_symbol', 'as_of_date', 'period')]
+    rows = melt_valuations(legacy, fields).rename(columns={'known_from': 'valid_from'})
+    return compact_revisions(rows.dropna(subset=['symbol']), spec)
+
+
+def _copy_legacy_long(conn: sqlite3.Connection, spec: FundamentalsTable, target: str) -> int:
+    """
+    Eski uzun tablo (bilanço, as_of_date = çekim günü) SQLite içinde taşınır:
+    anahtar başına çekim sırasıyla bir öncekinden farklı değerler kalır.
+    """
+    item = quote_identifier(spec.item_column)
+    before = conn.total_changes
+    conn.execute(
+        f"INSERT OR REPLACE INTO {quote_identifier(target)} (symbol, {item}, period, valid_from, value) "
+        f"SELECT symbol, {item}, period, valid_from, value FROM ("
+        f"  SELECT symbol, {item}, period, valid_from, value, "
+        f"    LAG(value) OVER w AS previous, ROW_NUMBER() OVER w AS rn FROM ("
+        f"      SELECT symbol, {item}, {SORTABLE_PERIOD_SQL} AS period, "
+        f"        substr(as_of_date, 1, 10) AS valid_from, value "
+        f"      FROM {quote_identifier(spec.name)} "
+        f"      WHERE symbol IS NOT NULL AND {item} IS NOT NULL AND period IS NOT NULL "
+        f"        AND as_of_date IS NOT NULL AND value IS NOT NULL) "
+        f"  WINDOW w AS (PARTITION BY symbol, {item}, period ORDER BY valid_from)"
+        f") WHERE rn = 1 OR previous IS NOT value "
+        f"ORDER BY symbol, {item}, period, valid_from"
+    )
+    return conn.total_changes - before
+
+
+def _insert(conn: sqlite3.Connection, table: str, spec: FundamentalsTable, df: pd.DataFrame) -> None:
+    columns = list(spec.keys) + ['valid_from', 'value']
+    names = ", ".join(quote_identifier(c) for c in columns)
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {quote_identifier(table)} ({names}) VALUES ({', '.join('?' * len(columns))})",
+        zip(*(df[c].tolist() for c in columns)),
+    )
+
+
+def migrate(conn: sqlite3.Connection, spec: FundamentalsTable) -> int | None:
+    """
+    Eski, her çalıştırmada eklenen tabloyu revizyon şemasına taşır: tekrar
+    eden satırlar tek satıra iner, yalnızca değer değişimleri kalır. Taşınan
+    revizyon sayısını döndürür; tablo yoksa ya da zaten taşınmışsa None.
+    Bilanço tablosunda as_of_date çekim günüdür ve valid_from olur;
+    değerleme tablosunda çekim günü tutulmadığı için ölçüm tarihi kullanılır.
+    yahoo_symbol ve dönem türü (3M/TTM) kolonları taşınmaz.
+    """
+    if not db_writer.table_exists(conn, spec.name) or is_revisioned(conn, spec):
+        return None
+
+    long_format = spec.item_column in db_writer.table_columns(conn, spec.name)
+    tmp = f"{spec.name}_revisions"
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(tmp)}")
+        create_table(conn, spec, tmp)
+        if long_format:
+            moved = _copy_legacy_long(conn, spec, tmp)
+        else:
+            revisions = _legacy_valuation_rows(conn, spec)
+            _insert(conn, tmp, spec, revisions)
+            moved = len(revisions)
+        conn.execute(f"DROP TABLE {quote_identifier(spec.name)}")
+        conn.execute(f"ALTER TABLE {quote_identifier(tmp)} RENAME TO {quote_identifier(spec.name)}")
+        _create_index(conn, spec)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return moved
+
+
+def ensure_store(conn: sqlite3.Connection, spec: FundamentalsTable) -> None:
+    """Tablo yoksa oluşturur, eski biçimdeyse taşır."""
+    moved = migrate(conn, spec)
+    if moved is not None:
+        print(f"'{spec.name}' revizyon şemasına taşındı: {moved:,} revizyon.")
+    create_table(conn, spec)
+    _create_index(conn, spec)
+
+
+def melt_valuations(df: pd.DataFrame, fields: list[str]) -> pd.DataFrame:
+    """
+    Geniş değerleme satırlarını (symbol, as_of_date, period türü, çarpanlar)
+    uzun biçime çevirir: field = çarpan adı, period = ölçüm tarihi. Ölçüm
+    tarihi, değerin bilinebildiği ilk gün olarak known_from'a da yazılır.
+    """
+    df = df.copy()
+    df['as_of_date'] = pd.to_datetime(df['as_of_date']).dt.strftime('%Y-%m-%d')
+    df['_order'] = df['period'].map(PERIOD_TYPE_ORDER).fillna(-1) if 'period' in df.columns else 0
+    df = df.sort_values(['symbol', 'as_of_date', '_order'], kind='mergesort')
+
+    long_df = df.melt(id_vars=['symbol', 'as_of_date'], value_vars=fields,
+                      var_name=VALUATION.item_column, value_name='value')
+    long_df['value'] = pd.to_numeric(long_df['value'], errors='coerce')
+    long_df = long_df.dropna(subset=['value'])
+    # melt kolonları sırayla dizer; aynı (symbol, tarih, field) için en güncel tür sonda kalır
+    long_df = long_df.drop_duplicates(subset=['symbol', 'as_of_date', VALUATION.item_column], keep='last')
+    long_df['period'] = long_df['as_of_date']
+    long_df['known_from'] = long_df['as_of_date']
+    return long_df[['symbol', VALUATION.item_column, 'period', 'value', 'known_from']].reset_index(drop=True)
+
+
+def record(conn: sqlite3.Connection, spec: FundamentalsTable, df: pd.DataFrame,
+           observed: str | None = None, commit: bool = True) -> dict[str, int]:
+    """
+    Bir çekimin sonucunu (symbol, item, period, value [, known_from]) yazar.
+    Yeni anahtarlar valid_from = observed (known_from daha erkense o) ile
+    eklenir; değeri değişen anahtarlara observed tarihli revizyon eklenir,
+    aynı kalanlara dokunulmaz. Karşılaştırma SQLite içinde tek sorguyla
+    yapılır. {'new', 'revised', 'unchanged'} sayılarını döndürür.
+    """
+    observed = observed or date.today().isoformat()
+    item = spec.item_column
+    columns = ['symbol', item, 'period', 'value', 'known_from']
+
+    df = df.copy()
+    if 'known_from' not in df.columns:
+        df['known_from'] = None
+    df['period'] = sortable_period(df['period'])
+    df = df.dropna(subset=['symbol', item, 'period'])
+    df = df.drop_duplicates(subset=list(spec.keys), keep='last')
+    if df.empty:
+        return {'new': 0, 'revised': 0, 'unchanged': 0}
+
+    table = quote_identifier(spec.name)
+    col = quote_identifier(item)
+    try:
+        ensure_store(conn, spec)
+        conn.execute("DROP TABLE IF EXISTS temp.fundamentals_staged")
+        conn.execute(
+            f"CREATE TEMP TABLE fundamentals_staged (symbol TEXT, {col} TEXT, period TEXT, "
+            f"value REAL, known_from TEXT)"
+        )
+        conn.executemany("INSERT INTO temp.fundamentals_staged VALUES (?, ?, ?, ?, ?)",
+                         zip(*(df[c].tolist() for c in columns)))
+
+        # Anahtar başına son revizyon: iki birincil anahtar araması (MAX(valid_from) + satır)
+        latest = (f"SELECT MAX(valid_from) FROM {table} "
+                  f"WHERE symbol = s.symbol AND {col} = s.{col} AND period = s.period")
+        conn.execute("DROP TABLE IF EXISTS temp.fundamentals_changes")
+        conn.execute(
+            f"CREATE TEMP TABLE fundamentals_changes AS "
+            f"SELECT s.symbol, s.{col}, s.period, s.value, "
+            f"  CASE WHEN t.valid_from IS NULL AND s.known_from < :observed THEN s.known_from "
+            f"       ELSE :observed END AS valid_from, "
+            f"  t.valid_from IS NULL AS is_new "
+            f"FROM temp.fundamentals_staged s LEFT JOIN {table} t "
+            f"  ON t.symbol = s.symbol AND t.{col} = s.{col} AND t.period = s.period "
+            f"  AND t.valid_from = ({latest}) "
+            f"WHERE t.valid_from IS NULL OR (t.value IS NOT s.value AND t.valid_from <= :observed)",
+            {'observed': observed},
+        )
+        conn.execute(
+            f"INSERT OR REPLACE INTO {table} (symbol, {col}, period, valid_from, value) "
+            f"SELECT symbol, {col}, period, valid_from, value FROM temp.fundamentals_changes"
+        )
+        new, revised = conn.execute(
+            "SELECT COALESCE(SUM(is_new), 0), COALESCE(SUM(1 - is_new), 0) FROM temp.fundamentals_changes"
+        ).fetchone()
+        conn.execute("DROP TABLE temp.fundamentals_staged")
+        conn.execute("DROP TABLE temp.fundamentals_changes")
+        if commit:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {'new': new, 'revised': revised, 'unchanged': len(df) - new - revised}
+
+
+def _in_clause(column: str, values) -> tuple[str, list]:
+    values = list(values)
+    return f"{column} IN ({', '.join('?' * len(values))})", values
+
+
+def latest_as_of(conn: sqlite3.Connection, spec: FundamentalsTable, as_of: str,
+                 items: list[str] | None = None, symbols: list[str] | None = None,
+                 period: str | None = None) -> pd.DataFrame:
+    """
+    as_of tarihinde bilinen değerler: (symbol, item) başına en son dönem ve o
+    dönemin as_of'ta geçerli revizyonu. period verilirse o dönemin değeri.
+    Dönen kolonlar: symbol, item, period, value, valid_from.
+    """
+    col = quote_identifier(spec.item_column)
+    where, params = ["valid_from <= ?"], [as_of]
+    for column, values in ((col, items), ("symbol", symbols)):
+        if values:
+            clause, values = _in_clause(column, values)
+            where.append(clause)
+            params += values
+    if period is not None:
+        where.append("period = ?")
+        params.append(sortable_period(pd.Series([period])).iloc[0])
+
+    sql = (
+        f"SELECT symbol, {col}, period, value, valid_from FROM ("
+        f"  SELECT symbol, {col}, period, value, valid_from, ROW_NUMBER() OVER ("
+        f"    PARTITION BY symbol, {col} ORDER BY period DESC, valid_from DESC) AS rn "
+        f"  FROM {quote_identifier(spec.name)} WHERE {' AND '.join(where)}"
+        f") WHERE rn = 1 ORDER BY symbol, {col}"
+    )
+    return pd.read_sql(sql, conn, params=params)
+
+
+def snapshot(conn: sqlite3.Connection, spec: FundamentalsTable, as_of: str,
+             items: list[str] | None = None, symbols: list[str] | None = None) -> pd.DataFrame:
+    """latest_as_of'un geniş hali: satır sembol, kolon kalem."""
+    long_df = latest_as_of(conn, spec, as_of, items, symbols)
+    return long_df.pivot(index='symbol', columns=spec.item_column, values='value')
+
+
+def revisions(conn: sqlite3.Connection, spec: FundamentalsTable, symbol: str, item: str,
+              period: str | None = None) -> pd.DataFrame:
+    """Bir sembol/kalemin (isteğe bağlı tek dönem) tüm revizyonları, eskiden yeniye."""
+    col = quote_identifier(spec.item_column)
+    where, params = f"symbol = ? AND {col} = ?", [symbol, item]
+    if period is not None:
+        where += " AND period = ?"
+        params.append(sortable_period(pd.Series([period])).iloc[0])
+    return pd.read_sql(
+        f"SELECT period, valid_from, value FROM {quote_identifier(spec.name)} "
+        f"WHERE {where} ORDER BY period, valid_from",
+        conn, params=params,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Temel veri tablolarını taşır ve tarih itibarıyla sorgular.")
+    parser.add_argument("--db", default="fintables_bilancolar.db")
+    parser.add_argument("--table", choices=sorted(TABLES), default=BALANCE.name)
+    parser.add_argument("--item", action="append", help="Kalem/çarpan adı (birden fazla verilebilir)")
+    parser.add_argument("--as-of", default=date.today().isoformat(), help="Bu tarihte bilinen değerler")
+    parser.add_argument("--symbols", nargs="*", help="Yalnızca bu semboller")
+    args = parser.parse_args()
+
+    spec = TABLES[args.table]
+    conn = sqlite3.connect(sqlite_path(args.db))
+    ensure_store(conn, spec)
+
+    started = time.perf_counter()
+    result = latest_as_of(conn, spec, args.as_of, args.item, args.symbols)
+    elapsed = (time.perf_counter() - started) * 1000
+    conn.close()
+
+    print(result.to_string(index=False))
+    print(f"\n{len(result):,} satır, {elapsed:.1f} ms ({args.as_of} itibarıyla)")
@@ -0,0 +1,780 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Dogan Ege BULTE
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+# -----------------------------------------------------------------------------
+#
+# pandas_ta (0.4.x, TA-Lib olmadan) ile aynı sonucu veren indikatör hesapları,
+# bunların kayıt defteri (REGISTRY) ve sembol bazında kalıcı durum (state).
+# Durum sayesinde yeni gelen barlar için indikatörler tüm geçmiş yeniden
+# hesaplanmadan O(yeni satır) sürede uzatılır.
+#
+# Pipeline kolonları (INDICATOR_COLUMNS):
+#   pct_change, RSI_14, MACD_12_26_9, MACDh_12_26_9, MACDs_12_26_9,
+#   SMA_50, SMA_200, BBL/BBM/BBU/BBB/BBP_20_2.0_2.0, atr, obv, mfi
+# Ayrıca api özellikleri: log_return, SMA_n, STD_n, EMA_n, VOL_n, MOM_n, ZSCORE_n
+# -----------------------------------------------------------------------------
+
+import json
+import sqlite3
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+RSI_LENGTH = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+SMA_LENGTHS = (50, 200)
+BB_LENGTH, BB_STD = 20, 2.0
+ATR_LENGTH = 14
+MFI_LENGTH = 14
+
+EPSILON = np.finfo(float).eps
+
+MACD_COLS = [f"MACD_{MACD_FAST}_{MACD_SLOW}_{MACD_SIGNAL}",
+             f"MACDh_{MACD_FAST}_{MACD_SLOW}_{MACD_SIGNAL}",
+             f"MACDs_{MACD_FAST}_{MACD_SLOW}_{MACD_SIGNAL}"]
+_BB_PROPS = f"{BB_LENGTH}_{BB_STD}_{BB_STD}"
+BB_COLS = [f"BBL_{_BB_PROPS}", f"BBM_{_BB_PROPS}", f"BBU_{_BB_PROPS}", f"BBB_{_BB_PROPS}", f"BBP_{_BB_PROPS}"]
+
+INDICATOR_COLUMNS = (['pct_change', f"RSI_{RSI_LENGTH}"] + MACD_COLS
+                     + [f"SMA_{n}" for n in SMA_LENGTHS] + BB_COLS + ['atr', 'obv', 'mfi'])
+
+STATE_TABLE = "indicator_state"
+
+# Bu uzunluğa kadar kayan toplamlar pencere pencere hesaplanır (bkz. _Segments.rolling_sum)
+DIRECT_SUM_MAX_WINDOW = 32
+
+# Paralel hesapta bir işin yaklaşık satır sayısı. Parçalar yalnızca veriye göre
+# (sembol sınırlarında) belirlenir, işçi sayısına göre değil; böylece sonuç
+# işçi sayısından bağımsız olarak bit bit aynıdır.
+PARALLEL_CHUNK_ROWS = 200_000
+
+# Kayan standart sapmanın pencere parçası başına en fazla eleman sayısı:
+# std (satır sayısı × pencere) boyunda geçici dizi kurar, tüm panel yerine
+# bu büyüklükte parçalarla hesaplanır (~8 MB). Satırlar bağımsız olduğundan
+# sonuç parçalamadan etkilenmez.
+ROLLING_STD_CHUNK_ELEMENTS = 1 << 20
+
+
+# --------------------------- TAM HESAP (VEKTÖREL) ----------------------------
+#
+# Panel (symbol, date) sırasına bir kez dizilir; her sembol bir "segment"tir.
+# Bütün kayan pencere ve EWM hesapları segment sınırında sıfırlanarak tüm
+# semboller için tek geçişte NumPy ile yapılır (sembol başına Python döngüsü yok).
+
+
+def _nz(x: np.ndarray) -> np.ndarray:
+    """pandas_ta non_zero_range: sıfır farklar epsilon ile değiştirilir."""
+    return np.where(x == 0, EPSILON, x)
+
+
+def _rolling_sum(x: np.ndarray, n: int) -> np.ndarray:
+    """Tam pencere toplamı; pencerede NaN varsa NaN (np.convolve ile aynı)."""
+    out = np.full(len(x), np.nan)
+    if len(x) >= n:
+        windows = np.lib.stride_tricks.sliding_window_view(x, n)
+        out[n - 1:] = windows.sum(axis=1)
+    return out
+
+
+def _rolling_std(x: np.ndarray, n: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if len(x) >= n:
+        windows = np.lib.stride_tricks.sliding_window_view(x, n)
+        step = max(1, ROLLING_STD_CHUNK_ELEMENTS // n)
+        for lo in range(0, len(windows), step):
+            part = windows[lo:lo + step]
+            out[n - 1 + lo:n - 1 + lo + len(part)] = part.std(axis=1, ddof=1)
+    return out
+
+
+def _money_flow(tp: np.ndarray, tp_prev: np.ndarray, volume: np.ndarray) -> np.ndarray:
+    return tp * volume * np.where(tp > tp_prev, 1.0, -1.0)
+
+
+def _mfi_from_flows(smf: np.ndarray) -> np.ndarray:
+    pos = _rolling_sum(np.maximum(smf, 0), MFI_LENGTH)
+    neg = _rolling_sum(np.maximum(-smf, 0), MFI_LENGTH)
+    return 100.0 * pos / (pos + neg + EPSILON)
+
+
+class _Segments:
+    """Sıralı paneldeki sembol sınırları: her satırın segmenti ve segment içi sırası."""
+
+    def __init__(self, keys: np.ndarray):
+        n = len(keys)
+        is_start = np.ones(n, dtype=bool)
+        if n > 1:
+            is_start[1:] = keys[1:] != keys[:-1]
+        self.starts = np.flatnonzero(is_start)
+        self.lengths = np.diff(np.append(self.starts, n))
+        self.id = np.cumsum(is_start) - 1
+        self.pos = np.arange(n) - self.starts[self.id]
+        self.max_length = int(self.lengths.max()) if n else 0
+
+    def shift(self, x: np.ndarray, periods: int = 1) -> np.ndarray:
+        """Segment içinde `periods` önceki değer (segmentin ilk `periods` satırında NaN)."""
+        out = np.full(len(x), np.nan)
+        out[periods:] = x[:len(x) - periods]
+        out[self.pos < periods] = np.nan
+        return out
+
+    def rolling_sum(self, x: np.ndarray, n: int) -> np.ndarray:
+        """
+        Segment sınırını aşmayan tam pencere toplamı; pencerede NaN varsa NaN.
+        Kısa pencereler doğrudan toplanır (sabit fiyatlı pencerede ortalama kapanışa
+        tam eşit kalır, Bollinger %B buna duyarlı); uzunlar kümülatif toplam farkıyla.
+        """
+        if n <= DIRECT_SUM_MAX_WINDOW:
+            out = _rolling_sum(x, n)
+            out[self.pos < n - 1] = np.nan
+            return out
+
+        isnan = np.isnan(x)
+        csum = np.concatenate([[0.0], np.cumsum(np.where(isnan, 0.0, x))])
+        cnan = np.concatenate([[0], np.cumsum(isnan)])
+        idx = np.arange(len(x))
+        lo = np.maximum(idx - n + 1, 0)
+        out = csum[idx + 1] - csum[lo]
+        out[(cnan[idx + 1] - cnan[lo]) > 0] = np.nan
+        out[self.pos < n - 1] = np.nan
+        return out
+
+    def rolling_std(self, x: np.ndarray, n: int) -> np.ndarray:
+        out = _rolling_std(x, n)
+        out[self.pos < n - 1] = np.nan
+        return out
+
+    def cumsum(self, x: np.ndarray) -> np.ndarray:
+        """NaN atlayan segment içi kümülatif toplam (NaN olan yerler NaN kalır)."""
+        csum = np.cumsum(np.where(np.isnan(x), 0.0, x))
+        offset = np.concatenate([[0.0], csum])[self.starts]
+        out = csum - offset[self.id]
+        out[np.isnan(x)] = np.nan
+        return out
+
+    def first_valid(self, x: np.ndarray) -> np.ndarray:
+        """Her satır için kendi segmentindeki ilk geçerli değerin mutlak sırası."""
+        n = len(x)
+        first = np.full(len(self.starts), n)
+        valid = ~np.isnan(x)
+        np.minimum.at(first, self.id[valid], np.flatnonzero(valid))
+        return first[self.id]
+
+    def _linear_scan(self, c: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """
+        y[t] = c[t] * y[t-1] + b[t] özyinelemesini ilişkisel tarama (ikiye katlama)
+        ile çözer. Segment başlarında c = 0 olduğu için taramanın en uzun segment
+        kadar (log2) adımı yeterlidir.
+        """
+        a, y = c.copy(), b.copy()
+        buf = np.empty_like(y)
+        step = 1
+        while step < self.max_length:
+            tmp = buf[:len(y) - step]
+            np.multiply(a[step:], y[:-step], out=tmp)
+            y[step:] += tmp
+            np.multiply(a[step:], a[:-step], out=tmp)
+            a[step:] = tmp
+            step *= 2
+        return y
+
+    def ewm(self, x: np.ndarray, alpha: float) -> np.ndarray:
+        """pandas ewm(alpha, adjust=False, ignore_na=False).mean() ile aynı, segment bazında."""
+        n = len(x)
+        idx = np.arange(n)
+        valid = ~np.isnan(x)
+        last_valid = np.maximum.accumulate(np.where(valid, idx, -1))
+        prev_valid = np.concatenate([[-1], last_valid[:-1]])
+        has_prev = prev_valid >= self.starts[self.id]
+
+        # Arada NaN varsa eski ağırlık (1 - alpha)^boşluk kadar sönümlenir
+        gap = np.where(has_prev, idx - prev_valid, 1)
+        decay = (1 - alpha) ** gap
+        c = np.where(valid, np.where(has_prev, decay / (decay + alpha), 0.0), 1.0)
+        d = np.where(valid, np.where(has_prev, alpha / (decay + alpha), 1.0), 0.0)
+        c[self.pos == 0] = 0.0
+
+        y = self._linear_scan(c, d * np.where(valid, x, 0.0))
+        y[~(has_prev | valid)] = np.nan
+        return y
+
+    def presma(self, x: np.ndarray, length: int, anchor: np.ndarray) -> np.ndarray:
+        """
+        pandas_ta ema/rma presma tohumlaması: `anchor`dan başlayan ilk `length`
+        değerin ortalaması anchor + length - 1'e yazılır, öncesi NaN olur.
+        Segmentte yeterli satır yoksa tamamı NaN.
+        """
+        idx = np.arange(len(x))
+        rel = idx - anchor
+        seg_end = (self.starts + self.lengths)[self.id]
+        window = (rel >= 0) & (rel < length) & ~np.isnan(x)
+        sums = np.bincount(self.id[window], weights=x[window], minlength=len(self.starts))
+        counts = np.bincount(self.id[window], minlength=len(self.starts))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            seed = sums / counts
+
+        out = x.copy()
+        out[rel < length - 1] = np.nan
+        at = rel == length - 1
+        out[at] = seed[self.id[at]]
+        out[seg_end - anchor < length] = np.nan
+        return out
+
+
+# --------------------------- KAYIT DEFTERİ -----------------------------------
+#
+# Her indikatör girdilerini (ham kolonlar ya da başka düğümlerin çıktıları),
+# ürettiği kolonları ve ısınma süresini bildirir. Yürütücü yalnızca istenen
+# kolonlar için gereken düğümleri bağımlılık sırasıyla bir kez çalıştırır;
+# true range, tipik fiyat, EMA'lar, SMA/STD gibi ara seriler paylaşılır.
+
+RAW_INPUTS = ('close', 'high', 'low', 'volume')
+
+
+@dataclass(frozen=True)
+class Indicator:
+    name: str
+    inputs: tuple[str, ...]
+    outputs: tuple[str, ...]
+    fn: Callable[[dict, _Segments], dict]
+    lookback: int = 0           # girdiler geçerli olduktan sonra ilk çıktıya kadar geçen satır
+    recursive: bool = False     # tüm geçmişe bağlı (EWM / kümülatif): artımlı güncelleme durum ister
+    min_rows: int = 0           # pandas_ta gibi: sembolün satır sayısı bundan azsa kolon tamamen boş
+
+
+REGISTRY: dict[str, Indicator] = {}
+
+
+def register(node: Indicator) -> Indicator:
+    for col in node.outputs:
+        REGISTRY[col] = node
+    return node
+
+
+def _sma_node(n: int) -> Indicator:
+    return Indicator(f"SMA_{n}", ('close',), (f"SMA_{n}",),
+                     lambda ctx, seg: {f"SMA_{n}": seg.rolling_sum(ctx['close'], n) / n}, lookback=n - 1)
+
+
+def _std_node(n: int) -> Indicator:
+    return Indicator(f"STD_{n}", ('close',), (f"STD_{n}",),
+                     lambda ctx, seg: {f"STD_{n}": seg.rolling_std(ctx['close'], n)}, lookback=n - 1)
+
+
+def _ema_node(n: int) -> Indicator:
+    def fn(ctx, seg):
+        seeded = seg.presma(ctx['close'], n, seg.starts[seg.id])
+        return {f"EMA_{n}": seg.ewm(seeded, 2 / (n + 1)), f"EMA_{n}_in": seeded}
+    return Indicator(f"EMA_{n}", ('close',), (f"EMA_{n}",), fn, lookback=n - 1, recursive=True)
+
+
+def _volatility_node(n: int) -> Indicator:
+    return Indicator(f"VOL_{n}", ('pct_change',), (f"VOL_{n}",),
+                     lambda ctx, seg: {f"VOL_{n}": seg.rolling_std(ctx['pct_change'], n)}, lookback=n - 1)
+
+
+def _momentum_node(n: int) -> Indicator:
+    return Indicator(f"MOM_{n}", ('close',), (f"MOM_{n}",),
+                     lambda ctx, seg: {f"MOM_{n}": ctx['close'] - seg.shift(ctx['close'], n)}, lookback=n)
+
+
+def _zscore_node(n: int) -> Indicator:
+    def fn(ctx, seg):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return {f"ZSCORE_{n}": (ctx['close'] - ctx[f"SMA_{n}"]) / ctx[f"STD_{n}"]}
+    return Indicator(f"ZSCORE_{n}", ('close', f"SMA_{n}", f"STD_{n}"), (f"ZSCORE_{n}",), fn)
+
+
+# Uzunluk parametreli aileler: "SMA_20" gibi bir kolon istendiğinde düğüm üretilir
+PARAMETRIC = {
+    'SMA': _sma_node, 'STD': _std_node, 'EMA': _ema_node,
+    'VOL': _volatility_node, 'MOM': _momentum_node, 'ZSCORE': _zscore_node,
+}
+
+
+def _rsi(ctx, seg):
+    diff = ctx['close_diff']
+    gain_in, loss_in = np.where(diff > 0, diff, 0.0), np.where(diff < 0, diff, 0.0)
+    gain_in[np.isnan(diff)] = np.nan
+    loss_in[np.isnan(diff)] = np.nan
+    gain = seg.ewm(gain_in, 1 / RSI_LENGTH)
+    loss = seg.ewm(loss_in, 1 / RSI_LENGTH)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 * gain / (gain + np.abs(loss))
+    return {f"RSI_{RSI_LENGTH}": rsi, 'rsi_gain_in': gain_in, 'rsi_gain': gain,
+            'rsi_loss_in': loss_in, 'rsi_loss': loss}
+
+
+def _macd(ctx, seg):
+    macd = ctx[f"EMA_{MACD_FAST}"] - ctx[f"EMA_{MACD_SLOW}"]
+    signal_in = seg.presma(macd, MACD_SIGNAL, seg.first_valid(macd))
+    signal = seg.ewm(signal_in, 2 / (MACD_SIGNAL + 1))
+    return {MACD_COLS[0]: macd, MACD_COLS[1]: macd - signal, MACD_COLS[2]: signal, 'macd_signal_in': signal_in}
+
+
+def _bbands(ctx, seg):
+    close, mid, std = ctx['close'], ctx[f"SMA_{BB_LENGTH}"], ctx[f"STD_{BB_LENGTH}"]
+    lower, upper = mid - BB_STD * std, mid + BB_STD * std
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ulr = _nz(upper - lower)
+        return {BB_COLS[0]: lower, BB_COLS[1]: mid, BB_COLS[2]: upper,
+                BB_COLS[3]: 100 * ulr / mid, BB_COLS[4]: _nz(close - lower) / ulr}
+
+
+def _true_range(ctx, seg):
+    high, low, prev_close = ctx['high'], ctx['low'], ctx['prev_close']
+    with np.errstate(invalid='ignore'):
+        return {'true_range': np.fmax(np.fmax(np.abs(_nz(high - low)), np.abs(high - prev_close)),
+                                      np.abs(prev_close - low))}
+
+
+def _atr(ctx, seg):
+    seeded = seg.presma(ctx['true_range'], ATR_LENGTH, seg.starts[seg.id])
+    return {'atr': seg.ewm(seeded, 1 / ATR_LENGTH), 'atr_in': seeded}
+
+
+def _mfi(ctx, seg):
+    smf = ctx['money_flow']
+    gain = seg.rolling_sum(np.maximum(smf, 0), MFI_LENGTH)
+    loss = seg.rolling_sum(np.maximum(-smf, 0), MFI_LENGTH)
+    mfi = 100.0 * gain / (gain + loss + EPSILON)
+    mfi[seg.pos < MFI_LENGTH] = np.nan
+    return {'mfi': mfi}
+
+
+register(Indicator('prev_close', ('close',), ('prev_close',),
+                   lambda ctx, seg: {'prev_close': seg.shift(ctx['close'])}, lookback=1))
+register(Indicator('close_diff', ('close', 'prev_close'), ('close_diff',),
+                   lambda ctx, seg: {'close_diff': ctx['close'] - ctx['prev_close']}))
+register(Indicator('pct_change', ('close', 'prev_close'), ('pct_change',),
+                   lambda ctx, seg: {'pct_change': ctx['close'] / ctx['prev_close'] - 1}))
+register(Indicator('log_return', ('close', 'prev_close'), ('log_return',),
+                   lambda ctx, seg: {'log_return': np.log(ctx['close'] / ctx['prev_close'])}))
+register(Indicator('rsi', ('close_diff',), (f"RSI_{RSI_LENGTH}",), _rsi, recursive=True,
+                   min_rows=RSI_LENGTH + 1))
+register(Indicator('macd', (f"EMA_{MACD_FAST}", f"EMA_{MACD_SLOW}"), tuple(MACD_COLS), _macd,
+                   lookback=MACD_SIGNAL - 1, recursive=True, min_rows=MACD_SLOW + MACD_SIGNAL - 1))
+register(Indicator('bbands', ('close', f"SMA_{BB_LENGTH}", f"STD_{BB_LENGTH}"), tuple(BB_COLS), _bbands))
+register(Indicator('true_range', ('high', 'low', 'prev_close'), ('true_range',), _true_range))
+register(Indicator('atr', ('true_range',), ('atr',), _atr, lookback=ATR_LENGTH - 1, recursive=True,
+                   min_rows=ATR_LENGTH + 1))
+register(Indicator('obv', ('close_diff', 'volume'), ('obv',),
+                   lambda ctx, seg: {'obv': seg.cumsum(np.sign(ctx['close_diff']) * ctx['volume'])},
+                   recursive=True))
+register(Indicator('typical_price', ('high', 'low', 'close'), ('typical_price',),
+                   lambda ctx, seg: {'typical_price': (ctx['high'] + ctx['low'] + ctx['close']) / 3.0}))
+register(Indicator('money_flow', ('typical_price', 'volume'), ('money_flow',),
+                   lambda ctx, seg: {'money_flow': _money_flow(ctx['typical_price'],
+                                                               seg.shift(ctx['typical_price']),
+                                                               ctx['volume'])},
+                   lookback=1))
+register(Indicator('mfi', ('money_flow',), ('mfi',), _mfi, lookback=MFI_LENGTH - 1, min_rows=MFI_LENGTH + 1))
+
+
+def get_indicator(column: str) -> Indicator:
+    """Kolonu üreten düğüm; parametreli aileler (SMA_20, VOL_50, ...) ilk istendiğinde kaydedilir."""
+    if column not in REGISTRY:
+        family, _, length = column.rpartition('_')
+        if family not in PARAMETRIC or not length.isdigit():
+            raise KeyError(f"Bilinmeyen indikatör kolonu: {column}")
+        register(PARAMETRIC[family](int(length)))
+    return REGISTRY[column]
+
+
+def resolve(columns: list[str]) -> list[Indicator]:
+    """İstenen kolonlar için gereken düğümler, bağımlılık (topolojik) sırasıyla."""
+    order, seen = [], set()
+
+    def visit(column):
+        if column in RAW_INPUTS:
+            return
+        node = get_indicator(column)
+        if node.name in seen:
+            return
+        for dep in node.inputs:
+            visit(dep)
+        seen.add(node.name)
+        order.append(node)
+
+    for column in columns:
+        visit(column)
+    return order
+
+
+def required_inputs(columns: list[str]) -> list[str]:
+    """Kolonların hesaplanması için gereken ham girdiler (close, high, low, volume alt kümesi)."""
+    needed = {dep for node in resolve(columns) for dep in node.inputs if dep in RAW_INPUTS}
+    return [c for c in RAW_INPUTS if c in needed]
+
+
+def lookback_rows(column: str) -> int:
+    """Segment başından itibaren kolonun ilk geçerli değerine kadar geçen satır sayısı."""
+    if column in RAW_INPUTS:
+        return 0
+    node = get_indicator(column)
+    return node.lookback + max((lookback_rows(dep) for dep in node.inputs), default=0)
+
+
+def is_recursive(column: str) -> bool:
+    """Kolon tüm geçmişe bağlı mı (artımlı güncellemede kayıtlı durum gerekir)?"""
+    if column in RAW_INPUTS:
+        return False
+    node = get_indicator(column)
+    return node.recursive or any(is_recursive(dep) for dep in node.inputs)
+
+
+def warmup_rows(columns: list[str]) -> int:
+    """
+    Pencere tabanlı kolonları son barlar için yeniden hesaplamak üzere önlerine
+    eklenmesi gereken geçmiş satır sayısı. Özyinelemeli kolonlar (EWM, OBV) için
+    bu yetmez; onlar kayıtlı durumdan (extend_indicators) uzatılır.
+    """
+    return max((lookback_rows(c) for c in columns), default=0)
+
+
+# Durumdan devam edebilmek için gereken en az geçmiş: MACD sinyal EMA'sının
+# SMA ile tohumlandığı bar
+MIN_STATE_ROWS = lookback_rows(MACD_COLS[2]) + 1
+
+# Kayan pencereler için durumda saklanan son değer sayısı
+CLOSE_TAIL = max(lookback_rows(c) for c in [f"SMA_{n}" for n in SMA_LENGTHS] + BB_COLS)
+SMF_TAIL = REGISTRY['mfi'].lookback
+
+
+def _run(raw: dict, seg: _Segments, columns: list[str]) -> dict:
+    """Düğümleri sırayla çalıştırır; istenen kolonlar ve tüm ara seriler dönen sözlüktedir."""
+    ctx = dict(raw)
+    for node in resolve(columns):
+        result = node.fn(ctx, seg)
+        if node.min_rows:
+            short = seg.lengths[seg.id] < node.min_rows
+            if short.any():
+                for col in node.outputs:
+                    result[col] = np.where(short, np.nan, result[col])
+        ctx.update(result)
+    return ctx
+
+
+def _raw_arrays(df: pd.DataFrame, columns: list[str]) -> dict:
+    return {c: pd.to_numeric(df[c], errors='coerce').to_numpy(dtype=float) for c in required_inputs(columns)}
+
+
+def compute(df: pd.DataFrame, columns: list[str], symbol_col: str | None = None) -> pd.DataFrame:
+    """
+    İstenen indikatör kolonlarını hesaplar. df tarihe göre (symbol_col verilirse
+    sembol + tarihe göre) sıralı olmalıdır; sonuç df ile aynı index'e sahiptir.
+    """
+    columns = list(columns)
+    if df.empty:
+        return pd.DataFrame({col: pd.Series(dtype=float) for col in columns}, index=df.index)
+    keys = pd.factorize(df[symbol_col])[0] if symbol_col else np.zeros(len(df), dtype=int)
+    ctx = _run(_raw_arrays(df, columns), _Segments(keys), columns)
+    return pd.DataFrame({col: ctx[col] for col in columns}, index=df.index)
+
+
+def compute_panel_indicators(df: pd.DataFrame, columns: list[str] | None = None,
+                             symbol_col: str = 'symbol', date_col: str = 'date') -> pd.DataFrame:
+    """
+    Çok sembollü paneli (symbol, date) sırasına dizer ve istenen indikatörleri
+    (varsayılan: INDICATOR_COLUMNS) tek vektörel geçişte hesaplar. Sıralanmış
+    paneli indikatör kolonları eklenmiş olarak döndürür (aynı isimli eski
+    kolonların üzerine yazılır).
+    """
+    columns = INDICATOR_COLUMNS if columns is None else columns
+    df = df.sort_values([symbol_col, date_col], kind='mergesort').reset_index(drop=True)
+    return df.assign(**compute(df, columns, symbol_col))
+
+
+def compute_indicators_full(df: pd.DataFrame) -> tuple[pd.DataFrame, dict]:
+    """
+    Tarihe göre sıralı tek sembol verisi (close, high, low, volume) için bütün
+    indikatörleri hesaplar ve uzatma için gereken durumu döndürür.
+    """
+    n = len(df)
+    if n == 0:
+        return pd.DataFrame(columns=INDICATOR_COLUMNS, index=df.index, dtype=float), None
+
+    ctx = _run(_raw_arrays(df, INDICATOR_COLUMNS), _Segments(np.zeros(n, dtype=int)), INDICATOR_COLUMNS)
+    out = pd.DataFrame({col: ctx[col] for col in INDICATOR_COLUMNS}, index=df.index)
+
+    obv_valid = out['obv'].dropna()
+    state = {
+        'n_rows': n,
+        'close_prev': float(ctx['close'][-1]),
+        'tp_prev': float(ctx['typical_price'][-1]),
+        'rsi_pos': _ewm_state(ctx['rsi_gain_in'], ctx['rsi_gain'], 1 / RSI_LENGTH),
+        'rsi_neg': _ewm_state(ctx['rsi_loss_in'], ctx['rsi_loss'], 1 / RSI_LENGTH),
+        'ema_fast': _ewm_state(ctx[f"EMA_{MACD_FAST}_in"], ctx[f"EMA_{MACD_FAST}"], 2 / (MACD_FAST + 1)),
+        'ema_slow': _ewm_state(ctx[f"EMA_{MACD_SLOW}_in"], ctx[f"EMA_{MACD_SLOW}"], 2 / (MACD_SLOW + 1)),
+        'ema_signal': _ewm_state(ctx['macd_signal_in'], ctx[MACD_COLS[2]], 2 / (MACD_SIGNAL + 1)),
+        'atr': _ewm_state(ctx['atr_in'], ctx['atr'], 1 / ATR_LENGTH),
+        'obv': float(obv_valid.iloc[-1]) if len(obv_valid) else None,
+        'close_tail': _tail(ctx['close'], CLOSE_TAIL),
+        'smf_tail': _tail(ctx['money_flow'][1:], SMF_TAIL),
+    }
+    return out, state
+
+
+# --------------------------- PARALEL HESAP -----------------------------------
+
+
+def _chunk_bounds(seg: _Segments, target_rows: int) -> list[tuple[int, int]]:
+    """Sembol sınırlarında bölünmüş, her biri yaklaşık target_rows satırlık (lo, hi) aralıkları."""
+    bounds, lo = [], 0
+    for end in seg.starts + seg.lengths:
+        if end - lo >= target_rows:
+            bounds.append((lo, int(end)))
+            lo = int(end)
+    total = int(seg.starts[-1] + seg.lengths[-1]) if len(seg.starts) else 0
+    if lo < total:
+        bounds.append((lo, total))
+    return bounds
+
+
+def _compute_chunk(in_name: str, out_name: str, n_rows: int, columns: list[str], lo: int, hi: int) -> None:
+    """
+    İşçi süreç: paylaşılan bellekteki (close, high, low, volume, sembol kodu)
+    dizilerinin [lo, hi) aralığını hesaplar, sonucu paylaşılan çıktı bloğuna yazar.
+    """
+    shm_in = shared_memory.SharedMemory(name=in_name)
+    shm_out = shared_memory.SharedMemory(name=out_name)
+    try:
+        data = np.ndarray((5, n_rows), dtype=np.float64, buffer=shm_in.buf)
+        out = np.ndarray((len(columns), n_rows), dtype=np.float64, buffer=shm_out.buf)
+        raw = {c: data[i, lo:hi] for i, c in enumerate(RAW_INPUTS)}
+        ctx = _run(raw, _Segments(data[4, lo:hi]), columns)
+        for i, col in enumerate(columns):
+            out[i, lo:hi] = ctx[col]
+        del data, out, raw, ctx
+    finally:
+        shm_in.close()
+        shm_out.close()
+
+
+def compute_panel_indicators_parallel(df: pd.DataFrame, columns: list[str] | None = None, workers: int = 1,
+                                      symbol_col: str = 'symbol', date_col: str = 'date') -> pd.DataFrame:
+    """
+    compute_panel_indicators'ın sembol parçalarına bölünmüş hali. workers > 1 ise
+    parçalar süreç havuzunda hesaplanır; veri işçilere pickle ile değil paylaşılan
+    bellek üzerinden geçer. Sonuç işçi sayısından bağımsızdır.
+    """
+    columns = list(INDICATOR_COLUMNS if columns is None else columns)
+    df = df.sort_values([symbol_col, date_col], kind='mergesort').reset_index(drop=True)
+    n = len(df)
+    if n == 0:
+        return df.assign(**{col: np.nan for col in columns})
+
+    codes = pd.factorize(df[symbol_col])[0]
+    bounds = _chunk_bounds(_Segments(codes), PARALLEL_CHUNK_ROWS)
+
+    if workers <= 1 or len(bounds) == 1:
+        arrays = _raw_arrays(df, columns)
+        result = {col: np.empty(n) for col in columns}
+        for lo, hi in bounds:
+            ctx = _run({c: a[lo:hi] for c, a in arrays.items()}, _Segments(codes[lo:hi]), columns)
+            for col in columns:
+                result[col][lo:hi] = ctx[col]
+        return df.assign(**result)
+
+    shm_in = shared_memory.SharedMemory(create=True, size=5 * n * 8)
+    shm_out = shared_memory.SharedMemory(create=True, size=len(columns) * n * 8)
+    try:
+        data = np.ndarray((5, n), dtype=np.float64, buffer=shm_in.buf)
+        raw = _raw_arrays(df, columns)
+        for i, c in enumerate(RAW_INPUTS):
+            data[i] = raw.get(c, np.nan)
+        data[4] = codes
+        with ProcessPoolExecutor(max_workers=min(workers, len(bounds))) as pool:
+            futures = [pool.submit(_compute_chunk, shm_in.name, shm_out.name, n, columns, lo, hi)
+                       for lo, hi in bounds]
+            for future in futures:
+                future.result()
+        out = np.ndarray((len(columns), n), dtype=np.float64, buffer=shm_out.buf)
+        result = {col: out[i].copy() for i, col in enumerate(columns)}
+        del data, out
+    finally:
+        for shm in (shm_in, shm_out):
+            shm.close()
+            shm.unlink()
+
+    return df.assign(**result)
+
+
+# --------------------------- DURUM / UZATMA ----------------------------------
+
+
+def _tail(x: np.ndarray, n: int) -> list:
+    return [None if np.isnan(v) else float(v) for v in x[-n:]]
+
+
+def _untail(values: list) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+def _ewm_state(inputs: np.ndarray, outputs: np.ndarray, alpha: float) -> list:
+    """pandas ewm(adjust=False) iç durumu: [weighted, old_wt, nobs]."""
+    valid = ~np.isnan(inputs)
+    nobs = int(valid.sum())
+    if nobs == 0:
+        return [None, 1.0, 0]
+    last = int(np.flatnonzero(valid)[-1])
+    old_wt = (1 - alpha) ** (len(inputs) - 1 - last)
+    return [float(outputs[last]), old_wt, nobs]
+
+
+def _ewm_step(state: list, x: float, alpha: float) -> float:
+    """pandas ewm(adjust=False, ignore_na=False) algoritmasının tek adımı (state yerinde güncellenir)."""
+    weighted, old_wt, nobs = state
+    weighted = np.nan if weighted is None else weighted
+    is_obs = not np.isnan(x)
+    if not np.isnan(weighted):
+        old_wt *= (1 - alpha)
+        if is_obs:
+            if weighted != x:
+                weighted = (old_wt * weighted + alpha * x) / (old_wt + alpha)
+            old_wt = 1.0
+    elif is_obs:
+        weighted = x
+    state[:] = [None if np.isnan(weighted) else float(weighted), old_wt, nobs + int(is_obs)]
+    return weighted
+
+
+def extend_indicators(new: pd.DataFrame, state: dict) -> tuple[pd.DataFrame, dict]:
+    """
+    Kaydedilmiş durumdan devam ederek yalnızca yeni barlar (tarih sıralı) için
+    indikatörleri hesaplar. Sonuç tam yeniden hesapla aynıdır.
+    """
+    if state is None or state['n_rows'] < MIN_STATE_ROWS:
+        raise ValueError("Durum yok veya ısınma süresi dolmamış; tam hesap gerekli.")
+
+    state = json.loads(json.dumps(state))
+    c = pd.to_numeric(new['close'], errors='coerce').to_numpy(dtype=float)
+    h = pd.to_numeric(new['high'], errors='coerce').to_numpy(dtype=float)
+    l = pd.to_numeric(new['low'], errors='coerce').to_numpy(dtype=float)
+    v = pd.to_numeric(new['volume'], errors='coerce').to_numpy(dtype=float)
+    k = len(c)
+
+    prev = np.concatenate([[state['close_prev'] if state['close_prev'] is not None else np.nan], c[:-1]])
+    cols = {name: np.full(k, np.nan) for name in INDICATOR_COLUMNS}
+    cols['pct_change'] = c / prev - 1
+
+    diff = c - prev
+    obv = state['obv']
+    for i in range(k):
+        pos = _ewm_step(state['rsi_pos'], max(diff[i], 0) if not np.isnan(diff[i]) else np.nan, 1 / RSI_LENGTH)
+        neg = _ewm_step(state['rsi_neg'], min(diff[i], 0) if not np.isnan(diff[i]) else np.nan, 1 / RSI_LENGTH)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cols[f"RSI_{RSI_LENGTH}"][i] = np.float64(100 * pos) / (pos + abs(neg))
+
+        fast = _ewm_step(state['ema_fast'], c[i], 2 / (MACD_FAST + 1))
+        slow = _ewm_step(state['ema_slow'], c[i], 2 / (MACD_SLOW + 1))
+        macd = fast - slow
+        signal = _ewm_step(state['ema_signal'], macd, 2 / (MACD_SIGNAL + 1))
+        cols[MACD_COLS[0]][i], cols[MACD_COLS[1]][i], cols[MACD_COLS[2]][i] = macd, macd - signal, signal
+
+        tr_parts = [abs(_nz(np.array([h[i] - l[i]]))[0]), abs(h[i] - prev[i]), abs(prev[i] - l[i])]
+        tr = np.nanmax(tr_parts) if not all(np.isnan(tr_parts)) else np.nan
+        cols['atr'][i] = _ewm_step(state['atr'], tr, 1 / ATR_LENGTH)
+
+        sv = np.sign(diff[i]) * v[i]
+        if not np.isnan(sv):
+            obv = sv if obv is None else obv + sv
+            cols['obv'][i] = obv
+
+    # Kayan pencereler: saklanan kuyruk + yeni değerler
+    closes = np.concatenate([_untail(state['close_tail']), c])
+    offset = len(closes) - k
+    for length in SMA_LENGTHS:
+        cols[f"SMA_{length}"] = (_rolling_sum(closes, length) / length)[offset:]
+
+    mid = (_rolling_sum(closes, BB_LENGTH) / BB_LENGTH)[offset:]
+    std = _rolling_std(closes, BB_LENGTH)[offset:]
+    lower, upper = mid - BB_STD * std, mid + BB_STD * std
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ulr = _nz(upper - lower)
+        cols[BB_COLS[0]], cols[BB_COLS[1]], cols[BB_COLS[2]] = lower, mid, upper
+        cols[BB_COLS[3]] = 100 * ulr / mid
+        cols[BB_COLS[4]] = _nz(c - lower) / ulr
+
+    tp = (h + l + c) / 3.0
+    tp_prev = np.concatenate([[state['tp_prev'] if state['tp_prev'] is not None else np.nan], tp[:-1]])
+    smf = _money_flow(tp, tp_prev, v)
+    flows = np.concatenate([_untail(state['smf_tail']), smf])
+    mfi = _mfi_from_flows(flows)[len(flows) - k:]
+    # Toplam geçmiş MFI_LENGTH barı aşmadan MFI tanımsız
+    first_valid = MFI_LENGTH - state['n_rows']
+    if first_valid > 0:
+        mfi[:first_valid] = np.nan
+    cols['mfi'] = mfi
+
+    if k:
+        state['n_rows'] += k
+        state['close_prev'] = float(c[-1])
+        state['tp_prev'] = float(tp[-1])
+        state['obv'] = obv
+        state['close_tail'] = _tail(closes, CLOSE_TAIL)
+        state['smf_tail'] = _tail(flows, SMF_TAIL)
+
+    return pd.DataFrame(cols, index=new.index), state
+
+
+# --------------------------- KALICILIK ---------------------------------------
+
+
+def ensure_state_table(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            symbol      TEXT PRIMARY KEY,
+            last_date   TEXT NOT NULL,
+            n_rows      INTEGER NOT NULL,
+            state       TEXT NOT NULL
+        )
+        """
+    )
+
+
+def load_state(conn: sqlite3.Connection, symbol: str) -> tuple[str, dict] | None:
+    """(last_date, state) ya da kayıt yoksa None."""
+    ensure_state_table(conn)
+    row = conn.execute(f"SELECT last_date, state FROM {STATE_TABLE} WHERE symbol = ?", (symbol,)).fetchone()
+    if row is None:
+        return None
+    return row[0], json.loads(row[1])
+
+
+def save_state(conn: sqlite3.Connection, symbol: str, last_date: str, state: dict) -> None:
+    ensure_state_table(conn)
+    conn.execute(
+        f"INSERT OR REPLACE INTO {STATE_TABLE} (symbol, last_date, n_rows, state) VALUES (?, ?, ?, ?)",
+        (symbol, last_date, state['n_rows'], json.dumps(state)),
+    )
+
+
+def verify_incremental(df: pd.DataFrame, split: int, rtol: float = 1e-9) -> dict:
+    """
+    Veriyi `split` noktasından bölüp durumdan uzatılan sonucu tam hesapla
+    karşılaştırır; kolon başına en büyük göreli farkı döndürür.
+    """
+    full, _ = compute_indicators_full(df)
+    _, state = compute_indicators_full(df.iloc[:split])
+    tail, _ = extend_indicators(df.iloc[split:], state)
+
+    report = {}
+    for col in INDICATOR_COLUMNS:
+        a = full[col].to_numpy()[split:]
+        b = tail[col].to_numpy()
+        if not np.array_equal(np.isnan(a), np.isnan(b)):
+            report[col] = float('inf')
+            continue
+        mask = ~np.isnan(a)
+        scale = np.maximum(np.abs(a[mask]), 1.0)
+        report[col] = float(np.max(np.abs(a[mask] - b[mask]) / scale)) if mask.any() else 0.0
+    report['ok'] = all(v <= rtol for k, v in report.items())
+    return report
@@ -0,0 +1,196 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Dogan Ege BULTE
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+# -----------------------------------------------------------------------------
+#
+# Veri çekme manifestosu: her (sembol, tarih aralığı) isteğinin sonucu
+# (ok / empty / failed), satır sayısı, zamanı, hatası ve deneme sayısı
+# ingest_manifest tablosunda tutulur. Yarıda kalan ya da bazı aralıkları
+# hata veren bir çalıştırma, --resume ile yalnızca eksik ve başarısız
+# aralıklar yeniden istenerek tamamlanır. Başarısız aralıklar çalıştırmalar
+# arasında da üstel (jitter'lı) beklemeyle tekrar denenir.
+#
+# Satırlar (sembol, başlangıç) ile anahtarlanır: son aralığın bitişi her gün
+# değiştiğinden bitiş sıradan bir kolondur. Başarılı bir aralık, kapsadığı
+# (daha geç başlayan) eski başarısız satırları siler.
+# -----------------------------------------------------------------------------
+
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from fetch_pool import backoff_delay
+
+MANIFEST_TABLE = "ingest_manifest"
+
+STATUS_OK = "ok"
+STATUS_EMPTY = "empty"
+STATUS_FAILED = "failed"
+
+# Başarısız aralığın bir sonraki --resume'da denenmesi için bekleme (sn) ve deneme sınırı
+RESUME_BACKOFF_BASE = 60.0
+RESUME_BACKOFF_MAX = 6 * 60 * 60
+MAX_RESUME_ATTEMPTS = 8
+
+_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+_RANGE_FORMAT = "%d-%m-%Y"
+
+
+@dataclass
+class RangeResult:
+    """Tek bir aralık isteğinin sonucu."""
+    symbol: str
+    start_date: str
+    end_date: str
+    status: str
+    rows: int = 0
+    error: str | None = None
+
+
+def _create_table(conn: sqlite3.Connection, name: str) -> None:
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {name} (
+            symbol          TEXT NOT NULL,
+            start_date      TEXT NOT NULL,
+            end_date        TEXT NOT NULL,
+            status          TEXT NOT NULL,
+            rows            INTEGER NOT NULL DEFAULT 0,
+            error           TEXT,
+            attempts        INTEGER NOT NULL DEFAULT 0,
+            fetched_at      TEXT NOT NULL,
+            next_retry_at   TEXT,
+            PRIMARY KEY (symbol, start_date)
+        )
+        """
+    )
+
+
+def ensure_manifest_table(conn: sqlite3.Connection) -> None:
+    """
+    Tabloyu oluşturur. (symbol, start_date, end_date) anahtarlı eski tablo
+    yeni anahtara taşınır; aynı başlangıçlı satırlardan en son yazılanı kalır.
+    """
+    pk = [r[1] for r in sorted(conn.execute(f"PRAGMA table_info({MANIFEST_TABLE})"), key=lambda r: r[5]) if r[5]]
+    if "end_date" in pk:
+        tmp = f"{MANIFEST_TABLE}_new"
+        conn.execute(f"DROP TABLE IF EXISTS {tmp}")
+        _create_table(conn, tmp)
+        conn.execute(f"INSERT OR REPLACE INTO {tmp} SELECT * FROM {MANIFEST_TABLE} ORDER BY fetched_at, end_date")
+        conn.execute(f"DROP TABLE {MANIFEST_TABLE}")
+        conn.execute(f"ALTER TABLE {tmp} RENAME TO {MANIFEST_TABLE}")
+    _create_table(conn, MANIFEST_TABLE)
+    conn.commit()
+
+
+def _parse_range_date(value: str) -> datetime:
+    return datetime.strptime(value, _RANGE_FORMAT)
+
+
+def record_results(conn: sqlite3.Connection, results: list[RangeResult]) -> None:
+    """
+    Sonuçları manifestoya yazar (commit etmez; çağıran, fiyat satırlarıyla aynı
+    transaction'da commit eder). Başarısız aralık için sonraki deneme zamanı
+    ardışık başarısızlık sayısına göre üstel olarak ileri atılır. Başarılı
+    (ok / empty) aralık, içinde başlayan eski başarısız satırları siler.
+    """
+    now = datetime.now()
+    for r in results:
+        row = conn.execute(
+            f"SELECT attempts, status FROM {MANIFEST_TABLE} WHERE symbol = ? AND start_date = ?",
+            (r.symbol, r.start_date),
+        ).fetchone()
+        attempts = (row[0] if row and row[1] == STATUS_FAILED else 0) + 1
+        next_retry = None
+        if r.status == STATUS_FAILED:
+            delay = backoff_delay(attempts - 1, RESUME_BACKOFF_BASE, RESUME_BACKOFF_MAX)
+            next_retry = (now + timedelta(seconds=delay)).strftime(_TIME_FORMAT)
+        conn.execute(
+            f"""
+            INSERT INTO {MANIFEST_TABLE}
+                (symbol, start_date, end_date, status, rows, error, attempts, fetched_at, next_retry_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (symbol, start_date) DO UPDATE SET
+                end_date = excluded.end_date, status = excluded.status, rows = excluded.rows,
+                error = excluded.error, attempts = excluded.attempts,
+                fetched_at = excluded.fetched_at, next_retry_at = excluded.next_retry_at
+            """,
+            (r.symbol, r.start_date, r.end_date, r.status, r.rows, r.error,
+             attempts, now.strftime(_TIME_FORMAT), next_retry),
+        )
+        if r.status != STATUS_FAILED:
+            _drop_superseded(conn, r)
+
+
+def _drop_superseded(conn: sqlite3.Connection, r: RangeResult) -> None:
+    """r'nin [başlangıç, bitiş] aralığında başlayan diğer başarısız satırları siler."""
+    lo, hi = _parse_range_date(r.start_date), _parse_range_date(r.end_date)
+    failed = conn.execute(
+        f"SELECT start_date FROM {MANIFEST_TABLE} WHERE symbol = ? AND status = ? AND start_date != ?",
+        (r.symbol, STATUS_FAILED, r.start_date),
+    ).fetchall()
+    covered = [(r.symbol, start) for (start,) in failed if lo <= _parse_range_date(start) <= hi]
+    conn.executemany(f"DELETE FROM {MANIFEST_TABLE} WHERE symbol = ? AND start_date = ?", covered)
+
+
+def resume_plan(conn: sqlite3.Connection, symbols: list[str], date_ranges: list[tuple[str, str]],
+                stored_symbols: set[str]) -> dict[str, list[tuple[str, str]]]:
+    """
+    --resume için sembol başına yeniden istenecek aralıklar:
+      * bekleme süresi dolmuş ve deneme sınırı aşılmamış başarısız aralıklar
+        (bitişi, başlangıcı içeren date_ranges aralığının bugünkü bitişine
+        uzatılarak),
+      * date_ranges içinden manifestoda hiç kaydı olmayanlar (yarıda kalan
+        çalıştırma). Son aralığın bitişi her gün değiştiği için aralıklar
+        başlangıç tarihiyle eşleştirilir.
+    Manifestodan önceki sürümle yazılmış (prices'ta olup manifestoda hiç
+    kaydı olmayan) semboller eksiksiz kabul edilir.
+    """
+    now = datetime.now().strftime(_TIME_FORMAT)
+    rows = conn.execute(
+        f"SELECT symbol, start_date, end_date, status, attempts, next_retry_at FROM {MANIFEST_TABLE}"
+    ).fetchall()
+
+    windows = [(_parse_range_date(start), _parse_range_date(end), end) for start, end in date_ranges]
+
+    def current_end(start: str, end: str) -> str:
+        day = _parse_range_date(start)
+        for lo, hi, text in windows:
+            if lo <= day <= hi and hi > _parse_range_date(end):
+                return text
+        return end
+
+    known: dict[str, set[str]] = {}
+    retry: dict[str, list[tuple[str, str]]] = {}
+    for symbol, start, end, status, attempts, next_retry_at in rows:
+        known.setdefault(symbol, set()).add(start)
+        if status == STATUS_FAILED and attempts < MAX_RESUME_ATTEMPTS and (next_retry_at or "") <= now:
+            retry.setdefault(symbol, []).append((start, current_end(start, end)))
+
+    plan = {}
+    for symbol in symbols:
+        ranges = list(retry.get(symbol, []))
+        if symbol in known or symbol not in stored_symbols:
+            seen = known.get(symbol, set())
+            ranges += [(start, end) for start, end in date_ranges if start not in seen]
+        if ranges:
+            plan[symbol] = ranges
+    return plan
+
+
+def summary(conn: sqlite3.Connection) -> dict[str, int]:
+    """Durum başına aralık sayısı; ayrıca bekleyen ve deneme sınırını aşmış başarısızlar."""
+    counts = dict(conn.execute(f"SELECT status, COUNT(*) FROM {MANIFEST_TABLE} GROUP BY status").fetchall())
+    counts["exhausted"] = conn.execute(
+        f"SELECT COUNT(*) FROM {MANIFEST_TABLE} WHERE status = ? AND attempts >= ?",
+        (STATUS_FAILED, MAX_RESUME_ATTEMPTS),
+    ).fetchone()[0]
+    return counts
+
+
+def format_summary(conn: sqlite3.Connection) -> str:
+    s = summary(conn)
+    return (f"manifesto: {s.get(STATUS_OK, 0)} ok, {s.get(STATUS_EMPTY, 0)} boş, "
+            f"{s.get(STATUS_FAILED, 0)} başarısız ({s['exhausted']} deneme sınırında)")
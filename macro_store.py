@@ -0,0 +1,153 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Dogan Ege BULTE
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+# -----------------------------------------------------------------------------
+#
+# Günlük makro seriler (Brent, SP500, VIX ...) tüm semboller için aynıdır.
+# model_data'nın her satırına kopyalamak yerine tarih anahtarlı tek bir
+# tabloda (macro_inputs) tutulur ve okuma anında model_view görünümüyle
+# (bkz. model_schema) model_data'ya bağlanır. Brent geçmişini güncellemek
+# birkaç bin satıra dokunur; model_data yeniden yazılmaz.
+#
+# Yalnızca değiştiği gün kaydı olan olay serileri (TCMB faiz kararları) as-of
+# hizalamayla günlük değerlere çevrilip aynı tabloya yazılır (bkz. asof).
+# -----------------------------------------------------------------------------
+
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+import asof
+import db_writer
+import model_schema
+from db_writer import quote_identifier
+
+# Tarih anahtarlı makro tablo; model_schema.MODEL_VIEW bunu model_data ile birleştirir
+MACRO_TABLE = model_schema.MACRO_TABLE
+
+# model_data'ya daha önce birleştirilmiş olabilecek makro kolonlar
+MACRO_COLUMNS = ['brent_oil', 'sp500', 'vix']
+
+
+def ensure_macro_table(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {MACRO_TABLE} (date TEXT NOT NULL PRIMARY KEY) WITHOUT ROWID"
+    )
+
+
+def macro_columns(conn: sqlite3.Connection) -> list[str]:
+    if not db_writer.table_exists(conn, MACRO_TABLE):
+        return []
+    return [c for c in db_writer.table_columns(conn, MACRO_TABLE) if c != 'date']
+
+
+def upsert_macro(conn: sqlite3.Connection, df: pd.DataFrame, commit: bool = True) -> int:
+    """
+    Tarih anahtarlı makro serileri macro_inputs'a yazar; yeni kolonlar
+    ALTER TABLE ile eklenir, var olan tarihler güncellenir. Tarihler
+    model_data ile aynı biçime (YYYY-MM-DD) getirilir.
+    """
+    df = df.copy()
+    df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+    df = df.drop_duplicates(subset=['date'], keep='last')
+    ensure_macro_table(conn)
+    return db_writer.upsert_rows(conn, MACRO_TABLE, df, keys=('date',), commit=commit)
+
+
+def _stored_range(conn: sqlite3.Connection, column: str) -> tuple[str | None, str | None]:
+    if column not in macro_columns(conn):
+        return None, None
+    col = quote_identifier(column)
+    return conn.execute(f"SELECT MIN(date), MAX(date) FROM {MACRO_TABLE} WHERE {col} IS NOT NULL").fetchone()
+
+
+def _first_stale_date(conn: sqlite3.Connection, events: pd.DataFrame, columns: list[str],
+                      first: str, last: str) -> pd.Timestamp | None:
+    """
+    Yazılmış aralıkta değeri olay tablosuyla uyuşmayan ilk gün. Seri olaylar
+    arasında sabit olduğu için yalnızca olay günlerine (ve ilk güne) bakmak
+    yeni eklenen ya da düzeltilen olayları yakalamaya yeter.
+    """
+    event_days = pd.to_datetime(events['date']).dt.strftime('%Y-%m-%d')
+    check = sorted({first} | {d for d in event_days if first <= d <= last})
+    expected = asof.asof_align(events, check, columns)
+
+    placeholders = ", ".join("?" * len(check))
+    cols_sql = ", ".join(quote_identifier(c) for c in columns)
+    stored = pd.read_sql(f"SELECT date, {cols_sql} FROM {MACRO_TABLE} WHERE date IN ({placeholders})",
+                         conn, params=check)
+    stored = stored.set_index('date').reindex(check)
+
+    a = expected[columns].to_numpy(dtype=float)
+    b = stored[columns].to_numpy(dtype=float)
+    stale = ~(np.isclose(a, b) | (np.isnan(a) & np.isnan(b)))
+    rows = np.flatnonzero(stale.any(axis=1))
+    return pd.Timestamp(check[rows[0]]) if len(rows) else None
+
+
+def upsert_event_series(conn: sqlite3.Connection, events: pd.DataFrame, columns: dict[str, str],
+                        start=None, end=None, date_column: str = 'date', commit: bool = True) -> int:
+    """
+    Olay serisini (yürürlük tarihi + değerler) günlük as-of değerlere çevirip
+    macro_inputs'a yazar; columns: olay kolonu -> macro_inputs kolonu. Artımlı
+    çalışır: yalnızca son yazılan günden sonrası ve yeni/düzeltilmiş bir olayın
+    etkilediği ilk günden itibaren yeniden yazılır. end varsayılanı bugündür;
+    start ilk olaydan önceyse ilk olay gününe çekilir (öncesi zaten boştur).
+    Yazılan gün sayısını döndürür.
+    """
+    targets = list(columns.values())
+    renamed = events.rename(columns={date_column: 'date', **columns})[['date'] + targets]
+    renamed['date'] = pd.to_datetime(renamed['date'])
+    if renamed.empty:
+        return 0
+
+    end = pd.Timestamp(end or pd.Timestamp.today()).normalize()
+    # İlk olaydan önceki günler NULL kalır; saklanan aralık (NULL olmayan
+    # günler) ilk olayla başladığından start ona çekilmezse her çalıştırma
+    # tüm seriyi yeniden yazar.
+    first_event = renamed['date'].min()
+    start = max(pd.Timestamp(start), first_event) if start is not None else first_event
+
+    first, last = _stored_range(conn, targets[0])
+    if last is None or start < pd.Timestamp(first):
+        from_date = start
+    else:
+        stale = _first_stale_date(conn, renamed, targets, first, last)
+        from_date = stale if stale is not None else pd.Timestamp(last) + pd.Timedelta(days=1)
+
+    dates = asof.daily_dates(from_date, end)
+    if dates.empty:
+        return 0
+    daily = asof.asof_align(renamed, dates, targets)
+    return upsert_macro(conn, daily, commit=commit)
+
+
+def migrate_from_model_data(conn: sqlite3.Connection, columns: list[str] | None = None) -> list[str]:
+    """
+    Eski birleştirmeyle model_data'ya kopyalanmış makro kolonları tarih başına
+    tek satır olarak macro_inputs'a taşır ve model_data'dan siler
+    (ALTER TABLE DROP COLUMN, SQLite >= 3.35). Taşınan kolonları döndürür.
+    """
+    existing = set(db_writer.table_columns(conn, 'model_data'))
+    moved = [c for c in (columns or MACRO_COLUMNS) if c in existing]
+    if not moved:
+        return []
+
+    cols_sql = ", ".join(f"MAX({quote_identifier(c)}) AS {quote_identifier(c)}" for c in moved)
+    df = pd.read_sql(f"SELECT date, {cols_sql} FROM model_data GROUP BY date", conn)
+    if model_schema.is_compact(conn):
+        df['date'] = model_schema.from_day_number(df['date'])
+
+    # macro_inputs'ta zaten olan kolonlar daha günceldir; üzerlerine yazılmaz
+    known = set(macro_columns(conn))
+    fresh = [c for c in moved if c not in known]
+    if fresh:
+        upsert_macro(conn, df[['date'] + fresh], commit=False)
+
+    model_schema.drop_model_view(conn)
+    for col in moved:
+        conn.execute(f"ALTER TABLE model_data DROP COLUMN {quote_identifier(col)}")
+    return moved
@@ -11,6 +11,8 @@ import os
 from datetime import datetime
 import matplotlib.pyplot as plt
 
+import fetch_cache
+
 symbol = input("Hisse sembolü (örn: THYAO): ").strip().upper()
 
 date_ranges = [
@@ -25,11 +27,14 @@ all_data = []
 for start_date, end_date in date_ranges:
     print(f"{symbol} için {start_date} - {end_date} aralığı çekiliyor...")
     try:
-        df_part = fetch_stock_data(
-            symbols=symbol,
-            start_date=start_date,
-            end_date=end_date,
-            save_to_excel=False
+        df_part = fetch_cache.cached_fetch(
+            symbol, start_date, end_date,
+            lambda: fetch_stock_data(
+                symbols=symbol,
+                start_date=start_date,
+                end_date=end_date,
+                save_to_excel=False
+            )
         )
         if df_part is not None and not df_part.empty:
             all_data.append(df_part)
@@ -38,6 +43,8 @@ for start_date, end_date in date_ranges:
     except Exception as e:
         print(f"[Hata] {start_date} - {end_date} aralığında sorun: {e}")
 
+print(fetch_cache.format_stats())
+
 if not all_data:
     print("Hiçbir aralıktan veri gelemedi. Muhtemelen site bağlantıyı kesiyor veya IP engellenmiş.")
     raise SystemExit
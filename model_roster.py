@@ -0,0 +1,210 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Dogan Ege BULTE
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+# -----------------------------------------------------------------------------
+
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, HistGradientBoostingRegressor
+from sklearn.linear_model import LinearRegression
+try:
+    from xgboost import XGBRegressor
+    XGBOOST_AVAILABLE = True
+except ImportError:
+    XGBOOST_AVAILABLE = False
+    print("XGBoost not available. Install with: pip install xgboost")
+
+# Optional JSON file overriding tiers / model parameters, e.g.
+# {"default_tier": "fast", "tiers": {"fast": ["Linear Regression"]},
+#  "params": {"Random Forest": {"n_estimators": 200}}}
+ROSTER_FILE = os.getenv("FORSIGHT_MODEL_ROSTER", "model_roster.json")
+
+# Per-request accuracy / training-time records (see record_tradeoffs)
+BENCHMARK_DB_PATH = os.getenv("FORSIGHT_BENCHMARK_DB", "model_benchmarks.db")
+
+DEFAULT_TIER = "balanced"
+
+# Cheapest first; training loops evaluate models in this order
+MODEL_COST_ORDER = [
+    'Linear Regression', 'Hist Gradient Boosting', 'XGBoost', 'Random Forest', 'Gradient Boosting'
+]
+
+MODEL_CLASSES = {
+    'Linear Regression': (LinearRegression, {}),
+    'Hist Gradient Boosting': (HistGradientBoostingRegressor, {'max_iter': 200, 'learning_rate': 0.1, 'random_state': 42}),
+    'Random Forest': (RandomForestRegressor, {'n_estimators': 100, 'max_depth': 10, 'random_state': 42, 'n_jobs': -1}),
+    'Gradient Boosting': (GradientBoostingRegressor, {'n_estimators': 100, 'max_depth': 5, 'random_state': 42}),
+}
+
+if XGBOOST_AVAILABLE:
+    MODEL_CLASSES['XGBoost'] = (XGBRegressor, {'n_estimators': 100, 'max_depth': 6, 'learning_rate': 0.1, 'random_state': 42, 'n_jobs': -1})
+
+TIERS = {
+    'fast': ['Linear Regression', 'Hist Gradient Boosting'],
+    'balanced': ['Linear Regression', 'Hist Gradient Boosting', 'XGBoost', 'Random Forest'],
+    'thorough': ['Linear Regression', 'Hist Gradient Boosting', 'XGBoost', 'Random Forest', 'Gradient Boosting'],
+}
+
+_config_cache = {'mtime': None, 'config': None}
+
+
+def load_roster_config(path: str = ROSTER_FILE) -> dict:
+    """Built-in tiers merged with the optional roster file (re-read when it changes)."""
+    config = {'default_tier': DEFAULT_TIER, 'tiers': dict(TIERS), 'params': {}}
+
+    if not os.path.exists(path):
+        return config
+
+    mtime = os.path.getmtime(path)
+    if _config_cache['mtime'] == mtime:
+        return _config_cache['config']
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            overrides = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Model roster file could not be read ({path}): {e}")
+        return config
+
+    config['default_tier'] = overrides.get('default_tier', config['default_tier'])
+    config['tiers'].update(overrides.get('tiers', {}))
+    config['params'] = overrides.get('params', {})
+
+    _config_cache['mtime'] = mtime
+    _config_cache['config'] = config
+    return config
+
+
+def resolve_model_names(tier: str | None = None, names: list[str] | None = None) -> list[str]:
+    """Model names for an explicit list or a tier, cheapest first.
+
+    Unknown (or not installed) names in an explicit list raise ValueError;
+    tier entries whose optional dependency is missing are skipped.
+    """
+    config = load_roster_config()
+
+    if names:
+        unknown = [n for n in names if n not in MODEL_CLASSES]
+        if unknown:
+            raise ValueError(f"Unknown or unavailable models: {', '.join(unknown)}")
+    else:
+        tier = tier or config['default_tier']
+        if tier not in config['tiers']:
+            raise ValueError(f"Unknown model tier: {tier}")
+        names = config['tiers'][tier]
+
+    cost_rank = {name: i for i, name in enumerate(MODEL_COST_ORDER)}
+    available = [n for n in names if n in MODEL_CLASSES]
+    return sorted(dict.fromkeys(available), key=lambda n: cost_rank.get(n, len(cost_rank)))
+
+
+def build_models(tier: str | None = None, names: list[str] | None = None) -> dict:
+    """Fresh, unfitted estimators for the requested roster, cheapest first."""
+    config = load_roster_config()
+    models = {}
+    for name in resolve_model_names(tier, names):
+        cls, params = MODEL_CLASSES[name]
+        models[name] = cls(**{**params, **config['params'].get(name, {})})
+    return models
+
+
+def record_tradeoffs(symbol: str, days_ahead: int, tier: str | None, model_results: dict,
+                     db_path: str = BENCHMARK_DB_PATH) -> None:
+    """Store accuracy and training time of each model for later tier selection."""
+    recorded_at = datetime.now().isoformat(timespec='seconds')
+    rows = [
+        (symbol, days_ahead, tier, name, m.get('test_r2'), m.get('cv_r2'), m.get('rmse'),
+         m.get('train_seconds'), recorded_at)
+        for name, m in model_results.items()
+    ]
+    if not rows:
+        return
+
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path, timeout=5)
+        with conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS model_tradeoffs (
+                    symbol        TEXT NOT NULL,
+                    days_ahead    INTEGER NOT NULL,
+                    tier          TEXT,
+                    model         TEXT NOT NULL,
+                    test_r2       REAL,
+                    cv_r2         REAL,
+                    rmse          REAL,
+                    train_seconds REAL,
+                    recorded_at   TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tradeoffs_model ON model_tradeoffs (model, symbol)")
+            conn.executemany("INSERT INTO model_tradeoffs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    except sqlite3.Error as e:
+        print(f"Could not record model trade-offs for {symbol}: {e}")
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def summarize_tradeoffs(db_path: str = BENCHMARK_DB_PATH) -> dict:
+    """Average accuracy / training time per model and the implied result of each tier.
+
+    For every tier, each symbol's latest measurement of the tier's models is
+    used: the tier's accuracy is the best test R² among them and its cost the
+    sum of their training times.
+    """
+    if not os.path.exists(db_path):
+        return {'models': {}, 'tiers': {}}
+
+    conn = sqlite3.connect(db_path)
+    try:
+        df = pd.read_sql_query(
+            """
+            SELECT symbol, days_ahead, model, test_r2, train_seconds, recorded_at
+            FROM model_tradeoffs
+            """,
+            conn
+        )
+    except Exception:
+        return {'models': {}, 'tiers': {}}
+    finally:
+        conn.close()
+
+    if df.empty:
+        return {'models': {}, 'tiers': {}}
+
+    latest = (df.sort_values('recorded_at')
+                .drop_duplicates(subset=['symbol', 'days_ahead', 'model'], keep='last'))
+
+    models = {
+        name: {
+            'symbols': int(len(g)),
+            'avg_test_r2': float(g['test_r2'].mean()),
+            'avg_train_seconds': float(g['train_seconds'].mean()),
+        }
+        for name, g in latest.groupby('model')
+    }
+
+    tiers = {}
+    for tier, names in load_roster_config()['tiers'].items():
+        subset = latest[latest['model'].isin(names)]
+        if subset.empty:
+            continue
+        per_symbol = subset.groupby(['symbol', 'days_ahead']).agg(
+            best_r2=('test_r2', 'max'), train_seconds=('train_seconds', 'sum'))
+        tiers[tier] = {
+            'models': names,
+            'symbols': int(len(per_symbol)),
+            'avg_best_r2': float(per_symbol['best_r2'].mean()),
+            'avg_train_seconds': float(per_symbol['train_seconds'].mean()),
+        }
+
+    return {'models': models, 'tiers': tiers}
@@ -0,0 +1,299 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Dogan Ege BULTE
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+# -----------------------------------------------------------------------------
+#
+# model_data'nın fiziksel şeması. to_sql'in ürettiği tipsiz, rowid'li ve ISO
+# tarih metinli tablo yerine:
+#
+#   symbol TEXT, date INTEGER (1970-01-01'den gün sayısı), diğerleri REAL,
+#   PRIMARY KEY (symbol, date) WITHOUT ROWID
+#
+# Satırlar (symbol, date) sırasıyla B-ağacında durur; bir sembolün tarih
+# aralığı ardışık sayfalardan okunur, ayrı indeks gerekmez.
+#
+# Okumalar model_view görünümünden yapılır: tarih ISO metin olarak döner ve
+# tarih anahtarlı makro seriler (macro_inputs, bkz. macro_store) okuma anında
+# birleştirilir. Diğer yardımcılar doğrudan model_data'ya yazan betikler içindir.
+#
+#   python model_schema.py --db bist_model_ready.db
+# -----------------------------------------------------------------------------
+
+import argparse
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+import db_writer
+from db_writer import quote_identifier
+
+MODEL_TABLE = "model_data"
+MODEL_KEYS = ('symbol', 'date')
+
+# api.py ve eğitim bu görünümden okur: model_data + tarihe göre makro kolonlar
+MODEL_VIEW = "model_view"
+MACRO_TABLE = "macro_inputs"
+
+# Kompakt görünümde ham gün sayısı; tarih filtresi ve sıralaması bu kolonla
+# yapılırsa birincil anahtar kullanılır (ISO date ifadesi indekslenemez)
+DAY_COLUMN = "day"
+
+_EPOCH = np.datetime64('1970-01-01', 'D')
+
+# Gün sayısını ISO tarihe çeviren SQL ifadesi (model_view bunu kullanır)
+ISO_DATE_SQL = "date({col} * 86400, 'unixepoch')"
+
+
+def to_day_number(values) -> np.ndarray:
+    """ISO metin / datetime değerlerini 1970-01-01'den gün sayısına çevirir."""
+    days = pd.to_datetime(pd.Series(values)).to_numpy().astype('datetime64[D]')
+    return (days - _EPOCH).astype(np.int64)
+
+
+def from_day_number(values) -> pd.Series:
+    """Gün sayılarını 'YYYY-MM-DD' metnine çevirir."""
+    days = np.asarray(values, dtype=np.int64).astype('timedelta64[D]') + _EPOCH
+    return pd.Series(pd.to_datetime(days).strftime('%Y-%m-%d'), index=getattr(values, 'index', None))
+
+
+def is_compact(conn: sqlite3.Connection, table: str = MODEL_TABLE) -> bool:
+    """Tablo WITHOUT ROWID ve date kolonu INTEGER ise True."""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    if row is None or 'WITHOUT ROWID' not in row[0].upper():
+        return False
+    types = {r[1]: r[2].upper() for r in conn.execute(f"PRAGMA table_info({quote_identifier(table)})")}
+    return types.get('date') == 'INTEGER'
+
+
+def create_model_view(conn: sqlite3.Connection) -> None:
+    """
+    model_view'u (yeniden) oluşturur: kompakt şemada date ISO metne çevrilir,
+    macro_inputs varsa kolonları tarihe göre LEFT JOIN ile eklenir.
+    """
+    compact = is_compact(conn)
+    stock_cols = db_writer.table_columns(conn, MODEL_TABLE)
+    macro_cols = []
+    if db_writer.table_exists(conn, MACRO_TABLE):
+        macro_cols = [c for c in db_writer.table_columns(conn, MACRO_TABLE)
+                      if c != 'date' and c not in stock_cols]
+
+    if compact:
+        iso = ISO_DATE_SQL.format(col="m.date")
+        select = ", ".join(f"{iso} AS date" if c == 'date' else f"m.{quote_identifier(c)}" for c in stock_cols)
+        select += f", m.date AS {DAY_COLUMN}"
+    else:
+        iso, select = "m.date", "m.*"
+    select += "".join(f", g.{quote_identifier(c)}" for c in macro_cols)
+    join = f"\n        LEFT JOIN {MACRO_TABLE} AS g ON g.date = {iso}" if macro_cols else ""
+
+    drop_model_view(conn)
+    conn.execute(f"CREATE VIEW {MODEL_VIEW} AS\n        SELECT {select}\n        FROM {MODEL_TABLE} AS m{join}")
+
+
+def drop_model_view(conn: sqlite3.Connection) -> None:
+    """model_data düşürülüp yeniden adlandırılmadan önce çağrılmalı (SQLite görünümü doğrular)."""
+    conn.execute(f"DROP VIEW IF EXISTS {MODEL_VIEW}")
+
+
+def refresh_model_view(conn: sqlite3.Connection) -> None:
+    """
+    model_data yeniden kurulduktan ya da makro kolonlar değiştikten sonra
+    görünümü günceller. Eski şemada ve makro tablosu yokken görünüme gerek yoktur.
+    """
+    if db_writer.table_exists(conn, MODEL_TABLE) and (
+            is_compact(conn) or db_writer.table_exists(conn, MACRO_TABLE)):
+        create_model_view(conn)
+
+
+def model_source(conn: sqlite3.Connection) -> str:
+    """Okumalar için kaynak: model_view varsa o, yoksa (göç yapılmamış DB) model_data."""
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'view' AND name = ?", (MODEL_VIEW,)).fetchone()
+    return MODEL_VIEW if row else MODEL_TABLE
+
+
+def date_key(conn: sqlite3.Connection, source: str) -> str:
+    """
+    source üzerinde tarih aralığı / sıralama için kolon: kompakt görünümde
+    DAY_COLUMN, aksi halde date. Parametreler date_param ile hazırlanmalıdır.
+    """
+    return DAY_COLUMN if source == MODEL_VIEW and is_compact(conn) else 'date'
+
+
+def _column_type(declared: str) -> str:
+    return 'TEXT' if declared.upper() == 'TEXT' else 'REAL'
+
+
+def create_compact_table(conn: sqlite3.Connection, table: str, columns: dict[str, str]) -> None:
+    """columns: anahtar dışı kolon -> 'REAL' / 'TEXT'. Tablo zaten varsa dokunmaz."""
+    cols = "".join(f",\n    {quote_identifier(c)} {t}" for c, t in columns.items() if c not in MODEL_KEYS)
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {quote_identifier(table)} (\n"
+        f"    symbol TEXT NOT NULL,\n    date INTEGER NOT NULL{cols},\n"
+        f"    PRIMARY KEY (symbol, date)\n) WITHOUT ROWID"
+    )
+
+
+def frame_column_types(df: pd.DataFrame) -> dict[str, str]:
+    return {c: ('REAL' if pd.api.types.is_numeric_dtype(df[c]) else 'TEXT')
+            for c in df.columns if c not in MODEL_KEYS}
+
+
+def storage_frame(conn: sqlite3.Connection, df: pd.DataFrame, table: str = MODEL_TABLE) -> pd.DataFrame:
+    """Yazmadan önce: tablo kompakt şemadaysa date kolonunu gün sayısına çevirir."""
+    if not is_compact(conn, table):
+        return df
+    out = df.copy()
+    out['date'] = to_day_number(out['date'])
+    return out
+
+
+def date_param(conn: sqlite3.Connection, iso_date: str, table: str = MODEL_TABLE):
+    """model_data'ya doğrudan yapılan tarih karşılaştırmaları için parametre."""
+    return int(to_day_number([iso_date])[0]) if is_compact(conn, table) else iso_date
+
+
+def read_model_data(conn: sqlite3.Connection, columns: list[str] | None = None, where: str = "",
+                    params: tuple = (), order_by: str = "symbol, date") -> pd.DataFrame:
+    """
+    model_data'yı (makro kolonlar olmadan) okur; date her iki şemada da ISO
+    metin olarak döner. where içindeki tarih karşılaştırmaları date_param ile
+    hazırlanmış parametre kullanmalıdır.
+    """
+    cols = "*" if columns is None else ", ".join(quote_identifier(c) for c in columns)
+    query = f"SELECT {cols} FROM {MODEL_TABLE}"
+    if where:
+        query += f" WHERE {where}"
+    if order_by:
+        query += f" ORDER BY {order_by}"
+    df = pd.read_sql_query(query, conn, params=params)
+    if 'date' in df.columns and is_compact(conn):
+        df['date'] = from_day_number(df['date'])
+    return df
+
+
+def replace_model_data(conn: sqlite3.Connection, df: pd.DataFrame) -> int:
+    """
+    model_data'yı df ile baştan yazar (to_sql(replace) yerine): kompakt şema,
+    (symbol, date) sıralı executemany ekleme; görünüm yeniden kurulur.
+    Commit etmez.
+    """
+    drop_model_view(conn)
+    conn.execute(f"DROP TABLE IF EXISTS {MODEL_TABLE}")
+    create_compact_table(conn, MODEL_TABLE, frame_column_types(df))
+    df = df.sort_values(list(MODEL_KEYS), kind='mergesort')
+    df = df.assign(date=to_day_number(df['date']))
+    written = db_writer.upsert_rows(conn, MODEL_TABLE, df, keys=MODEL_KEYS, commit=False)
+    create_model_view(conn)
+    return written
+
+
+def migrate(conn: sqlite3.Connection) -> bool:
+    """
+    Eski model_data'yı kompakt şemaya tek SQL ifadesiyle taşır (veri Python'a
+    gelmez). Aynı (symbol, date) birden fazla varsa sonuncusu kalır; ikincil
+    indeksler (idx_symbol_date, idx_date, idx_symbol) eski tabloyla birlikte
+    silinir. Zaten kompaktsa False döner. Boşalan alan için ardından VACUUM.
+    """
+    if is_compact(conn):
+        return False
+
+    info = list(conn.execute(f"PRAGMA table_info({MODEL_TABLE})"))
+    columns = {r[1]: _column_type(r[2] or '') for r in info if r[1] not in MODEL_KEYS}
+    tmp = f"{MODEL_TABLE}_compact"
+
+    select = ["symbol", "CAST(julianday(substr(date, 1, 10)) - 2440587.5 AS INTEGER)"]
+    select += [quote_identifier(c) if t == 'TEXT' else f"CAST({quote_identifier(c)} AS REAL)"
+               for c, t in columns.items()]
+    names = ", ".join(quote_identifier(c) for c in ['symbol', 'date'] + list(columns))
+
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {tmp}")
+        create_compact_table(conn, tmp, columns)
+        conn.execute(
+            f"INSERT OR REPLACE INTO {tmp} ({names}) "
+            f"SELECT {', '.join(select)} FROM {MODEL_TABLE} "
+            f"WHERE symbol IS NOT NULL AND date IS NOT NULL ORDER BY symbol, date"
+        )
+        drop_model_view(conn)
+        conn.execute(f"DROP TABLE {MODEL_TABLE}")
+        conn.execute(f"ALTER TABLE {tmp} RENAME TO {MODEL_TABLE}")
+        create_model_view(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+
+def ensure_compact(conn: sqlite3.Connection) -> None:
+    """Betiklerin başında çağrılır: model_data eski şemadaysa taşır."""
+    if db_writer.table_exists(conn, MODEL_TABLE) and migrate(conn):
+        print("   -> model_data kompakt şemaya (WITHOUT ROWID, gün sayısı tarih) taşındı.")
+
+
+def _time_queries(db_path: str, symbols: list[str], repeat: int = 3) -> dict[str, float]:
+    """Tipik okumaların ortalama süresi (ms); API'nin kullandığı kaynaktan okunur."""
+    conn = sqlite3.connect(db_path)
+    source = model_source(conn)
+    key = date_key(conn, source)
+    last = pd.Timestamp(conn.execute(f"SELECT MAX(date) FROM {source}").fetchone()[0])
+    year = [date_param(conn, d.strftime('%Y-%m-%d')) for d in (last - pd.DateOffset(years=1), last)]
+    queries = {
+        'sembol, tüm geçmiş': (f"SELECT * FROM {source} WHERE symbol = ? ORDER BY {key}", lambda s: (s,)),
+        'sembol, son 1 yıl': (f"SELECT date, close, low, high, volume FROM {source} "
+                              f"WHERE symbol = ? AND {key} BETWEEN ? AND ? ORDER BY {key}",
+                              lambda s: (s, *year)),
+        'son tarih (watermark)': (f"SELECT MAX(date), COUNT(*) FROM {MODEL_TABLE} WHERE symbol = ?", lambda s: (s,)),
+    }
+    timings = {}
+    for name, (sql, params) in queries.items():
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for symbol in symbols:
+                conn.execute(sql, params(symbol)).fetchall()
+        timings[name] = (time.perf_counter() - started) * 1000 / (repeat * len(symbols))
+    conn.close()
+    return timings
+
+
+def migrate_database(db_path: str, vacuum: bool = True, sample: int = 20) -> None:
+    """Şemayı taşır ve öncesi/sonrası dosya boyutu ile sorgu sürelerini yazdırır."""
+    conn = sqlite3.connect(db_path)
+    symbols = [r[0] for r in conn.execute(f"SELECT DISTINCT symbol FROM {MODEL_TABLE} ORDER BY symbol")]
+    conn.close()
+    step = max(1, len(symbols) // sample)
+    symbols = symbols[::step][:sample]
+
+    size_before = os.path.getsize(db_path)
+    before = _time_queries(db_path, symbols)
+
+    conn = sqlite3.connect(db_path)
+    started = time.perf_counter()
+    if not migrate(conn):
+        print("model_data zaten kompakt şemada.")
+    migrate_seconds = time.perf_counter() - started
+    if vacuum:
+        conn.execute("VACUUM")
+    conn.close()
+
+    size_after = os.path.getsize(db_path)
+    after = _time_queries(db_path, symbols)
+
+    print(f"Taşıma: {migrate_seconds:.1f} sn")
+    print(f"Dosya boyutu: {size_before / 2**20:,.1f} MB -> {size_after / 2**20:,.1f} MB")
+    for name in before:
+        print(f"   {name:<22}: {before[name]:7.2f} ms -> {after[name]:7.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="model_data'yı kompakt, (symbol, date) kümelenmiş şemaya taşır.")
+    parser.add_argument("--db", default="bist_model_ready.db")
+    parser.add_argument("--no-vacuum", action="store_true", help="Taşımadan sonra VACUUM çalıştırma")
+    args = parser.parse_args()
+
+    migrate_database(args.db, vacuum=not args.no_vacuum)
@@ -0,0 +1,173 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Dogan Ege BULTE
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+# -----------------------------------------------------------------------------
+#
+# Kazınan HTML sayfaları için disk önbelleği (bist100/fintable.py). Her sembol
+# için son yanıtın ETag / Last-Modified başlıkları ve içerik özeti (sha256)
+# meta.json'da tutulur:
+#
+#   <PAGE_CACHE_DIR>/<ad alanı>/<sembol>/meta.json
+#   <PAGE_CACHE_DIR>/<ad alanı>/<sembol>/<özet>.html.gz
+#   <PAGE_CACHE_DIR>/<ad alanı>/<sembol>/<özet>.<ayrıştırıcı>.pkl.gz
+#
+# Bir sonraki istek koşullu yapılır (If-None-Match / If-Modified-Since); 304
+# gelirse sayfa yeniden indirilmez. Sunucu koşullu isteği yok sayıp aynı
+# içeriği 200 ile döndürse bile özet değişmediği için ayrıştırma sonucu
+# önbellekten okunur. FORSIGHT_OFFLINE=1 ile (bkz. fetch_cache) ağa çıkılmaz.
+# -----------------------------------------------------------------------------
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Callable
+
+import pandas as pd
+
+from fetch_cache import OFFLINE, CacheMiss
+
+PAGE_CACHE_DIR = os.environ.get(
+    "FORSIGHT_PAGE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "pages"),
+)
+
+
+def content_digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()[:16]
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    # Aynı sembolü yazan iki thread yarım dosya bırakmasın: geçici dosya + os.replace
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class PageCache:
+    """Ad alanı (örn. 'fintables_bilanco') başına sembol anahtarlı sayfa önbelleği."""
+
+    def __init__(self, namespace: str, root: str = PAGE_CACHE_DIR):
+        self.root = os.path.join(root, namespace)
+        self._stats = {"not_modified": 0, "unchanged": 0, "changed": 0, "offline": 0,
+                       "parsed": 0, "parse_hit": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, kind: str) -> None:
+        with self._lock:
+            self._stats[kind] += 1
+
+    def _dir(self, symbol: str) -> str:
+        return os.path.join(self.root, symbol)
+
+    def meta(self, symbol: str) -> dict | None:
+        path = os.path.join(self._dir(symbol), "meta.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def conditional_headers(self, symbol: str) -> dict[str, str]:
+        """Son yanıtın doğrulayıcılarıyla koşullu istek başlıkları (önbellek boşsa {})."""
+        meta = self.meta(symbol)
+        if meta is None or not os.path.exists(self._html_path(symbol, meta["digest"])):
+            return {}
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def _html_path(self, symbol: str, digest: str) -> str:
+        return os.path.join(self._dir(symbol), f"{digest}.html.gz")
+
+    def not_modified(self, symbol: str) -> str:
+        """304 yanıtı: önbellekteki içeriğin özeti."""
+        self._count("not_modified")
+        return self.meta(symbol)["digest"]
+
+    def offline(self, symbol: str) -> str:
+        """Çevrimdışı mod: son saklanan içeriğin özeti; hiç yoksa CacheMiss."""
+        meta = self.meta(symbol)
+        if meta is None:
+            raise CacheMiss(f"{symbol} sayfası önbellekte yok (çevrimdışı mod)")
+        self._count("offline")
+        return meta["digest"]
+
+    def store(self, symbol: str, url: str, content: bytes, etag: str | None = None,
+              last_modified: str | None = None) -> str:
+        """
+        200 yanıtını saklar (içerik değişmediyse yalnızca meta güncellenir); özeti
+        döndürür. İçerik değiştiyse önceki özetin HTML ve ayrıştırma dosyaları,
+        yeni meta yazıldıktan sonra silinir.
+        """
+        digest = content_digest(content)
+        previous = self.meta(symbol)
+        if previous is not None and previous["digest"] == digest:
+            self._count("unchanged")
+        else:
+            self._count("changed")
+            _write_atomic(self._html_path(symbol, digest), gzip.compress(content))
+
+        meta = {
+            "url": url,
+            "digest": digest,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        _write_atomic(os.path.join(self._dir(symbol), "meta.json"),
+                      json.dumps(meta, ensure_ascii=False, indent=1).encode("utf-8"))
+        if previous is not None and previous["digest"] != digest:
+            self._drop_digest(symbol, previous["digest"])
+        return digest
+
+    def _drop_digest(self, symbol: str, digest: str) -> None:
+        # <özet>.html.gz ve tüm <özet>.<ayrıştırıcı>.pkl.gz dosyaları
+        prefix = f"{digest}."
+        for name in os.listdir(self._dir(symbol)):
+            if name.startswith(prefix):
+                try:
+                    os.remove(os.path.join(self._dir(symbol), name))
+                except FileNotFoundError:
+                    pass
+
+    def html(self, symbol: str, digest: str) -> str:
+        with gzip.open(self._html_path(symbol, digest), "rb") as f:
+            return f.read().decode("utf-8")
+
+    def parsed(self, symbol: str, digest: str, parser: str, parse: Callable[[str], Any]) -> Any:
+        """
+        parse(html) sonucunu (None dahil) içerik özeti + ayrıştırıcı adıyla
+        saklar; aynı içerik için ayrıştırma bir kez yapılır. Ayrıştırma mantığı
+        değişirse parser adı değiştirilmelidir.
+        """
+        path = os.path.join(self._dir(symbol), f"{digest}.{parser}.pkl.gz")
+        if os.path.exists(path):
+            self._count("parse_hit")
+            return pd.read_pickle(path, compression="gzip")
+
+        result = parse(self.html(symbol, digest))
+        self._count("parsed")
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pd.to_pickle(result, tmp, compression="gzip")
+        os.replace(tmp, path)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        mode = f", {s['offline']} çevrimdışı" if OFFLINE else ""
+        return (f"sayfa önbelleği: {s['not_modified']} x 304, {s['unchanged']} aynı içerik, "
+                f"{s['changed']} yeni/değişmiş{mode}; "
+                f"{s['parse_hit']} ayrıştırma önbellekten, {s['parsed']} yeni")
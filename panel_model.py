@@ -0,0 +1,322 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Dogan Ege BULTE
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+# -----------------------------------------------------------------------------
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
+
+import model_schema
+
+DB_PATH = "bist_model_ready.db"
+PANEL_MODEL_DIR = "panel_models"
+PANEL_HORIZONS = [1, 5, 10, 30]
+
+# Older bars only add regime noise to a pooled model and cost memory
+PANEL_TRAIN_START = "2005-01-01"
+
+# Last fraction of trading days held out for the reported metrics
+TEST_FRACTION = 0.2
+
+# Longest lookback used by the features below
+FEATURE_LOOKBACK = 60
+
+PANEL_MODEL_NAME = "Panel Hist Gradient Boosting"
+
+SOURCE_COLUMNS = [
+    'symbol', 'date', 'close', 'volume', 'rsi_14', 'macd_12_26_9', 'macdh_12_26_9', 'macds_12_26_9',
+    'sma_50', 'sma_200', 'bbb_20_2.0_2.0', 'bbp_20_2.0_2.0', 'atr', 'mfi',
+    'brent_oil', 'sp500', 'vix', 'xbank_xusin_ratio', 'relative_to_index', 'tcmb_rediscount_rate',
+]
+
+PANEL_FEATURES = [
+    'ret_1', 'ret_5', 'ret_20', 'ret_60', 'vol_20', 'vol_60', 'volume_z',
+    'rsi', 'mfi_norm', 'macd_norm', 'macdh_norm', 'macds_norm',
+    'sma50_gap', 'sma200_gap', 'bb_width', 'bb_pos', 'atr_norm', 'rel_index_ret_20',
+    'brent_ret_5', 'sp500_ret_5', 'vix_level', 'vix_ret_5', 'xbank_xusin_ret_20',
+    'policy_rate', 'policy_rate_chg_60',
+]
+
+
+def _quote(col: str) -> str:
+    return f'"{col}"'
+
+
+def load_panel_frame(db_path: str = DB_PATH, symbols: list[str] | None = None,
+                     start_date: str | None = None) -> pd.DataFrame:
+    """model_data'yı (makro kolonlar model_view ile birleşik) (symbol, date) sıralı tek bir panel olarak okur."""
+    conn = sqlite3.connect(db_path)
+    source = model_schema.model_source(conn)
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({source})")}
+    cols = [c for c in SOURCE_COLUMNS if c in existing]
+
+    where, params = [], []
+    if symbols:
+        where.append(f"symbol IN ({', '.join('?' * len(symbols))})")
+        params.extend(symbols)
+    date_key = model_schema.date_key(conn, source)
+    if start_date:
+        where.append(f"{date_key} >= ?")
+        params.append(model_schema.date_param(conn, start_date))
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+    query = f"SELECT {', '.join(_quote(c) for c in cols)} FROM {source} {where_sql} ORDER BY symbol, {date_key}"
+    try:
+        df = pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+
+    for col in SOURCE_COLUMNS:
+        if col not in df.columns:
+            df[col] = np.nan
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def build_panel_features(df: pd.DataFrame, horizons: list[int] | None = None) -> pd.DataFrame:
+    """
+    Sembolden bağımsız (göreli) özellikleri ve her ufuk için log-getiri hedefini üretir.
+    Girdi (symbol, date) sıralı olmalıdır.
+    """
+    out = pd.DataFrame({'symbol': df['symbol'].values, 'date': df['date'].values}, index=df.index)
+    close = pd.to_numeric(df['close'], errors='coerce')
+    log_close = np.log(close.where(close > 0))
+    log_close_g = log_close.groupby(df['symbol'], sort=False)
+
+    for n in (1, 5, 20, 60):
+        out[f'ret_{n}'] = log_close - log_close_g.shift(n)
+
+    ret_1_g = out['ret_1'].groupby(df['symbol'], sort=False)
+    out['vol_20'] = ret_1_g.rolling(20).std().reset_index(level=0, drop=True)
+    out['vol_60'] = ret_1_g.rolling(60).std().reset_index(level=0, drop=True)
+
+    log_volume = np.log1p(pd.to_numeric(df['volume'], errors='coerce').clip(lower=0))
+    log_volume_g = log_volume.groupby(df['symbol'], sort=False)
+    vol_mean = log_volume_g.rolling(60).mean().reset_index(level=0, drop=True)
+    vol_std = log_volume_g.rolling(60).std().reset_index(level=0, drop=True)
+    out['volume_z'] = (log_volume - vol_mean) / vol_std.replace(0, np.nan)
+
+    out['rsi'] = df['rsi_14'] / 100
+    out['mfi_norm'] = df['mfi'] / 100
+    out['macd_norm'] = df['macd_12_26_9'] / close
+    out['macdh_norm'] = df['macdh_12_26_9'] / close
+    out['macds_norm'] = df['macds_12_26_9'] / close
+    out['sma50_gap'] = close / df['sma_50'] - 1
+    out['sma200_gap'] = close / df['sma_200'] - 1
+    out['bb_width'] = df['bbb_20_2.0_2.0'] / 100
+    out['bb_pos'] = df['bbp_20_2.0_2.0']
+    out['atr_norm'] = df['atr'] / close
+
+    rel = np.log(pd.to_numeric(df['relative_to_index'], errors='coerce').where(lambda s: s > 0))
+    out['rel_index_ret_20'] = rel - rel.groupby(df['symbol'], sort=False).shift(20)
+
+    def macro_ret(col, n):
+        s = np.log(pd.to_numeric(df[col], errors='coerce').where(lambda v: v > 0))
+        return s - s.groupby(df['symbol'], sort=False).shift(n)
+
+    out['brent_ret_5'] = macro_ret('brent_oil', 5)
+    out['sp500_ret_5'] = macro_ret('sp500', 5)
+    out['vix_level'] = df['vix'] / 100
+    out['vix_ret_5'] = macro_ret('vix', 5)
+    out['xbank_xusin_ret_20'] = macro_ret('xbank_xusin_ratio', 20)
+
+    # TCMB reeskont oranı (bist100/faiz.py, günlük as-of değer): seviye ve 60 barlık değişim
+    rate = pd.to_numeric(df['tcmb_rediscount_rate'], errors='coerce') / 100
+    out['policy_rate'] = rate
+    out['policy_rate_chg_60'] = rate - rate.groupby(df['symbol'], sort=False).shift(60)
+
+    out[PANEL_FEATURES] = out[PANEL_FEATURES].replace([np.inf, -np.inf], np.nan).astype('float32')
+    out['close'] = close
+
+    for h in horizons or []:
+        out[f'target_{h}'] = log_close_g.shift(-h) - log_close
+
+    return out
+
+
+def _model_path(horizon: int, model_dir: str = PANEL_MODEL_DIR) -> str:
+    return os.path.join(model_dir, f"panel_h{horizon}.joblib")
+
+
+def train_panel_models(db_path: str = DB_PATH, horizons: list[int] | None = None,
+                       start_date: str | None = PANEL_TRAIN_START,
+                       model_dir: str = PANEL_MODEL_DIR) -> dict:
+    """
+    Tüm piyasa için her ufukta tek bir model eğitir ve diske yazar.
+    Özellik matrisi bütün ufuklar için bir kez hesaplanır.
+    """
+    horizons = horizons or PANEL_HORIZONS
+    os.makedirs(model_dir, exist_ok=True)
+
+    t0 = time.perf_counter()
+    print("1. Panel verisi okunuyor...")
+    raw = load_panel_frame(db_path, start_date=start_date)
+    print(f"   -> {len(raw)} satır, {raw['symbol'].nunique()} sembol")
+
+    print("2. Göreli özellikler hesaplanıyor...")
+    panel = build_panel_features(raw, horizons)
+    last_date = raw['date'].max()
+    del raw
+
+    dates = np.sort(panel['date'].unique())
+    cutoff = dates[int(len(dates) * (1 - TEST_FRACTION))]
+
+    summary = {}
+    for h in horizons:
+        target = f'target_{h}'
+        rows = panel[panel[target].notna() & panel['ret_1'].notna()]
+        # Hedef penceresi test dönemine taşmasın diye eğitim kesimi h gün geriye çekilir
+        train_cutoff = dates[max(0, np.searchsorted(dates, cutoff) - h)]
+        train = rows[rows['date'] < train_cutoff]
+        test = rows[rows['date'] >= cutoff]
+        if len(train) < 1000 or test.empty:
+            print(f"   [h={h}] Yetersiz veri, atlanıyor.")
+            continue
+
+        print(f"3. [h={h}] Model eğitiliyor ({len(train)} eğitim / {len(test)} test satırı)...")
+        fit_started = time.perf_counter()
+        model = HistGradientBoostingRegressor(max_iter=300, learning_rate=0.05, random_state=42)
+        model.fit(train[PANEL_FEATURES], train[target])
+        train_seconds = time.perf_counter() - fit_started
+
+        y_pred = model.predict(test[PANEL_FEATURES])
+        y_true = test[target].values
+        # Hedef log getiri: R² fiyat düzeyindeki sembol modeli R²'siyle (accuracy) kıyaslanamaz
+        metrics = {
+            'return_r2': float(r2_score(y_true, y_pred)),
+            'cv_r2': None,
+            'rmse': float(np.sqrt(mean_squared_error(y_true, y_pred))),
+            'mae': float(mean_absolute_error(y_true, y_pred)),
+            'direction_accuracy': float(np.mean(np.sign(y_pred) == np.sign(y_true)) * 100),
+            'train_seconds': float(train_seconds),
+        }
+
+        joblib.dump({
+            'model': model,
+            'horizon': h,
+            'features': PANEL_FEATURES,
+            'metrics': metrics,
+            'training_samples': int(len(train)),
+            'test_samples': int(len(test)),
+            'symbols': int(rows['symbol'].nunique()),
+            'data_last_date': str(pd.Timestamp(last_date).date()),
+            'trained_at': datetime.now().isoformat(timespec='seconds'),
+        }, _model_path(h, model_dir))
+        summary[h] = metrics
+        print(f"   -> getiri R²={metrics['return_r2']:.4f}, yön isabeti=%{metrics['direction_accuracy']:.1f}, "
+              f"{train_seconds:.1f} sn")
+
+    print(f"\nBİTTİ. Toplam süre: {time.perf_counter() - t0:.1f} sn")
+    return summary
+
+
+_loaded_models = {}
+_loaded_models_lock = threading.Lock()
+
+
+def load_panel_model(horizon: int, model_dir: str = PANEL_MODEL_DIR) -> dict | None:
+    """Kayıtlı panel modelini yükler; dosya değişince yeniden okur."""
+    path = _model_path(horizon, model_dir)
+    if not os.path.exists(path):
+        return None
+    mtime = os.path.getmtime(path)
+    with _loaded_models_lock:
+        cached = _loaded_models.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    bundle = joblib.load(path)
+    with _loaded_models_lock:
+        _loaded_models[path] = (mtime, bundle)
+    return bundle
+
+
+def predict_from_panel(symbol: str, days_ahead: int = 30, db_path: str = DB_PATH,
+                       model_dir: str = PANEL_MODEL_DIR) -> dict | None:
+    """
+    Panel modelinden sembol tahmini üretir. Dönen sözlük api.train_and_predict_model
+    ile aynı yapıdadır, ancak fiyat düzeyi R²'sinden hesaplanan accuracy ve
+    confidence yoktur; model_metrics log getiri R²'sini return_r2 olarak
+    verir. Model yoksa None döner.
+    """
+    bundle = load_panel_model(days_ahead, model_dir)
+    if bundle is None:
+        return None
+
+    conn = sqlite3.connect(db_path)
+    try:
+        source = model_schema.model_source(conn)
+        row = conn.execute(f"SELECT date FROM {source} WHERE symbol = ? "
+                           f"ORDER BY {model_schema.date_key(conn, source)} DESC LIMIT 1 OFFSET ?",
+                           (symbol, FEATURE_LOOKBACK * 2)).fetchone()
+    finally:
+        conn.close()
+    start_date = row[0] if row else None
+
+    raw = load_panel_frame(db_path, symbols=[symbol], start_date=start_date)
+    if raw.empty:
+        return None
+
+    features = build_panel_features(raw)
+    last = features.iloc[-1:]
+    if last['ret_1'].isna().all():
+        return None
+
+    predicted_log_return = float(bundle['model'].predict(last[bundle['features']])[0])
+    current_price = float(last['close'].iloc[0])
+    predicted_price = current_price * float(np.exp(predicted_log_return))
+    metrics = dict(bundle['metrics'])
+    # Eski kayıtlı modeller: log getiri R²'si test_r2/accuracy adıyla saklanmıştı
+    if 'test_r2' in metrics:
+        metrics['return_r2'] = metrics.pop('test_r2')
+    metrics.pop('accuracy', None)
+
+    return {
+        'current_price': current_price,
+        'predicted_price': predicted_price,
+        'predicted_change_percent': (predicted_price / current_price - 1) * 100,
+        'best_model': PANEL_MODEL_NAME,
+        'model_metrics': metrics,
+        'all_models': {PANEL_MODEL_NAME: metrics},
+        'prediction_basis': {
+            'model': PANEL_MODEL_NAME,
+            'features_used': len(bundle['features']),
+            'feature_names': bundle['features'][:20],
+            'training_samples': bundle['training_samples'],
+            'test_samples': bundle['test_samples'],
+            'cross_validation_folds': 0,
+            'top_features': {},
+            'top_correlations': {},
+            'trained_at': bundle['trained_at'],
+            'symbols_pooled': bundle['symbols'],
+        },
+        'days_ahead': days_ahead,
+        'mode': 'panel',
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tüm semboller için tek panel modeli eğitir.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--horizons", default=",".join(str(h) for h in PANEL_HORIZONS))
+    parser.add_argument("--start", default=PANEL_TRAIN_START, help="Eğitim başlangıç tarihi (YYYY-MM-DD)")
+    parser.add_argument("--model-dir", default=PANEL_MODEL_DIR)
+    args = parser.parse_args()
+
+    train_panel_models(
+        db_path=args.db,
+        horizons=[int(h) for h in args.horizons.split(",") if h.strip()],
+        start_date=args.start,
+        model_dir=args.model_dir,
+    )
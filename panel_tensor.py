@@ -0,0 +1,320 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Dogan Ege BULTE
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+# -----------------------------------------------------------------------------
+#
+# model_data'nın (makro kolonlar dahil, bkz. model_schema.model_view) yoğun,
+# bellek eşlemli panel hali: sembol × işlem günü × özellik float32 tensörü.
+# Her sembol her işlem gününde bir satıra sahiptir; o gün verisi olmayan
+# hücreler NaN'dır. Dizin:
+#
+#   <dir>/CURRENT                 geçerli sürüm dizininin adı
+#   <dir>/<sürüm>/values.npy      float32 (n_symbols, n_days, n_features), C sırası
+#   <dir>/<sürüm>/symbols.txt     satır başına bir sembol (1. eksen)
+#   <dir>/<sürüm>/dates.npy       datetime64[D] işlem günü takvimi (2. eksen)
+#   <dir>/<sürüm>/features.txt    satır başına bir kolon adı (3. eksen)
+#   <dir>/<sürüm>/panel.json      boyutlar, kaynak DB ve model_data filigranı
+#
+# Her kurulum yeni bir sürüm dizinine yazılır ve bitince CURRENT atomik olarak
+# değiştirilir; açık dizin hiç yeniden adlandırılmaz (Windows'ta eşlenmiş
+# dosya tutan dizin taşınamaz). Eski sürümler silinir; hâlâ açık olduğu için
+# silinemeyen sürüm bir sonraki kurulumda yeniden denenir.
+#
+# Takvim, model_data'da en az bir sembolün bar'ı olan günlerdir (BIST işlem
+# günleri). values.npy np.load(mmap_mode='r') ile açılır: açmak dosya boyundan
+# bağımsızdır, aynı dosyayı açan süreçler işletim sisteminin sayfa önbelleğini
+# paylaşır ve PanelTensor'ın döndürdüğü dilimler kopya değil görünümdür.
+# Bir sembolün zaman serisi diskte ardışıktır; kesit (tek gün) adımlı okunur.
+#
+#   python panel_tensor.py --db bist_model_ready.db            # kur
+#   python panel_tensor.py --info                              # özet
+# -----------------------------------------------------------------------------
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import model_schema
+from db_writer import quote_identifier
+from perf_utils import format_throughput
+
+DB_PATH = "bist_model_ready.db"
+PANEL_TENSOR_DIR = "panel_tensor"
+
+VALUES_FILE = "values.npy"
+SYMBOLS_FILE = "symbols.txt"
+DATES_FILE = "dates.npy"
+FEATURES_FILE = "features.txt"
+META_FILE = "panel.json"
+CURRENT_FILE = "CURRENT"
+
+# Kurulumda bir seferde okunan satır sayısı (sqlite3 satırları Python nesnesi
+# olarak gelir; 20k satır × ~40 kolon birkaç yüz MB tutar)
+BUILD_CHUNK_ROWS = 20_000
+
+_NON_FEATURE_COLUMNS = {'symbol', 'date', model_schema.DAY_COLUMN}
+
+_EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+def feature_columns(conn: sqlite3.Connection, source: str) -> list[str]:
+    """source'un sayısal kolonları (symbol / date / day ve TEXT kolonlar hariç), tablo sırasıyla."""
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({quote_identifier(source)})")
+            if r[1] not in _NON_FEATURE_COLUMNS and (r[2] or '').upper() != 'TEXT']
+
+
+def model_watermark(conn: sqlite3.Connection) -> dict:
+    """model_data'nın satır sayısı ve son tarihi; tensörün güncelliği bununla karşılaştırılır."""
+    rows, last = conn.execute(f"SELECT COUNT(*), MAX(date) FROM {model_schema.MODEL_TABLE}").fetchone()
+    if last is not None and model_schema.is_compact(conn):
+        last = model_schema.from_day_number(np.array([last])).iloc[0]
+    return {"rows": rows, "last_date": last}
+
+
+def _day_numbers(values) -> np.ndarray:
+    """Kompakt şemada date zaten gün sayısıdır; eski şemada ISO metin çevrilir."""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.integer):
+        return values.astype(np.int64)
+    return model_schema.to_day_number(values)
+
+
+def trading_days(conn: sqlite3.Connection) -> np.ndarray:
+    """En az bir sembolün bar'ı olan günler, artan sırada (1970-01-01'den gün sayısı)."""
+    days = [r[0] for r in conn.execute(f"SELECT DISTINCT date FROM {model_schema.MODEL_TABLE} ORDER BY date")]
+    return np.unique(_day_numbers(days))
+
+
+def _write_lines(path: str, lines: list[str]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(f"{line}\n" for line in lines))
+
+
+def _read_lines(path: str) -> list[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def resolve_panel_dir(path: str = PANEL_TENSOR_DIR) -> str:
+    """CURRENT'ın gösterdiği sürüm dizini (CURRENT yoksa eski düz düzen: path'in kendisi)."""
+    pointer = os.path.join(path, CURRENT_FILE)
+    if not os.path.exists(pointer):
+        return path
+    with open(pointer, "r", encoding="utf-8") as f:
+        return os.path.join(path, f.read().strip())
+
+
+def _drop_old_versions(out_dir: str, keep: str) -> None:
+    # Açık eşlemesi olan sürüm (Windows) silinemez; sonraki kurulumda yeniden denenir
+    for name in os.listdir(out_dir):
+        path = os.path.join(out_dir, name)
+        if name == keep or name == CURRENT_FILE:
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif name in (VALUES_FILE, SYMBOLS_FILE, DATES_FILE, FEATURES_FILE, META_FILE):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def build_panel_tensor(db_path: str = DB_PATH, out_dir: str = PANEL_TENSOR_DIR,
+                       features: list[str] | None = None,
+                       chunk_rows: int = BUILD_CHUNK_ROWS) -> dict:
+    """
+    Tensörü model_view'dan (yoksa model_data'dan) kurar. Kaynak tek sıralı
+    sorguyla chunk_rows'luk parçalar halinde okunup doğrudan bellek eşlemli
+    dosyaya yazılır; bellek kullanımı tensör boyundan bağımsızdır. Yeni sürüm
+    dizininde kurulup hazır olunca CURRENT ona çevrilir (eski sürümü açmış
+    okuyucular onu okumaya devam eder). Meta bilgisini döndürür.
+    """
+    started = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    try:
+        source = model_schema.model_source(conn)
+        key = model_schema.date_key(conn, source)
+        available = feature_columns(conn, source)
+        if features is None:
+            features = available
+        else:
+            unknown = [f for f in features if f not in available]
+            if unknown:
+                raise ValueError(f"{source} içinde olmayan özellik(ler): {', '.join(unknown)}")
+        symbols = [r[0] for r in conn.execute(
+            f"SELECT DISTINCT symbol FROM {model_schema.MODEL_TABLE} WHERE symbol IS NOT NULL ORDER BY symbol")]
+        days = trading_days(conn)
+        watermark = model_watermark(conn)
+
+        version = f"v{datetime.now():%Y%m%d%H%M%S%f}_{os.getpid()}"
+        version_dir = os.path.join(out_dir, version)
+        os.makedirs(version_dir)
+
+        shape = (len(symbols), len(days), len(features))
+        values = np.lib.format.open_memmap(os.path.join(version_dir, VALUES_FILE), mode="w+",
+                                           dtype=np.float32, shape=shape)
+        values[:] = np.nan
+        cols = ", ".join(quote_identifier(c) for c in ['symbol', key] + features)
+        sym_index = pd.Index(symbols)
+        filled = 0
+        # Tek sıralı tarama (kompakt şemada birincil anahtar sırası); parçalar halinde okunur
+        for df in pd.read_sql_query(f"SELECT {cols} FROM {source} WHERE symbol IS NOT NULL "
+                                    f"ORDER BY symbol, {key}", conn, chunksize=chunk_rows):
+            row = sym_index.get_indexer(df['symbol'])
+            col = np.searchsorted(days, _day_numbers(df[key]))
+            values[row, col] = df[features].apply(pd.to_numeric, errors='coerce').to_numpy(np.float32)
+            filled += len(df)
+        values.flush()
+        del values
+    finally:
+        conn.close()
+
+    np.save(os.path.join(version_dir, DATES_FILE), days.astype('timedelta64[D]') + _EPOCH)
+    _write_lines(os.path.join(version_dir, SYMBOLS_FILE), symbols)
+    _write_lines(os.path.join(version_dir, FEATURES_FILE), features)
+    meta = {
+        "shape": list(shape),
+        "dtype": "float32",
+        "source": os.path.abspath(db_path),
+        "watermark": watermark,
+        "first_date": str(days[0].astype('timedelta64[D]') + _EPOCH) if len(days) else None,
+        "last_date": watermark["last_date"],
+        "filled": filled,
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        "build_seconds": round(time.perf_counter() - started, 2),
+    }
+    with open(os.path.join(version_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=1)
+
+    pointer = os.path.join(out_dir, CURRENT_FILE)
+    with open(f"{pointer}.{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(f"{pointer}.{os.getpid()}.tmp", pointer)
+    _drop_old_versions(out_dir, version)
+    return meta
+
+
+class PanelTensor:
+    """
+    Kurulmuş tensörü salt okunur açar. values ve dilim yöntemlerinin
+    döndürdükleri bellek eşlemli dosyanın görünümleridir (kopya yapılmaz);
+    yalnızca frame() / wide() pandas tablosu üretirken veri kopyalanır.
+    """
+
+    def __init__(self, path: str = PANEL_TENSOR_DIR):
+        path = resolve_panel_dir(path)
+        self.path = path
+        self.values = np.load(os.path.join(path, VALUES_FILE), mmap_mode="r")
+        self.dates = np.load(os.path.join(path, DATES_FILE))
+        self.symbols = _read_lines(os.path.join(path, SYMBOLS_FILE))
+        self.features = _read_lines(os.path.join(path, FEATURES_FILE))
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self._symbol_index = {s: i for i, s in enumerate(self.symbols)}
+        self._feature_index = {c: i for i, c in enumerate(self.features)}
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        return self.values.shape
+
+    def symbol_index(self, symbol: str) -> int:
+        try:
+            return self._symbol_index[symbol]
+        except KeyError:
+            raise KeyError(f"Tensörde olmayan sembol: {symbol}") from None
+
+    def feature_index(self, feature: str) -> int:
+        try:
+            return self._feature_index[feature]
+        except KeyError:
+            raise KeyError(f"Tensörde olmayan özellik: {feature}") from None
+
+    def date_slice(self, start=None, end=None) -> slice:
+        """[start, end] (ikisi de dahil) tarih aralığının gün ekseni dilimi."""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, 'D'), 'left'))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(end, 'D'), 'right'))
+        return slice(lo, hi)
+
+    def date_index(self, date) -> int:
+        """Tarihin gün eksenindeki yeri; işlem günü değilse KeyError."""
+        day = np.datetime64(date, 'D')
+        pos = int(np.searchsorted(self.dates, day))
+        if pos == len(self.dates) or self.dates[pos] != day:
+            raise KeyError(f"İşlem günü değil: {day}")
+        return pos
+
+    def symbol(self, symbol: str, start=None, end=None) -> np.ndarray:
+        """(gün, özellik) görünümü; diskte ardışık."""
+        return self.values[self.symbol_index(symbol), self.date_slice(start, end)]
+
+    def cross_section(self, date) -> np.ndarray:
+        """Tek günün (sembol, özellik) görünümü."""
+        return self.values[:, self.date_index(date)]
+
+    def window(self, start=None, end=None) -> np.ndarray:
+        """Tarih aralığının (sembol, gün, özellik) görünümü."""
+        return self.values[:, self.date_slice(start, end)]
+
+    def feature(self, feature: str, start=None, end=None) -> np.ndarray:
+        """Tek özelliğin (sembol, gün) görünümü."""
+        return self.values[:, self.date_slice(start, end), self.feature_index(feature)]
+
+    def frame(self, symbol: str, start=None, end=None, dropna: bool = True) -> pd.DataFrame:
+        """Bir sembolün date index'li tablosu; dropna ile bar'ı olmayan günler atılır."""
+        span = self.date_slice(start, end)
+        df = pd.DataFrame(self.symbol(symbol, start, end), index=pd.DatetimeIndex(self.dates[span], name='date'),
+                          columns=self.features)
+        return df.dropna(how='all') if dropna else df
+
+    def wide(self, feature: str, start=None, end=None, symbols: list[str] | None = None) -> pd.DataFrame:
+        """model_data.pivot(index='date', columns='symbol', values=feature) karşılığı."""
+        span = self.date_slice(start, end)
+        data = self.feature(feature, start, end)
+        if symbols is not None:
+            data = data[[self.symbol_index(s) for s in symbols]]
+        return pd.DataFrame(data.T, index=pd.DatetimeIndex(self.dates[span], name='date'),
+                            columns=pd.Index(symbols or self.symbols, name='symbol'))
+
+    def is_current(self, db_path: str = DB_PATH) -> bool:
+        """Tensör kurulduktan sonra model_data değişmediyse True."""
+        conn = sqlite3.connect(db_path)
+        try:
+            return model_watermark(conn) == self.meta.get("watermark")
+        finally:
+            conn.close()
+
+
+def describe(path: str = PANEL_TENSOR_DIR) -> str:
+    panel = PanelTensor(path)
+    n_sym, n_day, n_feat = panel.shape
+    size = os.path.getsize(os.path.join(panel.path, VALUES_FILE))
+    meta = panel.meta
+    return (f"{n_sym} sembol × {n_day} işlem günü × {n_feat} özellik "
+            f"({meta['first_date']} .. {meta['last_date']}), {size / 2**20:,.1f} MB, "
+            f"dolu (sembol, gün) {meta['filled']:,} / {n_sym * n_day:,}; kuruldu {meta['built_at']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="model_data'dan bellek eşlemli sembol × gün × özellik tensörü kurar.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--out", default=PANEL_TENSOR_DIR)
+    parser.add_argument("--features", default=None, help="Virgülle ayrılmış kolonlar (varsayılan: tüm sayısal kolonlar)")
+    parser.add_argument("--chunk-rows", type=int, default=BUILD_CHUNK_ROWS)
+    parser.add_argument("--info", action="store_true", help="Kurmadan mevcut tensörün özetini yazdır")
+    args = parser.parse_args()
+
+    if not args.info:
+        features = [c.strip() for c in args.features.split(",")] if args.features else None
+        started = time.perf_counter()
+        meta = build_panel_tensor(args.db, args.out, features, args.chunk_rows)
+        print(f"Tensör kuruldu: {format_throughput(meta['filled'], time.perf_counter() - started)}")
+    print(describe(args.out))
@@ -0,0 +1,35 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Dogan Ege BULTE
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+# -----------------------------------------------------------------------------
+
+import sys
+
+
+def peak_rss_mb() -> float | None:
+    """Sürecin şimdiye kadarki en yüksek bellek kullanımı (MB); ölçülemezse None."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux KB, macOS byte döndürür
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        # Windows'ta peak_wset var, diğerlerinde anlık RSS ile yetinilir
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def format_throughput(rows: int, seconds: float) -> str:
+    """'12,345 satır, 3.2 sn (3,858 satır/sn, tepe RSS 512 MB)' biçiminde özet."""
+    rate = rows / seconds if seconds > 0 else float("inf")
+    peak = peak_rss_mb()
+    peak_str = f", tepe RSS {peak:.0f} MB" if peak is not None else ""
+    return f"{rows:,} satır, {seconds:.1f} sn ({rate:,.0f} satır/sn{peak_str})"
@@ -0,0 +1,270 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Dogan Ege BULTE
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+# -----------------------------------------------------------------------------
+#
+# Dış günlük seriler (XU100, XBANK, XUSIN, Brent, SP500, VIX) için yerel
+# önbellek. Her seri tek dosyada kolon bazlı tutulur:
+#
+#   <SERIES_CACHE_DIR>/<ad>.parquet   (pyarrow varsa)
+#   <SERIES_CACHE_DIR>/<ad>.npz       (yoksa: gün sayısı + float kolonlar, sıkıştırılmış)
+#   <SERIES_CACHE_DIR>/series.json    (ticker, son bar, son indirme zamanı)
+#
+# update() her seri için yalnızca son kayıtlı bardan sonrasını indirir (son
+# bar da yeniden istenir; gün içinde çekilmişse kapanışla düzelir). Son
+# indirme SERIES_TTL'den yeniyse ağa hiç çıkılmaz; FORSIGHT_OFFLINE=1 ile
+# (bkz. fetch_cache) yalnızca önbellek okunur. aligned() serileri tarih
+# anahtarlı tek tabloya dizer: add_advanced_indicators (XBANK/XUSIN rasyosu),
+# brentpetrol (makro seriler) ve bist100/bist100.py buradan okur.
+#
+#   python series_cache.py                 # tüm serileri güncelle
+#   python series_cache.py --force xu100   # TTL'i yok say
+# -----------------------------------------------------------------------------
+
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from functools import partial
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from fetch_cache import OFFLINE, CacheMiss
+from fetch_pool import call_with_retry
+
+SERIES_CACHE_DIR = os.environ.get(
+    "FORSIGHT_SERIES_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "series"),
+)
+
+# Kolon adı -> Yahoo ticker. Makro adlar macro_store.MACRO_COLUMNS ile aynıdır.
+SERIES = {
+    'xu100': 'XU100.IS',
+    'xbank': 'XBANK.IS',
+    'xusin': 'XUSIN.IS',
+    'brent_oil': 'BZ=F',
+    'sp500': '^GSPC',
+    'vix': '^VIX',
+}
+
+# İlk indirmede istenen en eski tarih (Yahoo'da daha eskisi yoksa ilk bardan başlar)
+HISTORY_START = "1997-01-01"
+
+# Son indirmeden bu kadar saniye geçmeden seri yeniden istenmez
+SERIES_TTL = 6 * 60 * 60
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'adj_close', 'volume']
+
+_EPOCH = np.datetime64('1970-01-01', 'D')
+
+try:
+    import pyarrow  # noqa: F401
+    STORAGE_FORMAT = "parquet"
+except ImportError:
+    STORAGE_FORMAT = "npz"
+
+
+def download_yahoo(ticker: str, start: str) -> pd.DataFrame:
+    """yfinance ile start (dahil) ve sonrasındaki günlük barlar; ham, ayarlanmamış fiyatlar."""
+    import yfinance as yf
+    return yf.download(ticker, start=start, interval="1d", auto_adjust=False, progress=False)
+
+
+def normalize_bars(raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    yfinance çıktısını date + PRICE_COLUMNS biçimine getirir (tek ticker'lı
+    MultiIndex kolonlar düzleştirilir, 'Adj Close' -> adj_close).
+    """
+    if raw is None or raw.empty:
+        return pd.DataFrame(columns=['date'] + PRICE_COLUMNS)
+    df = raw.copy()
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+    df.columns = [str(c).lower().replace(' ', '_') for c in df.columns]
+    df.index = pd.to_datetime(df.index)
+    if df.index.tz is not None:
+        df.index = df.index.tz_localize(None)
+    df.index = df.index.normalize()
+    df = df.reindex(columns=PRICE_COLUMNS).astype(float)
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    df = df.rename_axis('date').reset_index()
+    df['date'] = df['date'].astype('datetime64[ns]')
+    return df
+
+
+def _write_atomic(path: str, write: Callable[[str], None]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+class SeriesCache:
+    """Ad (SERIES anahtarı) başına günlük bar önbelleği."""
+
+    def __init__(self, root: str = SERIES_CACHE_DIR,
+                 download: Callable[[str, str], pd.DataFrame] | None = None,
+                 storage: str = STORAGE_FORMAT):
+        self.root = root
+        self.download = download or download_yahoo
+        self.storage = storage
+        self._stats = {"fresh": 0, "fetched": 0, "new_rows": 0, "offline": 0}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, f"{name}.{self.storage}")
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.root, "series.json")
+
+    def manifest(self) -> dict:
+        path = self._manifest_path()
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest: dict) -> None:
+        def write(tmp: str) -> None:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=1)
+        _write_atomic(self._manifest_path(), write)
+
+    def load(self, name: str) -> pd.DataFrame:
+        """Önbellekteki barlar (date datetime64 + PRICE_COLUMNS); yoksa boş tablo."""
+        path = self._path(name)
+        if not os.path.exists(path):
+            return pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'),
+                                 **{c: pd.Series(dtype=float) for c in PRICE_COLUMNS}})
+        if self.storage == "parquet":
+            return pd.read_parquet(path)
+        with np.load(path) as data:
+            df = pd.DataFrame({c: data[c] for c in PRICE_COLUMNS})
+            days = (data['day'].astype('timedelta64[D]') + _EPOCH).astype('datetime64[ns]')
+            df.insert(0, 'date', days)
+        return df
+
+    def _save(self, name: str, df: pd.DataFrame) -> None:
+        if self.storage == "parquet":
+            _write_atomic(self._path(name), lambda tmp: df.to_parquet(tmp, index=False))
+            return
+        days = (df['date'].to_numpy().astype('datetime64[D]') - _EPOCH).astype(np.int32)
+        columns = {c: df[c].to_numpy(dtype=float) for c in PRICE_COLUMNS}
+
+        def write(tmp: str) -> None:
+            # np.savez uzantı ekler; dosya nesnesiyle yazılır
+            with open(tmp, "wb") as f:
+                np.savez_compressed(f, day=days, **columns)
+        _write_atomic(self._path(name), write)
+
+    def _is_fresh(self, entry: dict | None) -> bool:
+        if entry is None:
+            return False
+        fetched = datetime.fromisoformat(entry["fetched_at"])
+        return (datetime.now() - fetched).total_seconds() < SERIES_TTL
+
+    def update(self, names: list[str] | None = None, force: bool = False) -> dict[str, int]:
+        """
+        Serileri son kayıtlı bardan itibaren indirip önbelleğe ekler; seri
+        başına eklenen yeni bar sayısını döndürür. TTL içindeki seriler ve
+        çevrimdışı modda hiç istek yapılmaz.
+        """
+        names = names or list(SERIES)
+        manifest = self.manifest()
+        added = {}
+        for name in names:
+            entry = manifest.get(name)
+            if OFFLINE:
+                if entry is None:
+                    raise CacheMiss(f"{name} serisi önbellekte yok (çevrimdışı mod)")
+                self._stats["offline"] += 1
+                added[name] = 0
+                continue
+            if not force and self._is_fresh(entry):
+                self._stats["fresh"] += 1
+                added[name] = 0
+                continue
+
+            cached = self.load(name)
+            last = entry["last_date"] if entry and not cached.empty else None
+            start = last or HISTORY_START
+            raw = call_with_retry(partial(self.download, SERIES[name], start), label=name)
+            fresh = normalize_bars(raw)
+            self._stats["fetched"] += 1
+            if fresh.empty:
+                # yfinance başarısız indirmede boş tablo döndürür: önbellek ve
+                # manifesto olduğu gibi kalır, seri bir sonraki çağrıda yeniden istenir
+                added[name] = 0
+                continue
+
+            if last is not None:
+                # Son bar dahil yeniden istendi: yalnızca yeni yanıtta olan günler değişir
+                fresh = fresh[fresh['date'] >= pd.Timestamp(last)]
+                cached = cached[~cached['date'].isin(fresh['date'])]
+            merged = pd.concat([cached, fresh], ignore_index=True) if not cached.empty else fresh
+            added[name] = int((fresh['date'] > pd.Timestamp(last)).sum()) if last else len(fresh)
+            self._stats["new_rows"] += added[name]
+
+            if not merged.empty:
+                self._save(name, merged)
+            manifest[name] = {
+                "ticker": SERIES[name],
+                "last_date": merged['date'].max().strftime('%Y-%m-%d') if not merged.empty else None,
+                "rows": len(merged),
+                "fetched_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            self._save_manifest(manifest)
+        return added
+
+    def aligned(self, names: list[str], column: str = 'close', dates=None,
+                update: bool = True) -> pd.DataFrame:
+        """
+        Serilerin `column` değerlerini date + ad kolonlu tek tabloya dizer.
+        dates verilirse satırlar tam olarak bu tarihlerdir (olmayan gün NaN),
+        verilmezse serilerin tarih birleşimi kullanılır.
+        """
+        if update:
+            self.update(names)
+        frame = None
+        for name in names:
+            bars = self.load(name)[['date', column]].rename(columns={column: name})
+            frame = bars if frame is None else frame.merge(bars, on='date', how='outer')
+        frame = frame.sort_values('date', kind='mergesort').reset_index(drop=True)
+        if dates is not None:
+            target = pd.DataFrame({'date': pd.to_datetime(pd.Series(dates)).dt.normalize()})
+            frame = target.merge(frame, on='date', how='left')
+        return frame
+
+    def stats(self) -> dict:
+        return dict(self._stats)
+
+    def format_stats(self) -> str:
+        s = self._stats
+        mode = f", {s['offline']} çevrimdışı" if OFFLINE else ""
+        return (f"seri önbelleği: {s['fetched']} indirme ({s['new_rows']} yeni bar), "
+                f"{s['fresh']} güncel{mode}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dış günlük serileri (XU100, XBANK, XUSIN, Brent, SP500, VIX) günceller.")
+    parser.add_argument("names", nargs="*", help=f"Seriler: {', '.join(SERIES)} (boş = hepsi)")
+    parser.add_argument("--force", action="store_true", help="SERIES_TTL'i yok sayıp yeniden iste")
+    args = parser.parse_args()
+    unknown = [n for n in args.names if n not in SERIES]
+    if unknown:
+        parser.error(f"bilinmeyen seri: {', '.join(unknown)}")
+
+    cache = SeriesCache()
+    started = time.perf_counter()
+    added = cache.update(args.names or None, force=args.force)
+    manifest = cache.manifest()
+    for name, count in added.items():
+        entry = manifest.get(name, {})
+        print(f"{name:<10} {entry.get('ticker', ''):<10} son bar {entry.get('last_date')}  "
+              f"{entry.get('rows', 0):>6} satır  (+{count})")
+    print(f"{time.perf_counter() - started:.1f} sn, {cache.format_stats()} [{cache.storage}]")
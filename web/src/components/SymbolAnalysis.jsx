@@ -348,7 +348,7 @@ const SymbolAnalysis = ({ onBack }) => {
                                                     </div>
                                                     <div className="metric">
                                                         <span className="metric-label">CV R²:</span>
-                                                        <span className="metric-value">{metrics.cv_r2.toFixed(3)}</span>
+                                                        <span className="metric-value">{metrics.cv_r2 != null ? metrics.cv_r2.toFixed(3) : '—'}</span>
                                                     </div>
                                                     <div className="metric">
                                                         <span className="metric-label">RMSE:</span>